@@ -9,20 +9,80 @@ Auto Update Stata Journal Database with Citation Information
 2. 通过 CrossRef API 获取详细引文信息（作者、标题、摘要、引用次数等）
 3. 更新本地数据库文件
 
+用法：
+    python auto_update.py                  # 完整更新（重新抓取全部文章）
+    python auto_update.py --incremental    # 增量更新（只抓取新增或不完整的文章）
+    python auto_update.py refresh-citations  # 只刷新已有数据库中文章的引用次数（不抓取网页）
+    python auto_update.py --offline        # 只使用本地 HTTP 缓存（.http_cache/），不访问网络
+    python auto_update.py --resume         # 从检查点日志续跑上一次中断的运行
+    python auto_update.py --engine async   # 使用 asyncio + httpx 抓取引擎（需安装 httpx）
+    python auto_update.py --metrics-textfile findsj_update.prom  # 额外输出 Prometheus 格式的运行指标
+    python auto_update.py --formats dta,index,authors,cite,related,parquet,sqlite,jsonl  # 同时导出相关文章表（需要 scipy）、Parquet、SQLite FTS5 和 JSON Lines
+    python auto_update.py --force-write    # 只有引用次数等易变字段变化时也重写数据库文件
+    python auto_update.py --web-enrich     # 从 SAGE 文章页补充 CrossRef 缺失的摘要和页码（多进程解析）
+    python auto_update.py --stages list,crossref,export --dry-run  # 只估计各主机的请求数，不抓取
+    python auto_update.py --stages crossref,export --years 2020-2024  # 只重新查询这些年份文章的 CrossRef 信息
+    python auto_update.py --artids st0001,st0002 --output-dir build  # 只处理指定文章，输出写入 build/
+    python auto_update.py --host-rate api.crossref.org=10:20 --timeout crossref=30 --retries 5
+    python auto_update.py --incremental --shard 2/4   # 只处理 4 个哈希分片中的第 2 个，部分结果写入 shards/
+    python auto_update.py merge-shards     # 合并全部分片的部分结果，写出 findsj.dta、版本信息和 update_log.json
+
 作者: GitHub Copilot
 日期: 2026-02-03
 """
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
 import pandas as pd
 import re
 import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import multiprocessing
+import os
 import logging
 from datetime import datetime
 import json
+import argparse
+import hashlib
+import tempfile
+import sqlite3
+import threading
+import queue
+import zlib
+import asyncio
+from contextlib import contextmanager
+import html
+import unicodedata
+import gzip
+import heapq
+import io
+import numpy as np
+from urllib.parse import urlsplit, urlencode
+from email.utils import parsedate_to_datetime
+
+try:
+    import httpx  # 可选依赖：仅 --engine async 需要
+except ImportError:
+    httpx = None
+
+try:
+    import pyarrow as pa  # 可选依赖：仅 Parquet 导出需要
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    from scipy import sparse  # 可选依赖：仅相关文章导出需要
+except ImportError:
+    sparse = None
+
+try:
+    import lxml  # noqa: F401  可选依赖：更快的 HTML 解析器
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
 
 # 设置日志
 logging.basicConfig(
@@ -34,18 +94,1014 @@ logger = logging.getLogger(__name__)
 # 基础配置
 BASE_URL = "https://www.stata-journal.com"
 CROSSREF_API = "https://api.crossref.org/works"
+SAGE_URL = "https://journals.sagepub.com"
+
+# CrossRef 批量查询配置
+# Stata Journal 的 ISSN（印刷版 / 电子版），用于一次拉取整本期刊的元数据
+STATA_JOURNAL_ISSNS = ('1536-867X', '1536-8734')
+CROSSREF_ROWS = 1000         # 游标分页每页条数（CrossRef 上限）
+CROSSREF_DOI_BATCH = 50      # filter=doi:... 每批 DOI 数
+# 待处理文章少于该数量时跳过批量查询，直接逐篇请求
+CROSSREF_BULK_MIN = 20
+# 批量查询只取 parse_crossref_message() 用到的字段
+CROSSREF_SELECT = ','.join([
+    'DOI', 'title', 'container-title', 'publisher', 'volume', 'issue', 'page', 'type',
+    'reference-count', 'is-referenced-by-count', 'URL', 'published-print',
+    'published-online', 'author', 'abstract', 'link', 'ISSN',
+])
+# refresh-citations 只取引用次数
+CITATION_SELECT = 'DOI,is-referenced-by-count'
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
 }
 
-def get_crossref_citation(doi, retry=3):
+# 输出文件
+DATABASE_PATH = Path(__file__).parent / "findsj.dta"
+# 拆分文件：短字段的核心文件（标题/作者检索和 DOI 查询只需读取它）和按 art_id 排序的长文本文件
+# （摘要和引文，findsj 的 Ref 面板按 art_id 只读取一行）；findsj.dta 仍保留全部列供关键词检索和旧版 findsj.ado
+CORE_PATH = Path(__file__).parent / "findsj_core.dta"
+TEXT_PATH = Path(__file__).parent / "findsj_text.dta"
+# 作者维度表（每篇文章每位作者一行，按作者键排序）和作者名词项 -> art_id 倒排表，
+# 作者检索按键查找而不是逐行切分 authors
+AUTHORS_PATH = Path(__file__).parent / "findsj_authors.dta"
+AUTHOR_INDEX_PATH = Path(__file__).parent / "findsj_author_index.dta"
+# 引文包：每篇文章预先生成的 APA、Chicago、BibTeX、RIS 引文，findsj 离线导出引文时读取
+CITE_PATH = Path(__file__).parent / "findsj_cite.dta"
+CITATION_JOURNAL = 'The Stata Journal'
+# 相关文章表：每篇文章按标题和摘要 TF-IDF 余弦相似度最接近的文章（需要 scipy）
+RELATED_PATH = Path(__file__).parent / "findsj_related.dta"
+RELATED_TOP_K = 10
+# 词项权重：标题中的词按出现 2 次计
+RELATED_FIELD_WEIGHTS = {'title': 2.0, 'abstract': 1.0}
+# 每块计算的文章数：内存约为 RELATED_BLOCK_SIZE × 文章数 × 4 字节
+RELATED_BLOCK_SIZE = 256
+RELATED_MIN_SCORE = 0.05
+# 其他导出格式（--formats 选择，默认只输出 Stata 文件）
+PARQUET_PATH = Path(__file__).parent / "findsj.parquet"
+SQLITE_PATH = Path(__file__).parent / "findsj.sqlite"
+JSONL_PATH = Path(__file__).parent / "findsj.jsonl.gz"
+EXPORT_FORMATS = ('dta', 'authors', 'cite', 'related', 'parquet', 'sqlite', 'jsonl')
+DEFAULT_EXPORT_FORMATS = ('dta', 'authors', 'cite')
+# 导出阶段每批分发给导出器的记录数
+EXPORT_BATCH_SIZE = 1000
+# SQLite 导出中建立 FTS5 全文索引的列
+SQLITE_FTS_COLUMNS = ('title', 'authors', 'abstract')
+# 内容清单（每篇文章一个哈希）和本次运行的变更说明，供增量同步使用
+MANIFEST_PATH = Path(__file__).parent / "findsj_manifest.json"
+CHANGES_PATH = Path(__file__).parent / "changes.json"
+# 增量补丁（每个数据版本一个，只含新增/修改的行），用 findsj_sync.py 应用。默认不发布：
+# findsj, update 下载完整文件，仓库检出用 git pull 获取变化；只供自建镜像（--publish-patches）使用
+PUBLISH_PATCHES = False
+PATCH_DIR = Path(__file__).parent / "patches"
+PATCH_INDEX_NAME = "index.json"
+PATCH_FORMAT = 1
+PATCH_KEEP = 24
+# 分片运行（--shard I/N）的部分结果文件，由 merge-shards 合并为完整数据库
+SHARD_DIR = Path(__file__).parent / "shards"
+SHARD_FORMAT = 1
+VERSION_PATH = Path(__file__).parent / "findsj_version.dta"
+LOG_PATH = Path(__file__).parent / "update_log.json"
+# 全部输出文件的模块变量（--output-dir 统一改到其他目录）
+OUTPUT_PATH_NAMES = ('DATABASE_PATH', 'VERSION_PATH', 'LOG_PATH', 'CORE_PATH', 'TEXT_PATH',
+                     'AUTHORS_PATH', 'AUTHOR_INDEX_PATH', 'CITE_PATH', 'RELATED_PATH', 'PARQUET_PATH', 'SQLITE_PATH', 'JSONL_PATH', 'MANIFEST_PATH', 'CHANGES_PATH', 'PATCH_DIR',
+                     'SHARD_DIR')
+
+# 增量更新配置
+# 易变字段：增量模式下按计划从 CrossRef 刷新，其余字段沿用已有数据库
+VOLATILE_FIELDS = ('cited_by_count', 'reference_count')
+# 易变字段的刷新周期（天）；0 表示每次运行都刷新。只有易变字段变化时，刷新结果先记入
+# update_log.json（pending_volatile），距上次写出满一个周期才写出，不在每次刷新后都重写数据库
+CITATION_REFRESH_DAYS = 90
+# 标题匹配时去除的字符（normalize_title）
+TITLE_NORMALIZE_PATTERN = re.compile(r'[^a-z0-9]+')
+
+# 数据库记录结构：(列名, 类型)，顺序即 findsj.dta 的列顺序
+RECORD_SCHEMA = [
+    ('art_id', str),
+    ('title', str),
+    ('volume', int),
+    ('number', int),
+    ('year', int),
+    ('doi', str),
+    ('authors', str),
+    ('first_author_family', str),
+    ('first_author_given', str),
+    ('author_count', int),
+    ('abstract', str),
+    ('page', str),
+    ('reference_count', int),
+    ('cited_by_count', int),
+    ('citation_apa', str),
+    ('url', str),
+    ('pdf_url', str),
+]
+RECORD_COLUMNS = [name for name, _ in RECORD_SCHEMA]
+# 输出顺序：年份、卷号、期号，art_id 保证顺序确定
+RECORD_ORDER = ('year', 'volume', 'number', 'art_id')
+
+# 检索词项（index_terms()，findsj_server.py 和相关文章表使用）
+# 与 findsj.ado 离线检索相同的缩写扩展
+SEARCH_SYNONYMS = {
+    'psm': 'propensity score',
+    'iv': 'instrumental variable',
+    'did': 'difference in differences',
+    'dd': 'difference in differences',
+    'rdd': 'regression discontinuity',
+    'rd': 'regression discontinuity',
+    'gmm': 'generalized method of moments',
+    'var': 'vector autoregression',
+}
+# 不作为检索词项的常见词
+SEARCH_STOPWORDS = frozenset(
+    'a an and are as at be been by can for from has have in into is it its of on or that the '
+    'these this to was we were which with'.split()
+)
+# 轻量词干规则（便于在 Stata 中用 ustrregexra 复现）：
+# 先去复数（ies -> y，sses -> ss，ss/us/is 结尾不变，其余去掉 s），
+# 再去掉下列第一个匹配的后缀，去掉后至少保留 STEM_MIN_LENGTH 个字符
+STEM_SUFFIXES = ('ing', 'ion', 'ed', 'ly', 'e')
+STEM_MIN_LENGTH = 4
+# 词项最长字符数（更长的截断）
+INDEX_TERM_MAX_LENGTH = 20
+
+# findsj.dta 中为离线检索预先计算的列（小写并去除重音；author_tokens 为首尾补空格的作者名词项）
+# 摘要不预先计算：折叠副本会使文件体积翻倍，findsj.ado 检索时再生成 abstract_lower
+SEARCH_COLUMNS = {
+    'title_norm': 'title',
+    'author_norm': 'authors',
+}
+AUTHOR_TOKEN_PATTERN = re.compile(r'[^\w]+')
+# 拆分 'Given Family' 格式的姓名时归入姓的小品词，以及留在名中的后缀
+AUTHOR_NAME_PARTICLES = frozenset('da das de del della der di do dos du la le van von'.split())
+AUTHOR_NAME_SUFFIXES = frozenset(('jr', 'sr', 'ii', 'iii', 'iv'))
+# Stata 整数类型的取值范围，按从小到大选择最小的类型
+STATA_INT_TYPES = (('int8', -127, 100), ('int16', -32767, 32740), ('int32', -2147483647, 2147483620))
+# str# 的最大宽度（字节）；strL 每个值在数据区占 8 字节引用，每个不同的非空值在 GSO 表中另占
+# 21 字节头部（含结尾的 \0）加值本身
+STATA_STR_MAX_WIDTH = 2045
+STATA_STRL_REF_BYTES = 8
+STATA_STRL_GSO_OVERHEAD = 21
+# findsj.ado 用作 merge/frlink 键的列（Stata 不允许 strL 作键），始终写为 str#
+STATA_KEY_COLUMNS = ('art_id', 'doi')
+# 核心文件的列（findsj.dta 保留全部列以兼容旧版 findsj.ado）：标题/作者检索和 DOI 查询所需的短字段，
+# 加上预计算的检索列，findsj_search_fields 不必在检索时重新折叠
+CORE_COLUMNS = ['art_id', 'title', 'authors', 'year', 'volume', 'number', 'doi', 'page',
+                'author_count', 'reference_count', 'cited_by_count'] + list(SEARCH_COLUMNS) + ['author_tokens']
+# 长文本文件的列
+TEXT_COLUMNS = ['art_id', 'abstract', 'citation_apa']
+
+# 暂存库兼检查点日志（运行中断后 --resume 续跑）
+JOURNAL_PATH = Path(__file__).parent / "update_journal.sqlite"
+# 超过该天数的日志不再用于续跑
+JOURNAL_MAX_AGE_DAYS = 7
+
+# 并发配置
+# 线程池后端的工作线程数
+THREAD_WORKERS = 3
+# 每个主机的并发上限（async 引擎的信号量、两种后端的连接池大小）
+HOST_CONCURRENCY = {
+    'www.stata-journal.com': 4,
+    'api.crossref.org': 5,
+    'journals.sagepub.com': 2,
+}
+DEFAULT_HOST_CONCURRENCY = 2
+
+# 请求超时（秒），按数据源；可用 --timeout SOURCE=SECONDS 覆盖
+REQUEST_TIMEOUTS = {
+    'listing': 30,        # 搜索页（文章列表，页面较大）
+    'article': 10,        # stata-journal.com 文章页
+    'crossref': 15,       # CrossRef 单篇查询
+    'crossref_list': 30,  # CrossRef 列表查询（游标分页）
+    'sage': 15,           # journals.sagepub.com 文章页
+}
+# 失败请求的重试次数，以及指数退避的基数（秒）：第 n 次重试前等待 RETRY_BACKOFF * 2 ** (n - 1)
+REQUEST_RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+# 流水线阶段（--stages）：list 抓取文章列表，resolve-doi 抓取文章页解析 DOI，crossref 获取引文信息，
+# web 从 SAGE 文章页补充，export 写出文件；跳过的阶段沿用已有数据库中的数据
+PIPELINE_STAGES = ('list', 'resolve-doi', 'crossref', 'web', 'export')
+DEFAULT_STAGES = ('list', 'resolve-doi', 'crossref', 'export')
+
+# 网页补充阶段（--web-enrich）：从 SAGE 文章页补充的字段，只填补 CrossRef 留空的值
+WEB_ENRICH_FIELDS = ('abstract', 'page')
+
+# 限速配置：每个主机的 (初始速率, 速率上限)，单位为请求/秒
+# CrossRef 的上限会被 X-Rate-Limit-Limit/X-Rate-Limit-Interval 响应头覆盖
+HOST_RATE_LIMITS = {
+    'www.stata-journal.com': (4.0, 8.0),
+    'api.crossref.org': (5.0, 50.0),
+    'journals.sagepub.com': (1.0, 2.0),
+}
+DEFAULT_HOST_RATE_LIMIT = (2.0, 4.0)
+MIN_HOST_RATE = 0.2
+# 每次成功响应后速率的增量：当前速率的 RATE_INCREASE_FRACTION，至少 RATE_INCREASE_STEP（请求/秒）
+RATE_INCREASE_STEP = 0.1
+RATE_INCREASE_FRACTION = 0.05
+# 429 响应没有 Retry-After 时的暂停时间，以及 Retry-After 的上限（秒）
+DEFAULT_RETRY_AFTER = 10.0
+MAX_RETRY_AFTER = 300.0
+RATE_INTERVAL_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)\s*([smh]?)$')
+
+# HTML 解析用的预编译正则
+ARTICLE_LINK_PATTERN = re.compile(r'article\.html\?article=')
+ARTID_PATTERN = re.compile(r'article=([^"&]+)')
+ARTID_PARTS_PATTERN = re.compile(r'([a-z]+)(\d+)')
+DOI_LINK_PATTERN = re.compile(r'journals\.sagepub\.com/doi/|doi\.org/')
+SAGE_LINK_PATTERN = re.compile(r'journals\.sagepub\.com/doi/')
+SAGE_DOI_PATTERN = re.compile(r'doi/(pdf/)?(10\.\d+/[^?&#]+)')
+DOI_ORG_LINK_PATTERN = re.compile(r'doi\.org/')
+DOI_PATTERN = re.compile(r'10\.\d+/[^?&#\s]+')
+AUTHOR_CLASS_PATTERN = re.compile(r'author')
+PDF_LINK_PATTERN = re.compile(r'/doi/pdf/')
+WEB_INFO_CLASS_PATTERN = re.compile(r'loa-accordion|author-list|abstractSection|article-section__content|'
+                                    r'citation__title|article-title|page-range|show-pdf')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# HTTP 响应缓存配置
+# 以 URL 为键的持久化缓存（SQLite + zlib 压缩），中断后重新运行可直接命中缓存
+CACHE_PATH = Path(__file__).parent / ".http_cache" / "responses.sqlite"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 各数据源的缓存有效期（秒）；过期后携带 ETag/Last-Modified 重新验证。有效期为 0 的数据源
+# 在线时不读取缓存也不重新验证，响应仍写入缓存，供 --offline 重放
+CACHE_TTL = {
+    'listing': 12 * 3600,         # 搜索页（文章列表），需要及时发现新文章
+    'article': 30 * 86400,        # stata-journal.com 文章页（DOI 链接基本不变）
+    'crossref': 86400,            # CrossRef API（包含易变的引用次数）
+    'crossref_cursor': 0,         # CrossRef 游标分页：游标很快在服务端失效，在线时总是重新请求
+    'sage': 30 * 86400,           # journals.sagepub.com 文章页
+}
+DEFAULT_CACHE_TTL = 86400
+
+# 运行指标：HTTP 请求延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class OfflineCacheMiss(requests.ConnectionError):
+    """离线模式下请求的 URL 不在缓存中"""
+
+class CachedResponse:
+    """
+    缓存或网络响应的统一表示，提供与 requests.Response 相同的常用接口
+    """
+    
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        self.content = content
+        self.from_cache = from_cache
+    
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+    
+    def json(self):
+        return json.loads(self.content)
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+class HTTPCache:
+    """
+    基于 SQLite 的 HTTP 响应缓存
+    
+    - 键为 URL 的 SHA-256，响应体以 zlib 压缩存储
+    - 记录 ETag/Last-Modified，用于过期后的条件请求
+    - 总大小超过上限时按最近访问时间淘汰（LRU）
+    """
+    
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+    
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+    
+    def get(self, url):
+        """
+        读取缓存条目
+        
+        Returns:
+            dict: 包含 response/etag/last_modified/fetched_at；未命中时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, headers, body, etag, last_modified, fetched_at '
+                'FROM responses WHERE key = ?', (self._key(url),)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?',
+                               (time.time(), self._key(url)))
+            self._conn.commit()
+        
+        status, headers, body, etag, last_modified, fetched_at = row
+        return {
+            'response': CachedResponse(url, status, json.loads(headers),
+                                       zlib.decompress(body), from_cache=True),
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': fetched_at,
+        }
+    
+    def put(self, url, status, headers, content):
+        """写入（或覆盖）缓存条目，必要时触发淘汰"""
+        body = zlib.compress(content)
+        now = time.time()
+        key = self._key(url)
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, url, status, headers, body, size, etag, last_modified, fetched_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, url, status, json.dumps(dict(headers)), body, len(body),
+                 headers.get('ETag'), headers.get('Last-Modified'), now, now))
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+    
+    def touch(self, url):
+        """条件请求返回 304 时，刷新条目的获取时间"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?',
+                               (now, now, self._key(url)))
+            self._conn.commit()
+    
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小降到上限的 90% 以下（调用方持有锁）"""
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+        evicted = 0
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._total_bytes -= size
+            evicted += 1
+        logger.debug(f"HTTP cache evicted {evicted} entries")
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# 全局缓存状态，由 configure_http_cache() 设置
+_http_cache = None
+_offline = False
+
+def configure_http_cache(path=CACHE_PATH, enabled=True, offline=False, max_bytes=CACHE_MAX_BYTES):
+    """
+    配置全局 HTTP 缓存
+    
+    Args:
+        path: 缓存数据库路径
+        enabled: 是否启用缓存
+        offline: 离线模式，只从缓存读取，不发出任何网络请求
+        max_bytes: 缓存大小上限（压缩后字节数）
+    """
+    global _http_cache, _offline
+    if _http_cache is not None:
+        _http_cache.close()
+    _http_cache = HTTPCache(path, max_bytes) if (enabled or offline) else None
+    _offline = offline
+    if _http_cache is not None:
+        logger.info(f"HTTP cache: {_http_cache.path} ({'offline' if offline else 'online'})")
+
+def _cache_lookup(url, source):
+    """
+    查询缓存
+    
+    Returns:
+        tuple: (response, entry) 缓存仍然有效时 response 非空；
+            entry 为可用于条件请求的过期条目（可能为 None）
+    
+    Raises:
+        OfflineCacheMiss: 离线模式下缓存未命中
+    """
+    ttl = CACHE_TTL.get(source, DEFAULT_CACHE_TTL)
+    if ttl == 0 and not _offline:
+        return None, None
+    entry = _http_cache.get(url) if _http_cache is not None else None
+    
+    if entry is not None:
+        age = time.time() - entry['fetched_at']
+        if _offline or age < ttl:
+            return entry['response'], entry
+    elif _offline:
+        raise OfflineCacheMiss(f"Not in cache (offline mode): {url}")
+    
+    return None, entry
+
+def _conditional_headers(headers, entry):
+    """为过期的缓存条目添加 If-None-Match/If-Modified-Since 请求头"""
+    request_headers = dict(headers or {})
+    if entry is not None:
+        if entry['etag']:
+            request_headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            request_headers['If-Modified-Since'] = entry['last_modified']
+    return request_headers
+
+def _cache_store(url, entry, status_code, headers, content):
+    """
+    处理网络响应：304 时沿用缓存条目，200 时写入缓存
+    
+    Returns:
+        CachedResponse: 响应对象
+    """
+    if status_code == 304 and entry is not None:
+        _http_cache.touch(url)
+        return entry['response']
+    
+    if status_code == 200 and _http_cache is not None:
+        _http_cache.put(url, status_code, headers, content)
+    
+    return CachedResponse(url, status_code, headers, content)
+
+class TokenBucket:
+    """
+    单个主机的自适应令牌桶限速器（线程安全）
+    
+    - reserve() 预订一个令牌并返回需要等待的秒数，令牌可以透支，
+      因此并发请求会被均匀排开，而不是同时醒来
+    - 根据 CrossRef 的 X-Rate-Limit-Limit/X-Rate-Limit-Interval 响应头设置速率上限
+    - 429/503 时按 Retry-After 暂停并将速率减半；成功响应后速率按当前速率的比例回升（AIMD）
+    - 同一批并发请求的 429 只减半一次：发出时间早于上一次减速的请求再遇到 429 只延长暂停
+    """
+    
+    def __init__(self, rate, max_rate=None, capacity=None):
+        self.rate = float(rate)
+        self.max_rate = float(max_rate or rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.decreased_at = float('-inf')
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+    
+    def reserve(self):
+        """
+        预订一个令牌
+        
+        Returns:
+            float: 发出请求前需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(0.0, self.updated - now)  # 暂停期间 updated 在未来
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+            return wait
+    
+    def acquire(self):
+        """阻塞直到可以发出请求"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self):
+        """异步等待直到可以发出请求"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def pause(self, seconds, started=None):
+        """
+        暂停发出新请求 seconds 秒，并将速率减半
+        
+        Args:
+            seconds: 暂停秒数
+            started: 触发暂停的请求的发出时间（time.monotonic()）；早于上一次减速时不再减半
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if started is None or started >= self.decreased_at:
+                self.rate = max(MIN_HOST_RATE, self.rate / 2)
+                self.decreased_at = now
+            self.tokens = min(self.tokens, 1.0)
+            self.updated = max(self.updated, now + seconds)
+    
+    def on_response(self, status_code, headers, started=None):
+        """
+        根据响应调整速率
+        
+        Args:
+            status_code: HTTP 状态码
+            headers: 响应头
+            started: 请求的发出时间（time.monotonic()），用于合并同一批请求的 429
+        
+        Returns:
+            float: 需要暂停的秒数（未被限速时为 0）
+        """
+        ceiling = parse_rate_limit_headers(headers)
+        
+        if status_code in (429, 503):
+            wait = parse_retry_after(headers.get('Retry-After'))
+            if wait is None:
+                wait = DEFAULT_RETRY_AFTER if status_code == 429 else 0.0
+            if status_code == 429 or wait > 0:
+                self.pause(wait, started)
+            return wait
+        
+        with self._lock:
+            if ceiling:
+                self.max_rate = ceiling
+                self.capacity = max(1.0, ceiling)
+            if status_code < 400:
+                step = max(RATE_INCREASE_STEP, self.rate * RATE_INCREASE_FRACTION)
+                self.rate = min(self.max_rate, self.rate + step)
+            else:
+                self.rate = min(self.rate, self.max_rate)
+        return 0.0
+
+def parse_rate_limit_headers(headers):
+    """
+    解析 CrossRef 的速率限制响应头
+    
+    Args:
+        headers: 响应头（如 X-Rate-Limit-Limit: 50, X-Rate-Limit-Interval: 1s）
+    
+    Returns:
+        float: 允许的速率（请求/秒）；无有效响应头时返回 None
+    """
+    limit = headers.get('X-Rate-Limit-Limit')
+    interval = headers.get('X-Rate-Limit-Interval')
+    if not limit or not interval:
+        return None
+    match = RATE_INTERVAL_PATTERN.match(interval.strip())
+    try:
+        limit = float(limit)
+    except ValueError:
+        return None
+    if not match or limit <= 0:
+        return None
+    seconds = float(match.group(1)) * {'': 1, 's': 1, 'm': 60, 'h': 3600}[match.group(2)]
+    return limit / seconds if seconds > 0 else None
+
+def parse_retry_after(value):
+    """
+    解析 Retry-After 响应头（秒数或 HTTP 日期）
+    
+    Returns:
+        float: 等待秒数（不超过 MAX_RETRY_AFTER）；无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = retry_at.timestamp() - time.time()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+# 每个主机一个限速器，线程池和 async 两种后端共享
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(url):
+    """
+    获取 URL 所属主机的限速器
+    
+    Args:
+        url: 请求 URL
+    
+    Returns:
+        TokenBucket: 该主机的限速器
+    """
+    host = urlsplit(url).netloc
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(host)
+        if limiter is None:
+            rate, max_rate = HOST_RATE_LIMITS.get(host, DEFAULT_HOST_RATE_LIMIT)
+            limiter = TokenBucket(rate, max_rate)
+            _rate_limiters[host] = limiter
+    return limiter
+
+# 每个主机一个 requests.Session（线程池后端复用连接，保持 keep-alive）
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(url):
+    """
+    获取 URL 所属主机的共享 Session
+    
+    Args:
+        url: 请求 URL
+    
+    Returns:
+        requests.Session: 带连接池的 Session
+    """
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            pool_size = max(HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY), THREAD_WORKERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+    return session
+
+class RunMetrics:
+    """
+    单次运行的指标收集器（线程安全，线程池和 async 两种后端共用）
+    
+    - 各阶段耗时（listing、DOI 解析、CrossRef 批量查询、逐篇抓取、写出）
+    - 按主机统计的请求数（按状态码）、延迟直方图、重试/429 次数、连接错误、
+      重试用尽后放弃的抓取数、缓存命中数和下载字节数
+    结果写入 update_log.json 的 metrics 字段，也可输出为 Prometheus textfile。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """清空全部指标，开始新的运行"""
+        with self._lock:
+            self.started_at = time.time()
+            self.stages = {}
+            self.hosts = {}
+    
+    def _host(self, url):
+        return self._host_stats(urlsplit(url).netloc)
+    
+    def _host_stats(self, host):
+        stats = self.hosts.get(host)
+        if stats is None:
+            stats = {
+                'requests': 0,
+                'status': {},
+                'errors': 0,
+                'retries': 0,
+                'failures': 0,
+                'rate_limited': 0,
+                'cache_hits': 0,
+                'bytes': 0,
+                'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+                'latency_sum': 0.0,
+            }
+            self.hosts[host] = stats
+        return stats
+    
+    @contextmanager
+    def stage(self, name):
+        """记录 with 语句块的耗时（秒），同名阶段累加"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+    
+    def record_request(self, url, status_code, elapsed, nbytes):
+        """记录一次网络请求（304 也计入请求数，不计字节）"""
+        with self._lock:
+            stats = self._host(url)
+            stats['requests'] += 1
+            stats['status'][str(status_code)] = stats['status'].get(str(status_code), 0) + 1
+            if status_code == 429:
+                stats['rate_limited'] += 1
+            stats['bytes'] += nbytes
+            stats['latency_sum'] += elapsed
+            index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound),
+                         len(LATENCY_BUCKETS))
+            stats['latency_buckets'][index] += 1
+    
+    def record_error(self, url):
+        """记录一次没有得到响应的请求（连接错误、超时等）"""
+        with self._lock:
+            self._host(url)['errors'] += 1
+    
+    def record_retry(self, url):
+        with self._lock:
+            self._host(url)['retries'] += 1
+    
+    def record_failure(self, url):
+        """记录一次重试用尽（或遇到不可重试的错误）后放弃的抓取"""
+        with self._lock:
+            self._host(url)['failures'] += 1
+    
+    def record_cache_hit(self, url):
+        with self._lock:
+            self._host(url)['cache_hits'] += 1
+    
+    def add_snapshot(self, data):
+        """
+        累加另一次运行的 to_dict() 结果（merge-shards 合并各分片的指标）
+        
+        阶段耗时和请求统计按分片相加，直方图由累积计数还原为各桶计数后相加。
+        
+        Args:
+            data: to_dict() 返回的指标汇总
+        """
+        with self._lock:
+            for name, seconds in data.get('stages_seconds', {}).items():
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            for host, snapshot in data.get('hosts', {}).items():
+                stats = self._host_stats(host)
+                for key in ('requests', 'errors', 'retries', 'failures', 'rate_limited', 'cache_hits', 'bytes'):
+                    stats[key] += snapshot.get(key, 0)
+                for status, count in snapshot.get('status', {}).items():
+                    stats['status'][status] = stats['status'].get(status, 0) + count
+                latency = snapshot.get('latency_seconds', {})
+                previous = 0
+                for index, cumulative in enumerate(latency.get('buckets', {}).values()):
+                    stats['latency_buckets'][index] += cumulative - previous
+                    previous = cumulative
+                stats['latency_sum'] += latency.get('sum', 0.0)
+    
+    def to_dict(self):
+        """
+        Returns:
+            dict: 可直接写入 JSON 的指标汇总（直方图为累积计数，键为上界秒数）
+        """
+        with self._lock:
+            hosts = {}
+            for host, stats in sorted(self.hosts.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(list(LATENCY_BUCKETS) + ['+Inf'], stats['latency_buckets']):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                hosts[host] = {
+                    'requests': stats['requests'],
+                    'status': dict(sorted(stats['status'].items())),
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'failures': stats['failures'],
+                    'rate_limited': stats['rate_limited'],
+                    'cache_hits': stats['cache_hits'],
+                    'bytes': stats['bytes'],
+                    'latency_seconds': {
+                        'buckets': buckets,
+                        'sum': round(stats['latency_sum'], 3),
+                        'count': stats['requests'],
+                    },
+                }
+            
+            requests_total = sum(h['requests'] for h in hosts.values())
+            cache_hits = sum(h['cache_hits'] for h in hosts.values())
+            lookups = requests_total + cache_hits
+            return {
+                'elapsed_seconds': round(time.time() - self.started_at, 3),
+                'stages_seconds': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                'http': {
+                    'requests': requests_total,
+                    'errors': sum(h['errors'] for h in hosts.values()),
+                    'retries': sum(h['retries'] for h in hosts.values()),
+                    'failures': sum(h['failures'] for h in hosts.values()),
+                    'rate_limited': sum(h['rate_limited'] for h in hosts.values()),
+                    'cache_hits': cache_hits,
+                    'cache_hit_ratio': round(cache_hits / lookups, 4) if lookups else 0.0,
+                    'bytes_downloaded': sum(h['bytes'] for h in hosts.values()),
+                },
+                'hosts': hosts,
+            }
+    
+    def write_prometheus(self, path, extra=None):
+        """
+        以 Prometheus textfile 格式写出指标（供 node_exporter textfile collector 读取）
+        
+        先写临时文件再改名，避免采集到写了一半的文件。
+        
+        Args:
+            path: 输出文件路径（应以 .prom 结尾）
+            extra: 额外的无标签 gauge，{指标名后缀: 值}
+        """
+        data = self.to_dict()
+        prefix = 'findsj_update'
+        lines = []
+        
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text
+                             else f"{prefix}_{name} {value}")
+        
+        hosts = data['hosts']
+        metric('stage_seconds', 'gauge', 'Wall time spent in each update stage.',
+               [({'stage': name}, seconds) for name, seconds in data['stages_seconds'].items()])
+        metric('http_requests_total', 'counter', 'HTTP requests sent, by host and status code.',
+               [({'host': host, 'status': status}, count)
+                for host, stats in hosts.items() for status, count in stats['status'].items()])
+        for key, help_text in (('errors', 'HTTP requests that got no response.'),
+                               ('retries', 'Retried HTTP requests.'),
+                               ('failures', 'Fetches given up after all retries.'),
+                               ('rate_limited', 'HTTP 429 responses.'),
+                               ('cache_hits', 'Requests answered from the local HTTP cache.'),
+                               ('bytes', 'Response bytes downloaded.')):
+            metric(f'http_{key}_total', 'counter', help_text,
+                   [({'host': host}, stats[key]) for host, stats in hosts.items()])
+        
+        lines.append(f"# HELP {prefix}_http_request_duration_seconds HTTP request latency.")
+        lines.append(f"# TYPE {prefix}_http_request_duration_seconds histogram")
+        for host, stats in hosts.items():
+            latency = stats['latency_seconds']
+            for bound, count in latency['buckets'].items():
+                lines.append(f'{prefix}_http_request_duration_seconds_bucket{{host="{host}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_http_request_duration_seconds_sum{{host="{host}"}} {latency["sum"]}')
+            lines.append(f'{prefix}_http_request_duration_seconds_count{{host="{host}"}} {latency["count"]}')
+        
+        for name, value in (extra or {}).items():
+            metric(name, 'gauge', name.replace('_', ' ').capitalize() + '.', [({}, value)])
+        
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        tmp_path.replace(path)
+
+# 全局指标收集器，update_database() 开始时重置
+_metrics = RunMetrics()
+
+def http_get(url, source, headers=None, timeout=15):
+    """
+    带缓存的 GET 请求，所有抓取函数统一通过此函数访问网络
+    
+    Args:
+        url: 完整 URL
+        source: 数据源名称（决定缓存有效期，见 CACHE_TTL）
+        headers: 请求头
+        timeout: 超时时间（秒）
+    
+    Returns:
+        CachedResponse: 响应对象
+    
+    Raises:
+        OfflineCacheMiss: 离线模式下缓存未命中
+        requests.RequestException: 网络请求失败
+    """
+    cached, entry = _cache_lookup(url, source)
+    if cached is not None:
+        _metrics.record_cache_hit(url)
+        return cached
+    
+    limiter = get_rate_limiter(url)
+    limiter.acquire()
+    started = time.monotonic()
+    start = time.perf_counter()
+    try:
+        response = get_session(url).get(url, headers=_conditional_headers(headers, entry), timeout=timeout)
+    except requests.RequestException:
+        _metrics.record_error(url)
+        raise
+    _metrics.record_request(url, response.status_code, time.perf_counter() - start, len(response.content))
+    limiter.on_response(response.status_code, response.headers, started)
+    return _cache_store(url, entry, response.status_code, response.headers, response.content)
+
+def make_soup(html, parse_only=None):
+    """
+    构建 BeautifulSoup 解析树
+    
+    有 lxml 时使用 lxml 解析器；parse_only 为 SoupStrainer 时只构建匹配的元素
+    （及其子树），其余标签在解析阶段直接丢弃。
+    
+    Args:
+        html: 页面 HTML
+        parse_only: SoupStrainer，限制解析范围
+    
+    Returns:
+        BeautifulSoup: 解析树
+    """
+    return BeautifulSoup(html, HTML_PARSER, parse_only=parse_only)
+
+def parse_crossref_message(message, doi):
+    """
+    解析 CrossRef API 返回的 message 对象
+    
+    Args:
+        message: CrossRef /works 响应中的 message（单篇文章）
+        doi: 请求使用的 DOI（message 中缺失时作为后备）
+    
+    Returns:
+        dict: 包含引文信息的字典
+    """
+    # 提取关键信息
+    citation_info = {
+        'doi': message.get('DOI', doi),
+        'title': message.get('title', [''])[0] if message.get('title') else '',
+        'container_title': message.get('container-title', [''])[0] if message.get('container-title') else '',
+        'publisher': message.get('publisher', ''),
+        'volume': str(message.get('volume', '')),
+        'issue': str(message.get('issue', '')),
+        'page': message.get('page', ''),
+        'article_type': message.get('type', ''),
+        'reference_count': message.get('reference-count', 0),
+        'cited_by_count': message.get('is-referenced-by-count', 0),
+        'url': message.get('URL', ''),
+    }
+    
+    # 提取出版日期
+    published = message.get('published-print') or message.get('published-online') or {}
+    date_parts = published.get('date-parts', [[]])
+    if date_parts and date_parts[0]:
+        parts = date_parts[0]
+        citation_info['year'] = parts[0] if len(parts) > 0 else ''
+        citation_info['month'] = parts[1] if len(parts) > 1 else ''
+    else:
+        citation_info['year'] = ''
+        citation_info['month'] = ''
+    
+    # 提取作者信息
+    authors = message.get('author', [])
+    if authors:
+        # 第一作者
+        first_author = authors[0]
+        citation_info['first_author_family'] = first_author.get('family', '')
+        citation_info['first_author_given'] = first_author.get('given', '')
+        
+        # 所有作者（格式化）
+        author_list = []
+        for author in authors:
+            family = author.get('family', '')
+            given = author.get('given', '')
+            if family:
+                author_list.append(format_author_name(family, given))
+        
+        citation_info['authors'] = '; '.join(author_list)
+        citation_info['author_count'] = len(authors)
+    else:
+        citation_info['first_author_family'] = ''
+        citation_info['first_author_given'] = ''
+        citation_info['authors'] = ''
+        citation_info['author_count'] = 0
+    
+    # 提取摘要（去除HTML标签）
+    abstract = message.get('abstract', '')
+    if abstract:
+        # 去除 HTML/XML 标签
+        clean_abstract = HTML_TAG_PATTERN.sub('', abstract)
+        citation_info['abstract'] = clean_abstract.strip()
+    else:
+        citation_info['abstract'] = ''
+    
+    # 提取 PDF 链接
+    links = message.get('link', [])
+    pdf_url = ''
+    for link in links:
+        if 'pdf' in link.get('content-type', '').lower():
+            pdf_url = link.get('URL', '')
+            break
+    citation_info['pdf_url'] = pdf_url
+    
+    # ISSN
+    issn_list = message.get('ISSN', [])
+    citation_info['issn'] = issn_list[0] if issn_list else ''
+    
+    # 格式化的引用文本 (APA style)
+    citation_text = format_citation_apa(citation_info)
+    citation_info['citation_apa'] = citation_text
+    
+    return citation_info
+
+def get_crossref_citation(doi, retry=None):
     """
     从 CrossRef API 获取详细引文信息
     
     Args:
         doi: DOI 标识符
-        retry: 重试次数
+        retry: 重试次数（默认 REQUEST_RETRIES）
     
     Returns:
         dict: 包含引文信息的字典
@@ -54,17 +1110,18 @@ def get_crossref_citation(doi, retry=3):
         return {}
     
     url = f"{CROSSREF_API}/{doi}"
+    retry = REQUEST_RETRIES if retry is None else retry
     
     for attempt in range(retry):
+        if attempt:
+            _metrics.record_retry(url)
         try:
-            time.sleep(0.2)  # 在每次请求前添加延迟
-            response = requests.get(url, timeout=15)
+            # 限速由 http_get() 中的主机令牌桶处理
+            response = http_get(url, 'crossref', timeout=REQUEST_TIMEOUTS['crossref'])
             
-            # 特殊处理429错误
+            # 429：限速器已按 Retry-After 暂停该主机并降低速率，下一次尝试会自动等待
             if response.status_code == 429:
-                wait_time = 60  # 等待60秒
-                logger.warning(f"Rate limit hit for DOI {doi}. Waiting {wait_time} seconds...")
-                time.sleep(wait_time)
+                logger.warning(f"Rate limit hit for DOI {doi} (attempt {attempt + 1}/{retry})")
                 continue
             
             response.raise_for_status()
@@ -73,91 +1130,18 @@ def get_crossref_citation(doi, retry=3):
             if 'message' not in data:
                 return {}
             
-            message = data['message']
-            
-            # 提取关键信息
-            citation_info = {
-                'doi': message.get('DOI', doi),
-                'title': message.get('title', [''])[0] if message.get('title') else '',
-                'container_title': message.get('container-title', [''])[0] if message.get('container-title') else '',
-                'publisher': message.get('publisher', ''),
-                'volume': str(message.get('volume', '')),
-                'issue': str(message.get('issue', '')),
-                'page': message.get('page', ''),
-                'article_type': message.get('type', ''),
-                'reference_count': message.get('reference-count', 0),
-                'cited_by_count': message.get('is-referenced-by-count', 0),
-                'url': message.get('URL', ''),
-            }
-            
-            # 提取出版日期
-            published = message.get('published-print') or message.get('published-online') or {}
-            date_parts = published.get('date-parts', [[]])
-            if date_parts and date_parts[0]:
-                parts = date_parts[0]
-                citation_info['year'] = parts[0] if len(parts) > 0 else ''
-                citation_info['month'] = parts[1] if len(parts) > 1 else ''
-            else:
-                citation_info['year'] = ''
-                citation_info['month'] = ''
-            
-            # 提取作者信息
-            authors = message.get('author', [])
-            if authors:
-                # 第一作者
-                first_author = authors[0]
-                citation_info['first_author_family'] = first_author.get('family', '')
-                citation_info['first_author_given'] = first_author.get('given', '')
-                
-                # 所有作者（格式化）
-                author_list = []
-                for author in authors:
-                    family = author.get('family', '')
-                    given = author.get('given', '')
-                    if family:
-                        author_list.append(f"{family}, {given}" if given else family)
-                
-                citation_info['authors'] = '; '.join(author_list)
-                citation_info['author_count'] = len(authors)
-            else:
-                citation_info['first_author_family'] = ''
-                citation_info['first_author_given'] = ''
-                citation_info['authors'] = ''
-                citation_info['author_count'] = 0
-            
-            # 提取摘要（去除HTML标签）
-            abstract = message.get('abstract', '')
-            if abstract:
-                # 去除 HTML/XML 标签
-                clean_abstract = re.sub(r'<[^>]+>', '', abstract)
-                citation_info['abstract'] = clean_abstract.strip()
-            else:
-                citation_info['abstract'] = ''
-            
-            # 提取 PDF 链接
-            links = message.get('link', [])
-            pdf_url = ''
-            for link in links:
-                if 'pdf' in link.get('content-type', '').lower():
-                    pdf_url = link.get('URL', '')
-                    break
-            citation_info['pdf_url'] = pdf_url
-            
-            # ISSN
-            issn_list = message.get('ISSN', [])
-            citation_info['issn'] = issn_list[0] if issn_list else ''
-            
-            # 格式化的引用文本 (APA style)
-            citation_text = format_citation_apa(citation_info)
-            citation_info['citation_apa'] = citation_text
+            citation_info = parse_crossref_message(data['message'], doi)
             
             logger.debug(f"Successfully fetched citation for DOI: {doi}")
             return citation_info
             
+        except OfflineCacheMiss:
+            logger.debug(f"CrossRef response for DOI {doi} not cached (offline)")
+            return {}
         except requests.RequestException as e:
             logger.warning(f"Attempt {attempt + 1}/{retry} failed for DOI {doi}: {e}")
             if attempt < retry - 1:
-                time.sleep(2 ** attempt)  # 指数退避
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)  # 指数退避
         except Exception as e:
             logger.error(f"Error parsing citation for DOI {doi}: {e}")
             return {}
@@ -165,6 +1149,139 @@ def get_crossref_citation(doi, retry=3):
     logger.error(f"Failed to fetch citation for DOI: {doi}")
     return {}
 
+def get_crossref_json(url, retry=None, label='', source='crossref'):
+    """
+    请求 CrossRef API 并返回 JSON（用于 /works 列表查询）
+    
+    Args:
+        url: 完整的查询 URL
+        retry: 重试次数（默认 REQUEST_RETRIES）
+        label: 日志中的请求描述
+        source: 缓存数据源（见 CACHE_TTL）
+    
+    Returns:
+        dict: 响应 JSON；失败时返回 None
+    """
+    label = label or url
+    retry = REQUEST_RETRIES if retry is None else retry
+    
+    for attempt in range(retry):
+        if attempt:
+            _metrics.record_retry(url)
+        try:
+            response = http_get(url, source, timeout=REQUEST_TIMEOUTS['crossref_list'])
+            
+            if response.status_code == 429:
+                logger.warning(f"Rate limit hit for {label} (attempt {attempt + 1}/{retry})")
+                continue
+            
+            response.raise_for_status()
+            return response.json()
+            
+        except OfflineCacheMiss:
+            logger.debug(f"CrossRef response for {label} not cached (offline)")
+            return None
+        except requests.RequestException as e:
+            logger.warning(f"Attempt {attempt + 1}/{retry} failed for {label}: {e}")
+            if attempt < retry - 1:
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)  # 指数退避
+        except ValueError as e:
+            logger.error(f"Invalid JSON from CrossRef for {label}: {e}")
+            return None
+    
+    logger.error(f"Failed to fetch {label}")
+    return None
+
+def iter_crossref_works(filters, rows=CROSSREF_ROWS, select=CROSSREF_SELECT):
+    """
+    按游标分页遍历 CrossRef /works 查询结果
+    
+    游标页不从缓存读取（'crossref_cursor'）：重放缓存中的第一页会得到服务端已失效的 next-cursor，
+    后续页面请求失败，列表被截断。取得的条数少于 total-results 时记录警告。
+    
+    Args:
+        filters: filter 参数值（如 "issn:1536-867X" 或 "doi:a,doi:b"）
+        rows: 每页条数（CrossRef 上限 1000）
+        select: 返回的字段
+    
+    Yields:
+        dict: CrossRef 文章对象（与 /works/{doi} 的 message 结构相同）
+    """
+    cursor = '*'
+    page = 0
+    fetched = 0
+    total = None
+    while cursor:
+        query = {'filter': filters, 'rows': rows, 'select': select, 'cursor': cursor}
+        page += 1
+        data = get_crossref_json(f"{CROSSREF_API}?{urlencode(query)}", label=f"CrossRef page {page} ({filters[:60]})",
+                                 source='crossref_cursor')
+        if not data:
+            break
+        
+        message = data.get('message', {})
+        items = message.get('items', [])
+        yield from items
+        
+        fetched += len(items)
+        total = message.get('total-results', total)
+        next_cursor = message.get('next-cursor')
+        if not items or len(items) < rows or next_cursor == cursor:
+            break
+        if isinstance(total, int) and fetched >= total:
+            break
+        cursor = next_cursor
+    
+    if isinstance(total, int) and fetched < total:
+        logger.warning(f"CrossRef listing incomplete: {fetched} of {total} results ({filters[:60]})")
+
+def _add_crossref_item(metadata, item):
+    """解析一条 CrossRef 批量结果并以小写 DOI 为键加入 metadata"""
+    doi = item.get('DOI', '').lower()
+    if not doi:
+        return
+    try:
+        metadata[doi] = parse_crossref_message(item, doi)
+    except Exception as e:
+        logger.error(f"Error parsing citation for DOI {doi}: {e}")
+
+def fetch_crossref_journal_metadata():
+    """
+    按期刊 ISSN 游标分页拉取整本 Stata Journal 的 CrossRef 元数据
+    
+    Returns:
+        dict: 小写 DOI -> 引文信息（与 get_crossref_citation() 返回结构相同）
+    """
+    metadata = {}
+    issn_filter = ','.join(f"issn:{issn}" for issn in STATA_JOURNAL_ISSNS)
+    for item in iter_crossref_works(issn_filter):
+        _add_crossref_item(metadata, item)
+    logger.info(f"CrossRef ISSN listing returned {len(metadata)} works")
+    return metadata
+
+def fill_crossref_metadata(metadata, dois):
+    """
+    用 filter=doi:... 分批补齐批量结果中缺失的 DOI
+    
+    逐篇 /works/{doi} 请求只作为最后的后备（见 get_crossref_citation）。
+    
+    Args:
+        metadata: fetch_crossref_journal_metadata() 的结果（原地补充）
+        dois: 需要覆盖的已知 DOI
+    
+    Returns:
+        dict: 补充后的 metadata
+    """
+    missing = sorted({doi.lower() for doi in dois if doi} - set(metadata))
+    for start in range(0, len(missing), CROSSREF_DOI_BATCH):
+        batch = missing[start:start + CROSSREF_DOI_BATCH]
+        for item in iter_crossref_works(','.join(f"doi:{doi}" for doi in batch), rows=len(batch)):
+            _add_crossref_item(metadata, item)
+    if missing:
+        found = sum(1 for doi in missing if doi in metadata)
+        logger.info(f"CrossRef DOI filter batches filled {found}/{len(missing)} remaining DOIs")
+    return metadata
+
 def format_citation_apa(info):
     """
     格式化引用文本（APA 风格）
@@ -206,13 +1323,301 @@ def format_citation_apa(info):
     
     return ' '.join(parts)
 
-def get_web_info(doi, vol, num, title_fallback=''):
+def split_author_name(name):
     """
-    从网页获取文章的完整信息（作者、标题、摘要、页码等）
+    拆分作者姓名
     
     Args:
-        doi: DOI 标识符
-        vol: 卷号
+        name: 'Family, Given'（CrossRef 格式）或 'Given Family'（网页格式）
+    
+    Returns:
+        tuple: (family, given)
+    """
+    family, sep, given = name.partition(',')
+    if sep:
+        return family.strip(), given.strip()
+    parts = name.split()
+    if len(parts) < 2:
+        return name.strip(), ''
+    # 'Given Family Jr.'：后缀留在名中；'Ludwig van Beethoven'：姓前的小品词归入姓
+    suffix = parts.pop() if len(parts) > 2 and parts[-1].lower().strip('.,') in AUTHOR_NAME_SUFFIXES else ''
+    start = len(parts) - 1
+    while start > 1 and parts[start - 1].lower() in AUTHOR_NAME_PARTICLES:
+        start -= 1
+    return ' '.join(parts[start:]), ' '.join(parts[:start] + ([suffix] if suffix else []))
+
+def format_author_name(family, given):
+    """统一的作者姓名格式 'Family, Given'（与 CrossRef 记录一致）"""
+    return f"{family}, {given}" if given else family
+
+def normalize_author_list(names):
+    """
+    作者列表 -> 统一格式的 authors 字符串
+    
+    Args:
+        names: 作者姓名列表，'Family, Given' 或 'Given Family' 均可
+    
+    Returns:
+        str: 'Family, Given; Family, Given; ...'
+    """
+    return '; '.join(format_author_name(*split_author_name(name)) for name in names if name.strip())
+
+def author_initials(given):
+    """名的首字母缩写：'H. Joseph' -> 'H. J.'，'Jean-Paul' -> 'J.-P.'（Jr. 等后缀不计）"""
+    return ' '.join('-'.join(part[0] + '.' for part in token.split('-') if part)
+                    for token in given.replace('.', '. ').split()
+                    if token.lower().strip('.,') not in AUTHOR_NAME_SUFFIXES)
+
+def citation_authors(record):
+    """记录中的作者列表 [(family, given), ...]（authors 以分号分隔）"""
+    return [split_author_name(name) for name in str(record.get('authors', '')).split(';') if name.strip()]
+
+def citation_pages(record, dash):
+    """页码范围，连字符换成 dash（APA/Chicago 用 en dash，BibTeX 用 --）"""
+    return re.sub(r'\s*[-–—]+\s*', dash, str(record.get('page', '')).strip())
+
+def citation_link(record):
+    """DOI 链接（没有 DOI 时用文章页）"""
+    doi = str(record.get('doi', '')).strip()
+    return f"https://doi.org/{doi}" if doi else str(record.get('url', ''))
+
+def end_sentence(text):
+    """句末补句号（已有 .?! 时不补）"""
+    text = text.strip()
+    return text if not text or text[-1] in '.?!' else text + '.'
+
+def render_apa(record):
+    """
+    APA 第 7 版参考文献
+    
+    Returns:
+        str: 如 Newton, H. J., & Cox, N. J. (2020). Title. The Stata Journal, 20(4), 759–762. https://doi.org/...
+    """
+    names = [f"{family}, {author_initials(given)}" if given else family
+             for family, given in citation_authors(record)]
+    if len(names) > 20:
+        authors = ', '.join(names[:19]) + ', . . . ' + names[-1]
+    elif len(names) > 1:
+        authors = ', '.join(names[:-1]) + ', & ' + names[-1]
+    else:
+        authors = ''.join(names)
+    year = f"({record['year']})." if record.get('year') else "(n.d.)."
+    title = end_sentence(str(record.get('title', '')))
+    
+    source = CITATION_JOURNAL
+    if record.get('volume'):
+        source += f", {record['volume']}"
+        if record.get('number'):
+            source += f"({record['number']})"
+    pages = citation_pages(record, '–')
+    if pages:
+        source += f", {pages}"
+    
+    # 没有作者时标题移到作者位置
+    head = [end_sentence(authors), year, title] if authors else [title, year]
+    return ' '.join(part for part in head + [source + '.', citation_link(record)] if part)
+
+def render_chicago(record):
+    """
+    Chicago 格式（notes-bibliography 的参考文献条目）
+    
+    Returns:
+        str: 如 Newton, H. Joseph, and Nicholas J. Cox. "Title." The Stata Journal 20, no. 4 (2020): 759–762. https://doi.org/...
+    """
+    authors = citation_authors(record)
+    names = [f"{family}, {given}" if given else family for family, given in authors[:1]]
+    names += [f"{given} {family}".strip() for family, given in authors[1:]]
+    if len(names) > 10:
+        names = names[:7] + ['et al.']
+        authors = ', '.join(names[:-1]) + ', ' + names[-1]
+    elif len(names) > 2 or (len(names) == 2 and ',' in names[0]):
+        # 首位作者姓名倒置（含逗号）时两位作者之间也用逗号
+        authors = ', '.join(names[:-1]) + ', and ' + names[-1]
+    else:
+        authors = ' and '.join(names)
+    title = end_sentence(str(record.get('title', '')))
+    
+    source = CITATION_JOURNAL
+    if record.get('volume'):
+        source += f" {record['volume']}"
+        if record.get('number'):
+            source += f", no. {record['number']}"
+    if record.get('year'):
+        source += f" ({record['year']})"
+    pages = citation_pages(record, '–')
+    if pages:
+        source += f": {pages}"
+    
+    return ' '.join(part for part in [end_sentence(authors), f'"{title}"', source + '.', citation_link(record)]
+                    if part)
+
+def bibtex_escape(text):
+    """转义 BibTeX 特殊字符（已转义的不重复转义）"""
+    return re.sub(r'(?<!\\)([&%$#_])', r'\\\1', text)
+
+def render_bibtex(record):
+    """
+    BibTeX 条目（@article，键为 art_id）
+    
+    Returns:
+        str: 多行文本
+    """
+    fields = [
+        ('author', ' and '.join(f"{family}, {given}" if given else family
+                                for family, given in citation_authors(record))),
+        ('title', f"{{{bibtex_escape(str(record.get('title', '')))}}}"),
+        ('journal', CITATION_JOURNAL),
+        ('year', record.get('year') or ''),
+        ('volume', record.get('volume') or ''),
+        ('number', record.get('number') or ''),
+        ('pages', citation_pages(record, '--')),
+        ('issn', STATA_JOURNAL_ISSNS[0]),
+        ('doi', str(record.get('doi', ''))),
+        ('url', citation_link(record)),
+    ]
+    lines = [f"  {name} = {{{bibtex_escape(str(value)) if name == 'author' else value}}}"
+             for name, value in fields if value and value != '{}']
+    return f"@article{{{record['art_id']},\n" + ',\n'.join(lines) + "\n}"
+
+def render_ris(record):
+    """
+    RIS 条目（TY  - JOUR ... ER  - ）
+    
+    Returns:
+        str: 多行文本
+    """
+    pages = citation_pages(record, '-')
+    start, _, end = pages.partition('-')
+    tags = [('TY', 'JOUR')]
+    tags += [('AU', f"{family}, {given}" if given else family) for family, given in citation_authors(record)]
+    tags += [
+        ('TI', str(record.get('title', ''))),
+        ('T2', CITATION_JOURNAL),
+        ('PY', record.get('year') or ''),
+        ('VL', record.get('volume') or ''),
+        ('IS', record.get('number') or ''),
+        ('SP', start),
+        ('EP', end),
+        ('SN', STATA_JOURNAL_ISSNS[0]),
+        ('DO', str(record.get('doi', ''))),
+        ('UR', citation_link(record)),
+        ('ID', record['art_id']),
+    ]
+    return '\n'.join(f"{tag}  - {value}" for tag, value in tags if value) + "\nER  - "
+
+# 引文格式 -> 生成函数；findsj_cite.dta 中每种格式一列（cite_<格式>）
+CITATION_STYLES = {
+    'apa': render_apa,
+    'chicago': render_chicago,
+    'bibtex': render_bibtex,
+    'ris': render_ris,
+}
+
+def parse_web_info(html, doi, title_fallback=''):
+    """
+    解析 SAGE 文章页面，提取作者、标题、摘要、页码和 PDF 链接
+    
+    Args:
+        html: 页面 HTML
+        doi: DOI 标识符
+        title_fallback: 备用标题
+    
+    Returns:
+        dict: 包含文章信息的字典
+    """
+    # 只解析作者、摘要、标题、页码和 PDF 链接所在的元素（按 class 过滤）
+    soup = make_soup(html, SoupStrainer(attrs={'class': WEB_INFO_CLASS_PATTERN}))
+    # 不靠 class 定位的后备选择器（section[data-wrapper]、PDF href）需要时才解析
+    fallback = {}
+    
+    def fallback_soup():
+        if 'soup' not in fallback:
+            fallback['soup'] = make_soup(html, SoupStrainer(['section', 'a']))
+        return fallback['soup']
+    
+    result = {}
+    
+    # 提取作者信息
+    # 查找作者列表
+    author_list = []
+    author_section = soup.find('div', class_='accordion-tabbed loa-accordion')
+    if not author_section:
+        # 尝试其他可能的选择器
+        author_section = soup.find('div', class_='author-list')
+    
+    if author_section:
+        # 查找所有作者链接或span
+        author_elements = author_section.find_all(['a', 'span'], class_=AUTHOR_CLASS_PATTERN)
+        for elem in author_elements:
+            author_name = elem.get_text(strip=True)
+            if author_name and len(author_name) > 1:
+                author_list.append(author_name)
+    
+    if author_list:
+        # 网页上是 'Given Family'，统一为 CrossRef 记录的 'Family, Given'
+        result['authors'] = normalize_author_list(author_list)
+        result['first_author_family'], result['first_author_given'] = split_author_name(author_list[0])
+        result['author_count'] = len(author_list)
+    
+    # 提取摘要
+    abstract_section = soup.find('div', class_='abstractSection')
+    if not abstract_section:
+        abstract_section = fallback_soup().find('section', {'data-wrapper': 'abstract'})
+    if not abstract_section:
+        abstract_section = soup.find('div', class_='article-section__content', attrs={'role': 'paragraph'})
+    
+    if abstract_section:
+        # 获取纯文本，去除HTML标签
+        abstract_text = abstract_section.get_text(separator=' ', strip=True)
+        # 清理多余空格
+        abstract_text = WHITESPACE_PATTERN.sub(' ', abstract_text)
+        result['abstract'] = abstract_text
+    else:
+        result['abstract'] = ''
+    
+    # 提取标题
+    title_elem = soup.find('h1', class_='citation__title')
+    if not title_elem:
+        title_elem = soup.find('h1', class_='article-title')
+    if title_elem:
+        result['title'] = title_elem.get_text(strip=True)
+    else:
+        result['title'] = title_fallback
+    
+    # 提取页码
+    page_elem = soup.find('span', class_='article-page-range')
+    if not page_elem:
+        page_elem = soup.find('span', class_='page-range')
+    if page_elem:
+        result['page'] = page_elem.get_text(strip=True)
+    else:
+        result['page'] = ''
+    
+    # 提取PDF链接
+    pdf_link = soup.find('a', class_='show-pdf')
+    if not pdf_link:
+        pdf_link = fallback_soup().find('a', href=PDF_LINK_PATTERN)
+    if pdf_link:
+        pdf_href = pdf_link.get('href', '')
+        if pdf_href.startswith('/'):
+            result['pdf_url'] = f"{SAGE_URL}{pdf_href}"
+        else:
+            result['pdf_url'] = pdf_href
+    else:
+        result['pdf_url'] = ''
+    
+    # URL
+    result['url'] = f"{SAGE_URL}/doi/{doi}"
+    
+    return result
+
+def get_web_info(doi, vol, num, title_fallback=''):
+    """
+    从网页获取文章的完整信息（作者、标题、摘要、页码等）
+    
+    Args:
+        doi: DOI 标识符
+        vol: 卷号
         num: 期号
         title_fallback: 备用标题
     
@@ -223,104 +1628,16 @@ def get_web_info(doi, vol, num, title_fallback=''):
         return {}
     
     # 构造文章页面 URL（通过DOI）
-    article_url = f"https://journals.sagepub.com/doi/{doi}"
+    article_url = f"{SAGE_URL}/doi/{doi}"
     
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     }
     
     try:
-        response = requests.get(article_url, headers=headers, timeout=15)
+        response = http_get(article_url, 'sage', headers=headers, timeout=REQUEST_TIMEOUTS['sage'])
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        result = {}
-        
-        # 提取作者信息
-        # 查找作者列表
-        author_list = []
-        author_section = soup.find('div', class_='accordion-tabbed loa-accordion')
-        if not author_section:
-            # 尝试其他可能的选择器
-            author_section = soup.find('div', class_='author-list')
-        
-        if author_section:
-            # 查找所有作者链接或span
-            author_elements = author_section.find_all(['a', 'span'], class_=re.compile(r'author'))
-            for elem in author_elements:
-                author_name = elem.get_text(strip=True)
-                if author_name and len(author_name) > 1:
-                    author_list.append(author_name)
-        
-        if author_list:
-            result['authors'] = '; '.join(author_list)
-            # 提取第一作者
-            first_author = author_list[0]
-            # 尝试分离姓和名
-            if ',' in first_author:
-                parts = first_author.split(',', 1)
-                result['first_author_family'] = parts[0].strip()
-                result['first_author_given'] = parts[1].strip() if len(parts) > 1 else ''
-            else:
-                # 假设最后一个单词是姓
-                parts = first_author.split()
-                if len(parts) > 1:
-                    result['first_author_family'] = parts[-1]
-                    result['first_author_given'] = ' '.join(parts[:-1])
-                else:
-                    result['first_author_family'] = first_author
-                    result['first_author_given'] = ''
-            result['author_count'] = len(author_list)
-        
-        # 提取摘要
-        abstract_section = soup.find('div', class_='abstractSection')
-        if not abstract_section:
-            abstract_section = soup.find('section', {'data-wrapper': 'abstract'})
-        if not abstract_section:
-            abstract_section = soup.find('div', class_='article-section__content', attrs={'role': 'paragraph'})
-        
-        if abstract_section:
-            # 获取纯文本，去除HTML标签
-            abstract_text = abstract_section.get_text(separator=' ', strip=True)
-            # 清理多余空格
-            abstract_text = re.sub(r'\s+', ' ', abstract_text)
-            result['abstract'] = abstract_text
-        else:
-            result['abstract'] = ''
-        
-        # 提取标题
-        title_elem = soup.find('h1', class_='citation__title')
-        if not title_elem:
-            title_elem = soup.find('h1', class_='article-title')
-        if title_elem:
-            result['title'] = title_elem.get_text(strip=True)
-        else:
-            result['title'] = title_fallback
-        
-        # 提取页码
-        page_elem = soup.find('span', class_='article-page-range')
-        if not page_elem:
-            page_elem = soup.find('span', class_='page-range')
-        if page_elem:
-            result['page'] = page_elem.get_text(strip=True)
-        else:
-            result['page'] = ''
-        
-        # 提取PDF链接
-        pdf_link = soup.find('a', class_='show-pdf')
-        if not pdf_link:
-            pdf_link = soup.find('a', href=re.compile(r'/doi/pdf/'))
-        if pdf_link:
-            pdf_href = pdf_link.get('href', '')
-            if pdf_href.startswith('/'):
-                result['pdf_url'] = f"https://journals.sagepub.com{pdf_href}"
-            else:
-                result['pdf_url'] = pdf_href
-        else:
-            result['pdf_url'] = ''
-        
-        # URL
-        result['url'] = article_url
+        result = parse_web_info(response.text, doi, title_fallback)
         
         if result:
             logger.debug(f"Web info for DOI {doi}: {list(result.keys())}")
@@ -331,6 +1648,37 @@ def get_web_info(doi, vol, num, title_fallback=''):
         logger.debug(f"Failed to get web info for DOI {doi}: {e}")
         return {}
 
+def parse_article_doi(html):
+    """
+    从 stata-journal.com 文章页面 HTML 中提取 DOI
+    
+    Args:
+        html: 页面 HTML
+    
+    Returns:
+        str: DOI（小写）或空字符串
+    """
+    # 只解析指向 SAGE 或 doi.org 的链接
+    soup = make_soup(html, SoupStrainer('a', href=DOI_LINK_PATTERN))
+    
+    # 查找 Sage 期刊链接
+    sage_link = soup.find('a', href=SAGE_LINK_PATTERN)
+    if sage_link:
+        href = sage_link.get('href', '')
+        doi_match = SAGE_DOI_PATTERN.search(href)
+        if doi_match:
+            return doi_match.group(2).lower()
+    
+    # 查找其他可能的 DOI 链接
+    doi_link = soup.find('a', href=DOI_ORG_LINK_PATTERN)
+    if doi_link:
+        href = doi_link.get('href', '')
+        doi_match = DOI_PATTERN.search(href)
+        if doi_match:
+            return doi_match.group(0).lower()
+    
+    return ''
+
 def get_article_doi_from_page(artid):
     """
     从文章页面获取 DOI
@@ -344,31 +1692,79 @@ def get_article_doi_from_page(artid):
     url = f"{BASE_URL}/article.html?article={artid}"
     
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
+        response = http_get(url, 'article', headers=HEADERS, timeout=REQUEST_TIMEOUTS['article'])
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 查找 Sage 期刊链接
-        sage_link = soup.find('a', href=re.compile(r'journals\.sagepub\.com/doi/'))
-        if sage_link:
-            href = sage_link.get('href', '')
-            doi_match = re.search(r'doi/(pdf/)?(10\.\d+/[^?&#]+)', href)
-            if doi_match:
-                return doi_match.group(2).lower()
-        
-        # 查找其他可能的 DOI 链接
-        doi_link = soup.find('a', href=re.compile(r'doi\.org/'))
-        if doi_link:
-            href = doi_link.get('href', '')
-            doi_match = re.search(r'10\.\d+/[^?&#\s]+', href)
-            if doi_match:
-                return doi_match.group(0).lower()
-        
-        return ''
+        return parse_article_doi(response.text)
     except Exception as e:
         logger.debug(f"Failed to get DOI for {artid}: {e}")
         return ''
 
+def parse_article_list(html):
+    """
+    解析 Stata Journal 搜索页面，提取文章 artid 和标题
+    
+    Args:
+        html: 搜索页面 HTML
+    
+    Returns:
+        tuple: (文章信息列表, 跳过的非正式文章数)
+    """
+    # 只解析 article.html?article= 链接
+    soup = make_soup(html, SoupStrainer('a', href=ARTICLE_LINK_PATTERN))
+    article_links = soup.find_all('a')
+    
+    all_articles = []
+    seen_artids = set()
+    skipped_count = 0
+    
+    for link in article_links:
+        href = link.get('href', '')
+        match = ARTID_PATTERN.search(href)
+        if match:
+            artid = match.group(1).strip()
+            
+            # 跳过 updates, announcements, emptytag 等非正式文章
+            artid_lower = artid.lower()
+            if artid_lower.startswith(('up', 'an', 'emptytag')):
+                skipped_count += 1
+                continue
+            
+            # 去重
+            if artid in seen_artids:
+                continue
+            seen_artids.add(artid)
+            
+            # 获取标题
+            title = link.get_text(strip=True)
+            
+            # 跳过 Software updates
+            if 'software update' in title.lower():
+                skipped_count += 1
+                continue
+            
+            # 从 artid 推断卷期年份（格式如 st0001, dm122）
+            # artid格式: {type}{number}, 例如 st1234
+            artid_match = ARTID_PARTS_PATTERN.match(artid)
+            if artid_match:
+                article_type = artid_match.group(1)
+                article_num = int(artid_match.group(2))
+                
+                # 粗略估算：假设st文章每年60篇左右
+                # 实际会在CrossRef API中获取准确的卷期信息
+                vol = 0
+                num = 0
+                year = 0
+                
+                all_articles.append({
+                    'artid': artid,
+                    'title_web': title,
+                    'volume': vol,  # 待补充
+                    'number': num,  # 待补充
+                    'year': year    # 待补充
+                })
+    
+    return all_articles, skipped_count
+
 def get_all_stata_journal_articles():
     """
     从 Stata Journal 搜索页面获取所有文章的 artid 和基础信息
@@ -381,62 +1777,9 @@ def get_all_stata_journal_articles():
     search_url = f"{BASE_URL}/sjsearch.html?choice=keyword&q="
     
     try:
-        response = requests.get(search_url, headers=HEADERS, timeout=30)
+        response = http_get(search_url, 'listing', headers=HEADERS, timeout=REQUEST_TIMEOUTS['listing'])
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 查找所有 article.html?article= 链接
-        article_links = soup.find_all('a', href=re.compile(r'article\.html\?article='))
-        
-        all_articles = []
-        seen_artids = set()
-        skipped_count = 0
-        
-        for link in article_links:
-            href = link.get('href', '')
-            match = re.search(r'article=([^"&]+)', href)
-            if match:
-                artid = match.group(1).strip()
-                
-                # 跳过 updates, announcements, emptytag 等非正式文章
-                artid_lower = artid.lower()
-                if artid_lower.startswith(('up', 'an', 'emptytag')):
-                    skipped_count += 1
-                    continue
-                
-                # 去重
-                if artid in seen_artids:
-                    continue
-                seen_artids.add(artid)
-                
-                # 获取标题
-                title = link.get_text(strip=True)
-                
-                # 跳过 Software updates
-                if 'software update' in title.lower():
-                    skipped_count += 1
-                    continue
-                
-                # 从 artid 推断卷期年份（格式如 st0001, dm122）
-                # artid格式: {type}{number}, 例如 st1234
-                artid_match = re.match(r'([a-z]+)(\d+)', artid)
-                if artid_match:
-                    article_type = artid_match.group(1)
-                    article_num = int(artid_match.group(2))
-                    
-                    # 粗略估算：假设st文章每年60篇左右
-                    # 实际会在CrossRef API中获取准确的卷期信息
-                    vol = 0
-                    num = 0
-                    year = 0
-                    
-                    all_articles.append({
-                        'artid': artid,
-                        'title_web': title,
-                        'volume': vol,  # 待补充
-                        'number': num,  # 待补充
-                        'year': year    # 待补充
-                    })
+        all_articles, skipped_count = parse_article_list(response.text)
         
         logger.info(f"Found {len(all_articles)} articles (skipped {skipped_count} non-article entries)")
         return all_articles
@@ -445,47 +1788,296 @@ def get_all_stata_journal_articles():
         logger.error(f"Error fetching from search page: {e}")
         return []
 
-def update_database():
+def load_existing_database(path=DATABASE_PATH):
     """
-    更新数据库主函数
+    读取已有的数据库文件，作为增量更新的基础
+    
+    Args:
+        path: findsj.dta 路径
+    
+    Returns:
+        dict: art_id -> 文章记录（字典）；文件不存在或读取失败时返回空字典
     """
-    logger.info("=" * 60)
-    logger.info("Starting Stata Journal Database Update")
-    logger.info("=" * 60)
+    path = Path(path)
+    if not path.exists():
+        logger.warning(f"Existing database not found: {path}")
+        return {}
     
-    # 第一步：获取所有文章列表
-    logger.info("\nStep 1: Fetching article list from Stata Journal website...")
-    articles = get_all_stata_journal_articles()
+    try:
+        df = pd.read_stata(str(path))
+    except Exception as e:
+        logger.warning(f"Failed to read existing database {path}: {e}")
+        return {}
     
-    if not articles:
-        logger.error("No articles found! Exiting.")
-        return
+    # 兼容旧字段名；检索用的预计算列在写出时重新生成
+    df = df.rename(columns={'artid': 'art_id', 'DOI': 'doi'})
+    df = df[[col for col in df.columns if col in RECORD_COLUMNS]]
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            df[col] = df[col].fillna('')
     
-    # 第二步：获取引文信息
-    logger.info(f"\nStep 2: Fetching citation information from CrossRef API...")
-    logger.info(f"Total articles to process: {len(articles)}")
+    existing = {}
+    for record in df.to_dict('records'):
+        artid = str(record.get('art_id', '')).strip()
+        if artid:
+            existing[artid] = record
     
-    detailed_articles = []
+    logger.info(f"Loaded {len(existing)} existing records from {path}")
+    return existing
+
+def load_update_log(path=LOG_PATH):
+    """
+    读取上一次运行保存的 update_log.json
     
-    def process_article(art, index):
-        """处理单篇文章"""
-        artid = art.get('artid', '')
-        vol = art.get('volume', '')
-        num = art.get('number', '')
-        year = art.get('year', '')
-        
-        # 先获取DOI
-        doi = get_article_doi_from_page(artid)
-        
-        if not doi:
-            # 没有 DOI 的文章，只保留基本信息
+    Returns:
+        dict: 日志内容；文件不存在或无法解析时返回空字典
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def citation_refresh_due(last_refreshed, refresh_days=CITATION_REFRESH_DAYS):
+    """
+    判断易变字段（引用次数等）是否到了刷新时间
+    
+    Args:
+        last_refreshed: 上次刷新日期（YYYY-MM-DD），可为空
+        refresh_days: 刷新周期（天）
+    
+    Returns:
+        bool: 是否需要刷新
+    """
+    if refresh_days is None or refresh_days < 0:
+        return False
+    if not last_refreshed:
+        return True
+    try:
+        last = datetime.strptime(last_refreshed, '%Y-%m-%d')
+    except ValueError:
+        return True
+    return (datetime.now() - last).days >= refresh_days
+
+def apply_pending_volatile(records, pending):
+    """
+    已有记录叠加已经刷新但尚未写出的易变字段值（update_log.json 的 pending_volatile）
+    
+    Args:
+        records: 记录字典列表，原地更新
+        pending: art_id -> {易变字段: 值}
+    
+    Returns:
+        list: records
+    """
+    for record in records:
+        values = pending.get(record.get('art_id', ''))
+        if values:
+            record.update((field, values[field]) for field in VOLATILE_FIELDS if field in values)
+    return records
+
+def pending_volatile_changes(changes):
+    """
+    没有写出的易变字段变化（下次运行由 apply_pending_volatile() 沿用，不必重新查询 CrossRef）
+    
+    Args:
+        changes: diff_records() 的变更说明
+    
+    Returns:
+        dict: art_id -> {易变字段: 新值}
+    """
+    pending = {}
+    for item in changes['modified']:
+        values = {field: new for field, (old, new) in item['fields'].items() if field in VOLATILE_FIELDS}
+        if values:
+            pending[item['art_id']] = values
+    return pending
+
+def is_record_complete(record):
+    """已有记录是否完整（有 DOI 且已获取引文信息），不完整的记录在增量模式下重新抓取"""
+    return bool(record.get('doi')) and bool(record.get('citation_apa'))
+
+def plan_incremental_update(articles, existing, refresh_due):
+    """
+    对比网站文章列表与已有数据库，划分需要处理的文章
+    
+    Args:
+        articles: get_all_stata_journal_articles() 返回的文章列表
+        existing: load_existing_database() 返回的已有记录
+        refresh_due: 是否刷新易变字段
+    
+    Returns:
+        tuple: (to_fetch, to_refresh, reused)
+            to_fetch: 需要完整抓取的文章（新增或记录不完整）
+            to_refresh: 只需从 CrossRef 刷新易变字段的已有记录
+            reused: 直接沿用的已有记录
+    """
+    to_fetch, to_refresh, reused = [], [], []
+    
+    for art in articles:
+        record = existing.get(art.get('artid', ''))
+        if record is None or not is_record_complete(record):
+            to_fetch.append(art)
+        elif refresh_due:
+            to_refresh.append(dict(record))
+        else:
+            reused.append(dict(record))
+    
+    removed = len(set(existing) - {art.get('artid', '') for art in articles})
+    logger.info(f"Incremental plan: {len(to_fetch)} to fetch, {len(to_refresh)} to refresh, "
+                f"{len(reused)} unchanged, {removed} no longer listed")
+    return to_fetch, to_refresh, reused
+
+def refresh_volatile_fields(record, bulk_metadata=None):
+    """
+    只从 CrossRef 刷新已有记录的易变字段（不再抓取文章页面）
+    
+    Args:
+        record: 已有文章记录
+        bulk_metadata: CrossRef 批量查询结果（小写 DOI -> 引文信息），命中时不再逐篇请求
+    
+    Returns:
+        dict: 更新后的记录；请求失败时保留原值
+    """
+    doi = record.get('doi', '')
+    citation = (bulk_metadata or {}).get(doi.lower()) or get_crossref_citation(doi)
+    for field in VOLATILE_FIELDS:
+        if field in citation:
+            record[field] = citation[field]
+    return record
+
+def normalize_title(title):
+    """
+    规范化标题用于匹配：反转义 HTML、去除重音、小写、只保留字母数字
+    
+    Args:
+        title: 原始标题
+    
+    Returns:
+        str: 规范化后的标题
+    """
+    title = unicodedata.normalize('NFKD', html.unescape(title or ''))
+    title = ''.join(ch for ch in title if not unicodedata.combining(ch)).lower()
+    return TITLE_NORMALIZE_PATTERN.sub(' ', title).strip()
+
+def resolve_dois(articles, existing, bulk_metadata):
+    """
+    不抓取文章页面解析 DOI
+    
+    依次使用：
+    1. 已有 findsj.dta 中保存的 DOI
+    2. CrossRef 批量结果中标题唯一匹配的 DOI
+    已解析的文章写入 art['doi']；仍未解析的文章不设置该键，由 process_article 回退到抓取页面。
+    
+    Args:
+        articles: 文章列表（原地修改）
+        existing: load_existing_database() 返回的已有记录
+        bulk_metadata: CrossRef 批量查询结果（小写 DOI -> 引文信息）
+    
+    Returns:
+        dict: 各来源解析的数量 {'existing': n, 'title': n, 'unresolved': n}
+    """
+    counts = {'existing': 0, 'title': 0, 'unresolved': 0}
+    claimed = set()
+    
+    # 第一轮：已有数据库中的 DOI
+    for art in articles:
+        doi = str(existing.get(art.get('artid', ''), {}).get('doi', '')).strip().lower()
+        if doi:
+            art['doi'] = doi
+            claimed.add(doi)
+            counts['existing'] += 1
+    
+    # 第二轮：标题匹配 CrossRef 批量结果（只接受唯一且未被占用的匹配）
+    title_index = {}
+    for doi, citation in bulk_metadata.items():
+        key = normalize_title(citation.get('title', ''))
+        if key:
+            title_index.setdefault(key, set()).add(doi)
+    
+    for art in articles:
+        if 'doi' in art:
+            continue
+        matches = title_index.get(normalize_title(art.get('title_web', '')), set()) - claimed
+        if len(matches) == 1:
+            art['doi'] = matches.pop()
+            claimed.add(art['doi'])
+            counts['title'] += 1
+        else:
+            counts['unresolved'] += 1
+    
+    logger.info(f"DOI resolution: {counts['existing']} from existing database, "
+                f"{counts['title']} by CrossRef title match, {counts['unresolved']} left for page scraping")
+    return counts
+
+def build_article_record(art, doi, citation):
+    """
+    根据文章列表信息、DOI 和 CrossRef 引文信息组装一条数据库记录
+    
+    Args:
+        art: get_all_stata_journal_articles() 返回的文章信息
+        doi: 文章 DOI（可为空）
+        citation: get_crossref_citation() 返回的引文信息（可为空）
+    
+    Returns:
+        dict: 数据库记录
+    """
+    artid = art.get('artid', '')
+    vol = art.get('volume', '')
+    num = art.get('number', '')
+    year = art.get('year', '')
+    
+    if not doi:
+        # 没有 DOI 的文章，只保留基本信息
+        result = {
+            'art_id': artid,
+            'title': art.get('title_web', ''),
+            'volume': vol,
+            'number': num,
+            'year': year,
+            'doi': '',
+            'authors': '',
+            'first_author_family': '',
+            'first_author_given': '',
+            'author_count': 0,
+            'abstract': '',
+            'page': '',
+            'reference_count': 0,
+            'cited_by_count': 0,
+            'citation_apa': '',
+            'url': f'{BASE_URL}/article.html?article={artid}',
+            'pdf_url': '',
+        }
+    else:
+        if citation:
+            result = {
+                'art_id': artid,
+                'title': citation.get('title', art.get('title_web', '')),
+                'volume': citation.get('volume', vol),
+                'number': citation.get('issue', num),
+                'year': citation.get('year', year),
+                'doi': doi,
+                'authors': citation.get('authors', ''),
+                'first_author_family': citation.get('first_author_family', ''),
+                'first_author_given': citation.get('first_author_given', ''),
+                'author_count': citation.get('author_count', 0),
+                'abstract': citation.get('abstract', ''),
+                'page': citation.get('page', ''),
+                'reference_count': citation.get('reference_count', 0),
+                'cited_by_count': citation.get('cited_by_count', 0),
+                'citation_apa': citation.get('citation_apa', ''),
+                'url': citation.get('url', ''),
+                'pdf_url': citation.get('pdf_url', ''),
+            }
+        else:
+            # API 请求失败，使用基本信息
             result = {
                 'art_id': artid,
                 'title': art.get('title_web', ''),
                 'volume': vol,
                 'number': num,
                 'year': year,
-                'doi': '',
+                'doi': doi,
                 'authors': '',
                 'first_author_family': '',
                 'first_author_given': '',
@@ -495,150 +2087,2455 @@ def update_database():
                 'reference_count': 0,
                 'cited_by_count': 0,
                 'citation_apa': '',
-                'url': f'{BASE_URL}/article.html?article={artid}',
+                'url': f'https://doi.org/{doi}',
                 'pdf_url': '',
             }
-        else:
-            # 从 CrossRef 获取详细信息
-            citation = get_crossref_citation(doi)
-            
-            if citation:
-                result = {
-                    'art_id': artid,
-                    'title': citation.get('title', art.get('title_web', '')),
-                    'volume': citation.get('volume', vol),
-                    'number': citation.get('issue', num),
-                    'year': citation.get('year', year),
-                    'doi': doi,
-                    'authors': citation.get('authors', ''),
-                    'first_author_family': citation.get('first_author_family', ''),
-                    'first_author_given': citation.get('first_author_given', ''),
-                    'author_count': citation.get('author_count', 0),
-                    'abstract': citation.get('abstract', ''),
-                    'page': citation.get('page', ''),
-                    'reference_count': citation.get('reference_count', 0),
-                    'cited_by_count': citation.get('cited_by_count', 0),
-                    'citation_apa': citation.get('citation_apa', ''),
-                    'url': citation.get('url', ''),
-                    'pdf_url': citation.get('pdf_url', ''),
-                }
-            else:
-                # API 请求失败，使用基本信息
-                result = {
-                    'art_id': artid,
-                    'title': art.get('title_web', ''),
-                    'volume': vol,
-                    'number': num,
-                    'year': year,
-                    'doi': doi,
-                    'authors': '',
-                    'first_author_family': '',
-                    'first_author_given': '',
-                    'author_count': 0,
-                    'abstract': '',
-                    'page': '',
-                    'reference_count': 0,
-                    'cited_by_count': 0,
-                    'citation_apa': '',
-                    'url': f'https://doi.org/{doi}',
-                    'pdf_url': '',
-                }
-        
-        if (index + 1) % 50 == 0:
-            logger.info(f"Progress: {index + 1}/{len(articles)} articles processed")
-        
-        return result
-    
-    # 使用线程池并发处理（降低并发数以避免速率限制）
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = {
-            executor.submit(process_article, art, i): i 
-            for i, art in enumerate(articles)
-        }
-        
-        for future in as_completed(futures):
-            try:
-                result = future.result()
-                detailed_articles.append(result)
-            except Exception as e:
-                idx = futures[future]
-                logger.error(f"Error processing article {idx}: {e}")
     
-    # 第三步：保存数据库
-    logger.info("\nStep 3: Saving to database files...")
-    
-    # 转换为 DataFrame
-    df = pd.DataFrame(detailed_articles)
+    return result
+
+def normalize_record(record):
+    """
+    按 RECORD_SCHEMA 规范化一条记录：只保留数据库列，整数列无法解析时记为 0，
+    文本列缺失时记为空字符串
     
-    # 数据清洗和排序
-    for col in ['year', 'volume', 'number', 'author_count', 'reference_count', 'cited_by_count']:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    Args:
+        record: build_article_record() 或已有数据库中的记录
     
-    # 填充空字符串
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            df[col] = df[col].fillna('')
+    Returns:
+        dict: 列顺序与 RECORD_SCHEMA 一致的记录
+    """
+    normalized = {}
+    for name, kind in RECORD_SCHEMA:
+        value = record.get(name)
+        if kind is int:
+            try:
+                value = int(float(value))
+            except (TypeError, ValueError, OverflowError):
+                value = 0
+        elif value is None or (isinstance(value, float) and value != value):
+            value = ''
+        else:
+            value = str(value)
+        normalized[name] = value
+    return normalized
+
+class UpdateJournal:
+    """
+    更新运行的暂存库兼检查点日志（SQLite）
+    
+    每篇文章处理完成后经 normalize_record() 规范化，立即写入 records 表：
+    - 运行中断后可用 --resume 跳过已写入的 art_id
+    - 抓取阶段不在内存中累积结果；导出阶段从该表按输出顺序读一遍记录（导出器的内存占用见 Exporter）
+    运行成功结束后文件会被删除。
+    """
+    
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        columns = ', '.join(
+            f"{name} {'INTEGER' if kind is int else 'TEXT'} NOT NULL" + (' PRIMARY KEY' if name == 'art_id' else '')
+            for name, kind in RECORD_SCHEMA
+        )
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS records ({columns}, completed_at REAL NOT NULL)')
+        self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('started_at', ?)",
+                           (datetime.now().isoformat(),))
+        self._conn.commit()
+        self._insert = (f"INSERT OR REPLACE INTO records ({', '.join(RECORD_COLUMNS)}, completed_at) "
+                        f"VALUES ({', '.join('?' * (len(RECORD_COLUMNS) + 1))})")
+        self._order = ', '.join(RECORD_ORDER)
+    
+    def age_days(self):
+        """日志创建至今的天数"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'started_at'").fetchone()
+        try:
+            return (datetime.now() - datetime.fromisoformat(row[0])).days
+        except (TypeError, ValueError):
+            return 0
+    
+    def reset(self):
+        """清空日志，开始新的运行"""
+        self._conn.execute('DELETE FROM records')
+        self._conn.execute("UPDATE meta SET value = ? WHERE key = 'started_at'",
+                           (datetime.now().isoformat(),))
+        self._conn.commit()
+    
+    def _row(self, record):
+        normalized = normalize_record(record)
+        return [normalized[name] for name in RECORD_COLUMNS] + [time.time()]
+    
+    def record(self, result):
+        """写入一条完成的文章记录（立即提交）"""
+        self._conn.execute(self._insert, self._row(result))
+        self._conn.commit()
+    
+    def record_many(self, results):
+        """批量写入记录（一次提交）"""
+        self._conn.executemany(self._insert, (self._row(r) for r in results))
+        self._conn.commit()
+    
+    def completed_ids(self):
+        """
+        Returns:
+            set: 已写入的 art_id
+        """
+        return {row[0] for row in self._conn.execute('SELECT art_id FROM records')}
+    
+    def retain(self, art_ids):
+        """只保留 art_ids 中的记录（续跑时去掉已不在本次运行范围内的文章）"""
+        self._conn.execute('CREATE TEMP TABLE IF NOT EXISTS keep_ids (art_id TEXT PRIMARY KEY)')
+        self._conn.execute('DELETE FROM keep_ids')
+        self._conn.executemany('INSERT OR IGNORE INTO keep_ids VALUES (?)', ((a,) for a in art_ids))
+        self._conn.execute('DELETE FROM records WHERE art_id NOT IN (SELECT art_id FROM keep_ids)')
+        self._conn.commit()
+    
+    def count(self):
+        return self._conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+    
+    def iter_records(self, batch_size=500):
+        """
+        按输出顺序（RECORD_ORDER）逐条读取记录
+        
+        Yields:
+            dict: 规范化后的记录
+        """
+        cursor = self._conn.execute(f"SELECT {', '.join(RECORD_COLUMNS)} FROM records ORDER BY {self._order}")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(RECORD_COLUMNS, row))
+    
+    def close(self, remove=False):
+        """关闭日志；remove=True 时删除日志文件"""
+        self._conn.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+def open_journal(path=JOURNAL_PATH, resume=False):
+    """
+    打开暂存库/检查点日志，并在续跑时取出已完成的 art_id
+    
+    Args:
+        path: 日志文件路径
+        resume: 是否续跑；否则清空日志重新开始
+    
+    Returns:
+        tuple: (journal, completed) completed 为已完成的 art_id 集合
+    """
+    journal = UpdateJournal(path)
+    
+    if resume and journal.age_days() > JOURNAL_MAX_AGE_DAYS:
+        logger.warning(f"Journal {path} is older than {JOURNAL_MAX_AGE_DAYS} days, starting over")
+        resume = False
+    
+    if not resume:
+        journal.reset()
+        return journal, set()
+    
+    completed = journal.completed_ids()
+    logger.info(f"Resuming from journal {path}: {len(completed)} articles already completed")
+    return journal, completed
+
+def process_article(art, bulk_metadata=None):
+    """
+    处理单篇文章
+    
+    DOI 解析阶段未能解析的文章才抓取页面，再从 CrossRef 获取详细信息（优先使用批量结果）。
+    
+    Args:
+        art: 文章信息（resolve_dois() 已解析的文章带有 'doi' 键）
+        bulk_metadata: CrossRef 批量查询结果（小写 DOI -> 引文信息）
+    
+    Returns:
+        dict: 数据库记录
+    """
+    doi = art['doi'] if 'doi' in art else get_article_doi_from_page(art.get('artid', ''))
+    citation = (bulk_metadata or {}).get(doi) if doi else {}
+    if doi and not citation:
+        citation = get_crossref_citation(doi)
+    return build_article_record(art, doi, citation)
+
+def iter_fetch_results(articles, to_refresh, bulk_metadata=None, engine='threads', workers=THREAD_WORKERS):
+    """
+    抓取阶段：按完成顺序逐条产出记录
+    
+    Args:
+        articles: 需要完整抓取的文章
+        to_refresh: 只刷新易变字段的已有记录
+        bulk_metadata: CrossRef 批量查询结果
+        engine: 'threads'（线程池）或 'async'（asyncio + httpx）
+        workers: 线程池后端的工作线程数
+    
+    Yields:
+        dict: 完成的记录
+    """
+    if engine == 'async':
+        yield from iter_async_results(articles, to_refresh, bulk_metadata)
+        return
+    
+    # 使用线程池并发处理（降低并发数以避免速率限制）
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_article, art, bulk_metadata): art.get('artid', '')
+            for art in articles
+        }
+        futures.update({
+            executor.submit(refresh_volatile_fields, record, bulk_metadata): record.get('art_id', '')
+            for record in to_refresh
+        })
+        
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error processing article {futures[future]}: {e}")
+                continue
+            yield result
+
+class AsyncFetchEngine:
+    """
+    基于 asyncio + httpx 的抓取引擎
+    
+    每个主机保持一个带 keep-alive 连接池的 AsyncClient，并用信号量限制
+    该主机的并发请求数（见 HOST_CONCURRENCY）。与线程池后端共用缓存和解析函数；
+    SQLite 缓存的读写（含 zlib 解压/压缩）在专用线程中执行，不阻塞事件循环。
+    """
+    
+    def __init__(self, bulk_metadata=None):
+        if httpx is None:
+            raise RuntimeError("The async engine requires httpx (pip install httpx)")
+        self._clients = {}
+        # HTTPCache 的读写本身由锁串行化，一个线程即可
+        self._cache_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='http-cache')
+        self.bulk_metadata = bulk_metadata or {}
+    
+    def _client(self, url):
+        """获取 URL 所属主机的 (client, semaphore)"""
+        host = urlsplit(url).netloc
+        if host not in self._clients:
+            limit = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                follow_redirects=True,
+            )
+            self._clients[host] = (client, asyncio.Semaphore(limit))
+        return self._clients[host]
+    
+    async def get(self, url, source, headers=None, timeout=15):
+        """异步版 http_get()：先查缓存，再通过主机连接池请求"""
+        loop = asyncio.get_running_loop()
+        cached, entry = await loop.run_in_executor(self._cache_executor, _cache_lookup, url, source)
+        if cached is not None:
+            _metrics.record_cache_hit(url)
+            return cached
+        
+        client, semaphore = self._client(url)
+        limiter = get_rate_limiter(url)
+        async with semaphore:
+            await limiter.acquire_async()
+            started = time.monotonic()
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, headers=_conditional_headers(headers, entry), timeout=timeout)
+            except httpx.HTTPError:
+                _metrics.record_error(url)
+                raise
+        _metrics.record_request(url, response.status_code, time.perf_counter() - start, len(response.content))
+        limiter.on_response(response.status_code, response.headers, started)
+        return await loop.run_in_executor(self._cache_executor, _cache_store, url, entry,
+                                          response.status_code, response.headers, response.content)
+    
+    async def article_doi(self, artid):
+        """异步版 get_article_doi_from_page()"""
+        url = f"{BASE_URL}/article.html?article={artid}"
+        try:
+            response = await self.get(url, 'article', headers=HEADERS, timeout=REQUEST_TIMEOUTS['article'])
+            response.raise_for_status()
+            return parse_article_doi(response.text)
+        except Exception as e:
+            logger.debug(f"Failed to get DOI for {artid}: {e}")
+            return ''
+    
+    async def crossref_citation(self, doi, retry=None):
+        """异步版 get_crossref_citation()"""
+        if not doi:
+            return {}
+        
+        url = f"{CROSSREF_API}/{doi}"
+        retry = REQUEST_RETRIES if retry is None else retry
+        
+        for attempt in range(retry):
+            if attempt:
+                _metrics.record_retry(url)
+            try:
+                response = await self.get(url, 'crossref', timeout=REQUEST_TIMEOUTS['crossref'])
+                
+                if response.status_code == 429:
+                    logger.warning(f"Rate limit hit for DOI {doi} (attempt {attempt + 1}/{retry})")
+                    continue
+                
+                response.raise_for_status()
+                data = response.json()
+                if 'message' not in data:
+                    return {}
+                return parse_crossref_message(data['message'], doi)
+                
+            except OfflineCacheMiss:
+                logger.debug(f"CrossRef response for DOI {doi} not cached (offline)")
+                return {}
+            except (httpx.HTTPError, requests.RequestException) as e:
+                logger.warning(f"Attempt {attempt + 1}/{retry} failed for DOI {doi}: {e}")
+                if attempt < retry - 1:
+                    await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)  # 指数退避
+            except Exception as e:
+                logger.error(f"Error parsing citation for DOI {doi}: {e}")
+                return {}
+        
+        logger.error(f"Failed to fetch citation for DOI: {doi}")
+        return {}
+    
+    async def web_page(self, doi, retry=None):
+        """异步版 get_web_page()"""
+        url = sage_page_url(doi)
+        retry = REQUEST_RETRIES if retry is None else retry
+        
+        for attempt in range(retry):
+            if attempt:
+                _metrics.record_retry(url)
+            try:
+                response = await self.get(url, 'sage', headers=HEADERS, timeout=REQUEST_TIMEOUTS['sage'])
+                
+                if response.status_code == 429:
+                    logger.warning(f"Rate limit hit for SAGE page of DOI {doi} (attempt {attempt + 1}/{retry})")
+                    continue
+                
+                if response.status_code >= 500:
+                    logger.warning(f"Attempt {attempt + 1}/{retry} failed for SAGE page of DOI {doi}: "
+                                   f"HTTP {response.status_code}")
+                    if attempt < retry - 1:
+                        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)  # 指数退避
+                    continue
+                
+                response.raise_for_status()
+                return response.text
+                
+            except OfflineCacheMiss:
+                logger.debug(f"SAGE page for DOI {doi} not cached (offline)")
+                return None
+            except requests.HTTPError as e:
+                logger.warning(f"Failed to get web info for DOI {doi}: {e}")
+                _metrics.record_failure(url)
+                return None
+            except (httpx.HTTPError, requests.RequestException) as e:
+                logger.warning(f"Attempt {attempt + 1}/{retry} failed for SAGE page of DOI {doi}: {e}")
+                if attempt < retry - 1:
+                    await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)  # 指数退避
+            except Exception as e:
+                logger.warning(f"Failed to get web info for DOI {doi}: {e}")
+                _metrics.record_failure(url)
+                return None
+        
+        logger.warning(f"Failed to get web info for DOI {doi} after {retry} attempts")
+        _metrics.record_failure(url)
+        return None
+    
+    async def process_article(self, art):
+        """异步处理单篇文章：获取 DOI，再获取 CrossRef 引文信息"""
+        # DOI 解析阶段未能解析的文章才抓取页面
+        doi = art['doi'] if 'doi' in art else await self.article_doi(art.get('artid', ''))
+        citation = self.bulk_metadata.get(doi) if doi else {}
+        if doi and not citation:
+            citation = await self.crossref_citation(doi)
+        return build_article_record(art, doi, citation)
+    
+    async def refresh_volatile_fields(self, record):
+        """异步版 refresh_volatile_fields()"""
+        doi = record.get('doi', '')
+        citation = self.bulk_metadata.get(doi.lower()) or await self.crossref_citation(doi)
+        for field in VOLATILE_FIELDS:
+            if field in citation:
+                record[field] = citation[field]
+        return record
+    
+    async def aclose(self):
+        for client, _ in self._clients.values():
+            await client.aclose()
+        self._cache_executor.shutdown(wait=True)
+
+def run_async_engine(articles, to_refresh, on_result, bulk_metadata=None):
+    """
+    用 AsyncFetchEngine 处理全部文章，结果完成一条回调一条
+    
+    Args:
+        articles: 需要完整抓取的文章
+        to_refresh: 只刷新易变字段的已有记录
+        on_result: 回调函数，参数为一条完成的记录（在事件循环线程中调用）
+        bulk_metadata: CrossRef 批量查询结果（小写 DOI -> 引文信息）
+    """
+    async def run():
+        engine = AsyncFetchEngine(bulk_metadata)
+        try:
+            tasks = {}
+            for art in articles:
+                tasks[asyncio.ensure_future(engine.process_article(art))] = art.get('artid', '')
+            for record in to_refresh:
+                tasks[asyncio.ensure_future(engine.refresh_volatile_fields(record))] = record.get('art_id', '')
+            
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        on_result(task.result())
+                    except Exception as e:
+                        logger.error(f"Error processing article {tasks[task]}: {e}")
+        finally:
+            await engine.aclose()
+    
+    asyncio.run(run())
+
+def fold_text(text):
+    """
+    小写并去除重音（NFKD 分解后去掉组合符号），与 findsj.ado 中
+    ustrregexra(ustrnormalize(ustrlower(s), "nfkd"), "\\p{M}", "") 一致
+    
+    Args:
+        text: 原始文本
+    
+    Returns:
+        str: 规范化后的文本
+    """
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    return ''.join(ch for ch in text if not unicodedata.category(ch).startswith('M'))
+
+def author_tokens(authors):
+    """
+    作者名词项：规范化后按非字母数字切分，首尾补空格，
+    findsj_author_match 可直接用 strpos(author_tokens, " 词 ") 做整词匹配
+    
+    Args:
+        authors: 作者字符串（"Family, Given; ..."）
+    
+    Returns:
+        str: 如 " baum christopher f cox nicholas j "
+    """
+    tokens = AUTHOR_TOKEN_PATTERN.sub(' ', fold_text(authors)).split()
+    return f" {' '.join(tokens)} " if tokens else ''
+
+def fold_name(text):
+    """姓名规范化：去重音、小写，非字母数字换成空格（与 author_tokens() 的切分一致）"""
+    return ' '.join(AUTHOR_TOKEN_PATTERN.sub(' ', fold_text(text)).split())
+
+def author_key(family, given):
+    """
+    作者键：规范化的姓加名的首字母
+    
+    Returns:
+        str: 如 ('Cox', 'Nicholas J.')、('Cox', 'N. J.')、('Cox', 'Nick') 都得到 'cox n'
+    """
+    return f"{fold_name(family)} {fold_name(given)[:1]}".strip()
+
+def author_table_rows(record):
+    """
+    一条记录的作者维度行（作者顺序即 authors 中的顺序）
+    
+    Returns:
+        list: [(art_id, position, family, given, initials, author_key), ...]
+    """
+    return [(record['art_id'], position, family, given, author_initials(given), author_key(family, given))
+            for position, (family, given) in enumerate(citation_authors(record), 1)]
+
+def add_search_columns(df):
+    """
+    为 findsj.dta 添加离线检索用的预计算列（SEARCH_COLUMNS 和 author_tokens）
+    
+    Args:
+        df: 数据库 DataFrame（RECORD_SCHEMA 各列）
+    
+    Returns:
+        pd.DataFrame: 添加了检索列的 DataFrame
+    """
+    for column, source in SEARCH_COLUMNS.items():
+        df[column] = df[source].map(fold_text)
+    df['author_tokens'] = df['authors'].map(author_tokens)
+    return df
+
+def compact_stata_types(df):
+    """
+    整数列转换为能容纳其取值的最小 Stata 类型（byte/int/long）
+    
+    文本列的存储类型见 stata_strl_columns()。
+    
+    Args:
+        df: 待写出的 DataFrame
+    
+    Returns:
+        pd.DataFrame: 转换后的 DataFrame
+    """
+    for column in df.columns:
+        if not pd.api.types.is_integer_dtype(df[column]):
+            continue
+        low, high = (df[column].min(), df[column].max()) if len(df) else (0, 0)
+        for dtype, type_min, type_max in STATA_INT_TYPES:
+            if type_min <= low and high <= type_max:
+                df[column] = df[column].astype(dtype)
+                break
+    return df
+
+def stata_strl_columns(df):
+    """
+    选择写为 strL 的文本列
+    
+    str# 列每行占最长值的宽度；长短悬殊的列（标题、作者、引文）写为 strL 更小：
+    每行只占一个引用，相同的值只存一次。按两种写法的字节数逐列比较，取较小者；
+    超过 STATA_STR_MAX_WIDTH 的列只能写为 strL，STATA_KEY_COLUMNS 始终写为 str#。
+    
+    Args:
+        df: 待写出的 DataFrame
+    
+    Returns:
+        list: 传给 to_stata(convert_strl=...) 的列名
+    """
+    columns = []
+    for column in df.columns:
+        if column in STATA_KEY_COLUMNS or not pd.api.types.is_string_dtype(df[column]):
+            continue
+        sizes = [len(value.encode('utf-8')) for value in df[column].drop_duplicates() if value]
+        width = max(sizes, default=0)
+        strl_bytes = STATA_STRL_REF_BYTES * len(df) + sum(size + STATA_STRL_GSO_OVERHEAD for size in sizes)
+        if width > STATA_STR_MAX_WIDTH or strl_bytes < width * len(df):
+            columns.append(column)
+    return columns
+
+def write_split_files(database, core_path=CORE_PATH, text_path=TEXT_PATH):
+    """
+    将数据库拆分写出：findsj_core.dta（CORE_COLUMNS 中的短字段）和 findsj_text.dta
+    （TEXT_COLUMNS，按 art_id 排序，findsj.ado 用 findsj_sorted_range 按键读取一行）
+    
+    Args:
+        database: add_search_columns() 处理后的数据库 DataFrame
+        core_path: 核心文件路径
+        text_path: 长文本文件路径
+    """
+    core = database[CORE_COLUMNS]
+    core.to_stata(str(core_path), write_index=False, version=118, convert_strl=stata_strl_columns(core),
+                  data_label="findsj core fields")
+    text = database[TEXT_COLUMNS].sort_values('art_id', ignore_index=True)
+    text.to_stata(str(text_path), write_index=False, version=118, convert_strl=stata_strl_columns(text),
+                  data_label="findsj abstracts and citations, sorted by art_id")
+
+def stem_token(token):
+    """
+    轻量词干提取（规则见 STEM_SUFFIXES）
+    
+    Args:
+        token: 小写词
+    
+    Returns:
+        str: 词干，如 regressions -> regress，estimated -> estimat
+    """
+    if token.endswith('ies') and len(token) > 4:
+        token = token[:-3] + 'y'
+    elif token.endswith('sses'):
+        token = token[:-2]
+    elif token.endswith('s') and not token.endswith(('ss', 'us', 'is')) and len(token) > 3:
+        token = token[:-1]
+    
+    for suffix in STEM_SUFFIXES:
+        if token.endswith(suffix):
+            if len(token) - len(suffix) >= STEM_MIN_LENGTH:
+                token = token[:-len(suffix)]
+            break
+    return token
+
+def index_terms(text):
+    """
+    文本 -> 检索词项：规范化（去重音、小写、只保留字母数字）、去停用词和单字符、
+    词干提取，超过 INDEX_TERM_MAX_LENGTH 的截断
+    
+    Returns:
+        list: 词项（保持出现顺序，可重复）
+    """
+    return [stem_token(token)[:INDEX_TERM_MAX_LENGTH] for token in normalize_title(text).split()
+            if len(token) > 1 and token not in SEARCH_STOPWORDS]
+
+def build_related_articles(records, top_k=RELATED_TOP_K, block_size=RELATED_BLOCK_SIZE,
+                           min_score=RELATED_MIN_SCORE):
+    """
+    相关文章表：标题和摘要的 TF-IDF 向量（稀疏矩阵）两两余弦相似度，每篇文章取最相似的 top_k 篇
+    
+    词项由 index_terms() 生成，标题按 RELATED_FIELD_WEIGHTS 加权；tf 取 1 + log(tf)，
+    idf 取平滑的 log((1 + n) / (1 + df)) + 1。相似度按 block_size 行分块计算，
+    每块只生成 block_size × n 的稠密矩阵，内存不随文章数平方增长。
+    
+    Args:
+        records: 记录（含 art_id、title、abstract），行顺序即输出顺序
+        top_k: 每篇文章保留的相关文章数
+        block_size: 每块计算的文章数
+        min_score: 相似度不超过该值的不保留
+    
+    Returns:
+        DataFrame: art_id, rank, related_id, score（按 art_id 输出顺序和 rank 排列）
+    """
+    if sparse is None:
+        raise RuntimeError("Related-article export requires scipy (pip install scipy)")
+    art_ids = [record['art_id'] for record in records]
+    vocabulary = {}
+    rows, columns, values = [], [], []
+    for row, record in enumerate(records):
+        counts = {}
+        for field, weight in RELATED_FIELD_WEIGHTS.items():
+            for term in index_terms(record.get(field, '')):
+                counts[term] = counts.get(term, 0) + weight
+        for term, count in counts.items():
+            rows.append(row)
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+            values.append(count)
+    
+    n = len(records)
+    top_k = min(top_k, n - 1)
+    if top_k <= 0 or not vocabulary:
+        return pd.DataFrame({'art_id': [], 'rank': [], 'related_id': [], 'score': []})
+    
+    matrix = sparse.csr_matrix((np.asarray(values, dtype=np.float32), (rows, columns)),
+                               shape=(n, len(vocabulary)))
+    matrix.data = 1 + np.log(matrix.data)
+    df = np.bincount(matrix.indices, minlength=len(vocabulary))
+    matrix = matrix @ sparse.diags((np.log((1 + n) / (1 + df)) + 1).astype(np.float32))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = (sparse.diags((1 / norms).astype(np.float32)) @ matrix).tocsr()
+    transposed = matrix.T.tocsr()
+    
+    pairs = {'art_id': [], 'rank': [], 'related_id': [], 'score': []}
+    for start in range(0, n, block_size):
+        block = (matrix[start:start + block_size] @ transposed).toarray()
+        size = len(block)
+        # 排除文章自身
+        block[np.arange(size), np.arange(start, start + size)] = -1
+        top = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+        scores = np.take_along_axis(block, top, axis=1)
+        for offset in range(size):
+            # 相似度降序，相同时按输出顺序
+            order = np.lexsort((top[offset], -scores[offset]))
+            rank = 0
+            for index in order:
+                score = float(scores[offset, index])
+                if score <= min_score:
+                    break
+                rank += 1
+                pairs['art_id'].append(art_ids[start + offset])
+                pairs['rank'].append(rank)
+                pairs['related_id'].append(art_ids[top[offset, index]])
+                pairs['score'].append(round(score, 4))
+    return pd.DataFrame(pairs)
+
+def temporary_path(path):
+    """导出时先写入的临时文件（成功后再替换正式文件）"""
+    return path.with_name(path.name + '.tmp')
+
+class Exporter:
+    """
+    导出器基类
+    
+    export_records() 对所有导出器只遍历一次记录：open() -> write(batch) ... -> close()，
+    出错时调用 abort()。子类写入临时文件，close() 成功后才替换正式文件，
+    中途失败不会留下写了一半的输出。
+    
+    按批写出只对 parquet、sqlite、jsonl 有效，它们的内存占用与记录数无关。dta、authors、cite、
+    related 需要完整的表（to_stata 写整个 DataFrame，相关文章需要全部文章），在 close() 前保存
+    全部行，峰值内存与一次构建整个 DataFrame 相同，随文章数线性增长。
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tmp_path = temporary_path(self.path)
+    
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+    
+    def write(self, batch):
+        """写入一批记录（normalize_record() 规范化后的字典）"""
+        raise NotImplementedError
+    
+    def close(self):
+        self.tmp_path.replace(self.path)
+    
+    def abort(self):
+        self.tmp_path.unlink(missing_ok=True)
+    
+    def outputs(self):
+        """导出器生成的全部文件"""
+        return [self.path]
+    
+    def describe(self):
+        """日志中的输出说明"""
+        return f"{self.path}"
+
+class StataExporter(Exporter):
+    """
+    findsj.dta（全部列 + 检索列）及拆分文件 findsj_core.dta、findsj_text.dta（见 write_split_files()）
+    
+    to_stata 需要完整的 DataFrame，因此该导出器在 close() 前保存全部行，不降低峰值内存。
+    """
+    
+    def __init__(self, path=DATABASE_PATH, core_path=CORE_PATH, text_path=TEXT_PATH):
+        super().__init__(path)
+        self.core_path = Path(core_path)
+        self.text_path = Path(text_path)
+        self._rows = []
+    
+    def write(self, batch):
+        self._rows.extend([record[name] for name in RECORD_COLUMNS] for record in batch)
+    
+    def close(self):
+        database = pd.DataFrame(self._rows, columns=RECORD_COLUMNS)
+        self._rows = []
+        database = compact_stata_types(add_search_columns(database))
+        database.to_stata(str(self.tmp_path), write_index=False, version=118,
+                          convert_strl=stata_strl_columns(database))
+        core_tmp, text_tmp = temporary_path(self.core_path), temporary_path(self.text_path)
+        write_split_files(database, core_tmp, text_tmp)
+        super().close()
+        core_tmp.replace(self.core_path)
+        text_tmp.replace(self.text_path)
+    
+    def abort(self):
+        super().abort()
+        temporary_path(self.core_path).unlink(missing_ok=True)
+        temporary_path(self.text_path).unlink(missing_ok=True)
+    
+    def outputs(self):
+        return [self.path, self.core_path, self.text_path]
+    
+    def describe(self):
+        return f"Main database saved: {self.path} (split: {self.core_path.name}, {self.text_path.name})"
+
+class AuthorTableExporter(Exporter):
+    """
+    作者维度表 findsj_authors.dta（art_id、position、family、given、initials、author_key）
+    和作者名词项倒排表 findsj_author_index.dta（term -> art_id，词项与 author_tokens() 相同，
+    findsj_author_match 按词项查找即可得到与逐行匹配相同的结果）
+    
+    与 StataExporter 相同，close() 前保存全部作者行和词项。
+    """
+    
+    COLUMNS = ['art_id', 'position', 'family', 'given', 'initials', 'author_key']
+    
+    def __init__(self, path=AUTHORS_PATH, index_path=AUTHOR_INDEX_PATH):
+        super().__init__(path)
+        self.index_path = Path(index_path)
+        self._rows = []
+        self._postings = set()
+        self.rows = self.authors = self.postings = 0
+    
+    def write(self, batch):
+        for record in batch:
+            self._rows.extend(author_table_rows(record))
+            self._postings.update((term, record['art_id']) for term in author_tokens(record['authors']).split())
+    
+    def close(self):
+        authors = pd.DataFrame(self._rows, columns=self.COLUMNS)
+        authors = compact_stata_types(authors.sort_values(['author_key', 'art_id', 'position'], ignore_index=True))
+        index = pd.DataFrame(sorted(self._postings), columns=['term', 'art_id'])
+        self._rows, self._postings = [], set()
+        self.rows, self.authors, self.postings = len(authors), authors['author_key'].nunique(), len(index)
+        authors.to_stata(
+            str(self.tmp_path), write_index=False, version=118,
+            data_label="findsj authors: one row per article and author",
+            variable_labels={
+                'art_id': 'article id (findsj.dta art_id)',
+                'position': 'author position in the byline',
+                'family': 'family name',
+                'given': 'given names',
+                'initials': 'initials of the given names',
+                'author_key': 'folded family name and first initial',
+            },
+        )
+        index_tmp = temporary_path(self.index_path)
+        index.to_stata(
+            str(index_tmp), write_index=False, version=118,
+            data_label="findsj author index: name token -> art_id",
+            variable_labels={'term': 'folded author-name token', 'art_id': 'article id (findsj.dta art_id)'},
+        )
+        super().close()
+        index_tmp.replace(self.index_path)
+    
+    def abort(self):
+        super().abort()
+        temporary_path(self.index_path).unlink(missing_ok=True)
+    
+    def outputs(self):
+        return [self.path, self.index_path]
+    
+    def describe(self):
+        return (f"Author table saved: {self.path} ({self.rows} rows, {self.authors} distinct authors; "
+                f"{self.index_path.name}: {self.postings} postings)")
+
+class CitationExporter(Exporter):
+    """
+    引文包 findsj_cite.dta：art_id 加每种 CITATION_STYLES 格式一列（strL），
+    findsj 的 BibTeX/RIS 按钮和 Ref 按 art_id 读取，不再逐篇请求 CrossRef 或 stata-journal.com
+    
+    与 StataExporter 相同，close() 前保存全部引文。
+    """
+    
+    def __init__(self, path=CITE_PATH):
+        super().__init__(path)
+        self.columns = ['art_id'] + [f"cite_{style}" for style in CITATION_STYLES]
+        self._rows = []
+        self.rows = 0
+    
+    def write(self, batch):
+        self._rows.extend([record['art_id']] + [render(record) for render in CITATION_STYLES.values()]
+                          for record in batch)
+    
+    def close(self):
+        citations = pd.DataFrame(self._rows, columns=self.columns)
+        self._rows = []
+        citations.to_stata(
+            str(self.tmp_path), write_index=False, version=118, convert_strl=self.columns[1:],
+            data_label="findsj citations by art_id",
+            variable_labels={'art_id': 'article id (findsj.dta art_id)',
+                             **{f"cite_{style}": f"{style} citation" for style in CITATION_STYLES}},
+        )
+        self.rows = len(citations)
+        super().close()
+    
+    def describe(self):
+        return f"Citation bundle saved: {self.path} ({', '.join(CITATION_STYLES)} for {self.rows} articles)"
+
+class RelatedArticlesExporter(Exporter):
+    """
+    相关文章表 findsj_related.dta（见 build_related_articles()），只保存计算需要的字段
+    
+    输出按 art_id、rank 排序：findsj_show_ref 用 findsj_sorted_range 二分查找一篇文章的行，
+    不必读入整个文件。相似度需要全部文章才能计算，close() 前保存全部记录的这些字段。
+    """
+    
+    def __init__(self, path=RELATED_PATH):
+        if sparse is None:
+            raise RuntimeError("Related-article export requires scipy (pip install scipy)")
+        super().__init__(path)
+        self._records = []
+        self.rows = 0
+    
+    def write(self, batch):
+        self._records.extend({field: record[field] for field in ('art_id', *RELATED_FIELD_WEIGHTS)}
+                             for record in batch)
+    
+    def close(self):
+        related = build_related_articles(self._records)
+        related = related.sort_values(['art_id', 'rank'], ignore_index=True)
+        self._records = []
+        self.rows = len(related)
+        related.astype({'rank': 'int8', 'score': 'float32'}).to_stata(
+            str(self.tmp_path), write_index=False, version=118,
+            data_label="findsj related articles: art_id -> related_id",
+            variable_labels={
+                'art_id': 'article id (findsj.dta art_id)',
+                'rank': 'rank of the related article (1 = most similar)',
+                'related_id': 'art_id of the related article',
+                'score': 'TF-IDF cosine similarity of title and abstract',
+            },
+        )
+        super().close()
+    
+    def describe(self):
+        return f"Related articles saved: {self.path} ({self.rows} pairs, top {RELATED_TOP_K} per article)"
+
+class ParquetExporter(Exporter):
+    """Parquet（列式存储，zstd 压缩），按批写入 row group；需要 pyarrow"""
+    
+    def __init__(self, path=PARQUET_PATH):
+        if pa is None:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        super().__init__(path)
+        self.schema = pa.schema([(name, pa.int32() if kind is int else pa.string())
+                                 for name, kind in RECORD_SCHEMA])
+        self._writer = None
+    
+    def open(self):
+        super().open()
+        self._writer = pq.ParquetWriter(str(self.tmp_path), self.schema, compression='zstd')
+    
+    def write(self, batch):
+        self._writer.write_table(pa.Table.from_pylist(batch, schema=self.schema))
+    
+    def close(self):
+        self._writer.close()
+        super().close()
+    
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        super().abort()
+    
+    def describe(self):
+        return f"Parquet export saved: {self.path}"
+
+class SQLiteExporter(Exporter):
+    """
+    SQLite 数据库：articles 表（RECORD_SCHEMA 各列）和 FTS5 全文索引 articles_fts
+    （title、authors、abstract；porter 词干 + 去重音）
+    
+    查询示例：
+        SELECT a.art_id, a.title FROM articles_fts f JOIN articles a ON a.rowid = f.rowid
+        WHERE articles_fts MATCH 'propensity score' ORDER BY bm25(articles_fts) LIMIT 10
+    """
+    
+    def __init__(self, path=SQLITE_PATH):
+        super().__init__(path)
+        self._conn = None
+    
+    def open(self):
+        super().open()
+        self.tmp_path.unlink(missing_ok=True)
+        self._conn = sqlite3.connect(str(self.tmp_path))
+        columns = ', '.join(
+            f"{name} {'INTEGER' if kind is int else 'TEXT'} NOT NULL" + (' UNIQUE' if name == 'art_id' else '')
+            for name, kind in RECORD_SCHEMA
+        )
+        self._conn.execute(f'CREATE TABLE articles ({columns})')
+        self._conn.execute(
+            f"CREATE VIRTUAL TABLE articles_fts USING fts5({', '.join(SQLITE_FTS_COLUMNS)}, "
+            f"content='articles', content_rowid='rowid', tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        self._insert = (f"INSERT INTO articles ({', '.join(RECORD_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(RECORD_COLUMNS))})")
+    
+    def write(self, batch):
+        self._conn.executemany(self._insert, ([record[name] for name in RECORD_COLUMNS] for record in batch))
+    
+    def close(self):
+        self._conn.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+        self._conn.execute('CREATE INDEX articles_doi ON articles(doi)')
+        self._conn.commit()
+        self._conn.close()
+        super().close()
+    
+    def abort(self):
+        if self._conn is not None:
+            self._conn.close()
+        super().abort()
+    
+    def describe(self):
+        return f"SQLite export saved: {self.path} (FTS5 on {', '.join(SQLITE_FTS_COLUMNS)})"
+
+class JsonLinesExporter(Exporter):
+    """gzip 压缩的 JSON Lines，每行一条记录（gzip 头不含时间戳，内容相同时文件字节相同）"""
+    
+    def __init__(self, path=JSONL_PATH):
+        super().__init__(path)
+        self._raw = None
+        self._file = None
+    
+    def open(self):
+        super().open()
+        self._raw = open(self.tmp_path, 'wb')
+        self._file = io.TextIOWrapper(gzip.GzipFile(filename='', mode='wb', fileobj=self._raw, mtime=0),
+                                      encoding='utf-8', newline='\n')
+    
+    def write(self, batch):
+        self._file.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in batch)
+    
+    def close(self):
+        self._file.close()
+        self._raw.close()
+        super().close()
+    
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+        super().abort()
+    
+    def describe(self):
+        return f"JSON Lines export saved: {self.path}"
+
+class DatabaseSummary:
+    """
+    汇总统计，与导出器一起接收记录批次（不写文件）
+    
+    结果见 stats：文章数、DOI/引文/作者/摘要覆盖数、年份范围、引用次数及被引最多的 10 篇文章
+    （引用次数相同时按输出顺序）。
+    """
+    
+    def __init__(self):
+        self.stats = {}
+        self._count = 0
+        self._totals = dict.fromkeys(('doi', 'citation_apa', 'authors', 'abstract'), 0)
+        self._year_min = self._year_max = None
+        self._citations = 0
+        self._top = []
+    
+    def open(self):
+        pass
+    
+    def write(self, batch):
+        for record in batch:
+            for field in self._totals:
+                if record[field]:
+                    self._totals[field] += 1
+            year = record['year']
+            self._year_min = year if self._year_min is None else min(self._year_min, year)
+            self._year_max = year if self._year_max is None else max(self._year_max, year)
+            self._citations += record['cited_by_count']
+            item = (record['cited_by_count'], -self._count, record['title'], year)
+            if len(self._top) < 10:
+                heapq.heappush(self._top, item)
+            else:
+                heapq.heappushpop(self._top, item)
+            self._count += 1
+    
+    def close(self):
+        self.stats = {
+            'total_articles': self._count,
+            'articles_with_doi': self._totals['doi'],
+            'articles_with_citation': self._totals['citation_apa'],
+            'articles_with_authors': self._totals['authors'],
+            'articles_with_abstract': self._totals['abstract'],
+            'year_min': self._year_min or 0,
+            'year_max': self._year_max or 0,
+            'average_citations': self._citations / self._count if self._count else 0.0,
+            'total_citations': self._citations,
+            'top_cited': [{'title': title, 'cited_by_count': count, 'year': year}
+                          for count, _, title, year in sorted(self._top, reverse=True)],
+        }
+    
+    def abort(self):
+        pass
+
+# 导出格式 -> 导出器（路径取模块级配置）
+EXPORTERS = {
+    'dta': lambda: StataExporter(DATABASE_PATH, CORE_PATH, TEXT_PATH),
+    'authors': lambda: AuthorTableExporter(AUTHORS_PATH, AUTHOR_INDEX_PATH),
+    'cite': lambda: CitationExporter(CITE_PATH),
+    'related': lambda: RelatedArticlesExporter(RELATED_PATH),
+    'parquet': lambda: ParquetExporter(PARQUET_PATH),
+    'sqlite': lambda: SQLiteExporter(SQLITE_PATH),
+    'jsonl': lambda: JsonLinesExporter(JSONL_PATH),
+}
+
+def export_records(records, consumers, batch_size=EXPORT_BATCH_SIZE):
+    """
+    导出阶段：对记录只遍历一次，按批分发给全部导出器
+    
+    分批只省去重复读取暂存库；需要完整表的导出器仍在内存中保存全部行（见 Exporter）。
+    
+    Args:
+        records: 数据库记录（按输出顺序）
+        consumers: 导出器（及 DatabaseSummary）列表
+        batch_size: 每批记录数
+    """
+    for consumer in consumers:
+        consumer.open()
+    try:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                for consumer in consumers:
+                    consumer.write(batch)
+                batch = []
+        if batch:
+            for consumer in consumers:
+                consumer.write(batch)
+        for consumer in consumers:
+            consumer.close()
+    except BaseException:
+        for consumer in consumers:
+            consumer.abort()
+        raise
+
+def record_hash(record):
+    """记录内容哈希（RECORD_COLUMNS 各列的规范 JSON 的 SHA-1），用于清单和增量同步"""
+    payload = json.dumps([record[name] for name in RECORD_COLUMNS], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def diff_records(records, previous):
+    """
+    与上一版数据库逐条、逐字段比较
+    
+    Args:
+        records: 本次的数据库记录（按输出顺序）
+        previous: load_existing_database() 返回的上一版记录
+    
+    Returns:
+        tuple: (changes, hashes)
+            changes: 变更说明（写入 changes.json）：新增、删除的 art_id，修改记录的字段
+                [旧值, 新值]；只有 VOLATILE_FIELDS 变化的修改不算有意义的变更
+            hashes: art_id -> record_hash()，按输出顺序
+    """
+    hashes = {}
+    added, modified = [], []
+    volatile_only = 0
+    for record in records:
+        art_id = record['art_id']
+        hashes[art_id] = record_hash(record)
+        old = previous.get(art_id)
+        if old is None:
+            added.append(art_id)
+            continue
+        old = normalize_record(old)
+        fields = {name: [old[name], record[name]] for name in RECORD_COLUMNS if old[name] != record[name]}
+        if fields:
+            modified.append({'art_id': art_id, 'fields': fields})
+            if set(fields) <= set(VOLATILE_FIELDS):
+                volatile_only += 1
+    removed = sorted(set(previous) - set(hashes))
+    changes = {
+        'meaningful': bool(added or removed or len(modified) > volatile_only),
+        'previous_articles': len(previous),
+        'total_articles': len(hashes),
+        'counts': {
+            'added': len(added),
+            'removed': len(removed),
+            'modified': len(modified),
+            'volatile_only': volatile_only,
+        },
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+    }
+    return changes, hashes
+
+def dataset_checksum(hashes):
+    """
+    数据集校验和：按 art_id 排序后各记录哈希的 SHA-256，与文件格式和行顺序无关
+    
+    Args:
+        hashes: art_id -> record_hash()
+    """
+    digest = hashlib.sha256()
+    for art_id in sorted(hashes):
+        digest.update(f"{art_id}\t{hashes[art_id]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+def write_json(path, data, indent=1):
+    """原子写出 JSON 文件（先写临时文件再替换）"""
+    path = Path(path)
+    tmp_path = temporary_path(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.write('\n')
+    tmp_path.replace(path)
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    读取上一次写出的内容清单
+    
+    Returns:
+        dict: 清单内容；文件不存在或无法解析时返回空字典
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_change_files(changes, hashes, version, manifest_path=MANIFEST_PATH, changes_path=CHANGES_PATH):
+    """
+    写出内容清单（art_id -> 哈希）和本次的变更说明
+    
+    Args:
+        changes, hashes: diff_records() 的返回值
+        version: 数据版本号（内容有变化时加 1）
+        manifest_path: 清单路径
+        changes_path: changes.json 路径
+    """
+    generated = datetime.now().isoformat(timespec='seconds')
+    write_json(manifest_path, {
+        'generated': generated,
+        'version': version,
+        'checksum': dataset_checksum(hashes),
+        'hash': 'sha1',
+        'columns': RECORD_COLUMNS,
+        'total_articles': len(hashes),
+        'records': hashes,
+    })
+    write_json(changes_path, {'generated': generated, 'version': version, **changes})
+
+def publish_patch(records, changes, hashes, version, base_manifest, base_hashes, patch_dir=PATCH_DIR,
+                  keep=PATCH_KEEP):
+    """
+    发布从上一版到本版的补丁（只含新增/修改的整行和删除的 art_id），并更新 patches/index.json
+    
+    补丁为 gzip 压缩的 JSON：
+        {"format", "version", "base_version", "base_checksum", "checksum",
+         "columns", "upserts": [[列值...], ...], "removed": [art_id, ...]}
+    客户端（findsj_sync.py）从本地数据的校验和出发，沿 base_checksum 串起补丁链，
+    逐个应用并核对 checksum。只保留最近 keep 个补丁，更早的客户端改为下载完整数据库。
+    
+    Args:
+        records: 本次的数据库记录（按输出顺序）
+        changes, hashes: diff_records() 的返回值
+        version: 本版版本号
+        base_manifest: 上一版清单（load_manifest()）
+        base_hashes: 上一版数据库（load_existing_database()）各记录的 record_hash()
+        patch_dir: 补丁目录
+        keep: 保留的补丁个数
+    
+    Returns:
+        Path: 补丁文件路径；没有可用的上一版时只更新 index.json，返回 None
+    """
+    patch_dir = Path(patch_dir)
+    patch_dir.mkdir(parents=True, exist_ok=True)
+    index_path = patch_dir / PATCH_INDEX_NAME
+    patches = [p for p in load_manifest(index_path).get('patches', []) if p['version'] < version]
+    checksum = dataset_checksum(hashes)
+    base_checksum = dataset_checksum(base_hashes)
+    
+    patch_path = None
+    if base_manifest.get('version') and base_manifest.get('checksum') == base_checksum:
+        upsert_ids = set(changes['added']) | {item['art_id'] for item in changes['modified']}
+        patch = {
+            'format': PATCH_FORMAT,
+            'version': version,
+            'base_version': base_manifest['version'],
+            'base_checksum': base_checksum,
+            'checksum': checksum,
+            'columns': RECORD_COLUMNS,
+            'upserts': [[record[name] for name in RECORD_COLUMNS] for record in records
+                        if record['art_id'] in upsert_ids],
+            'removed': changes['removed'],
+        }
+        payload = json.dumps(patch, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # mtime=0：内容相同时补丁文件字节相同
+        data = gzip.compress(payload, mtime=0)
+        patch_path = patch_dir / f"findsj-patch-{version:05d}.json.gz"
+        tmp_path = temporary_path(patch_path)
+        tmp_path.write_bytes(data)
+        tmp_path.replace(patch_path)
+        patches.append({
+            'version': version,
+            'base_version': patch['base_version'],
+            'base_checksum': base_checksum,
+            'checksum': checksum,
+            'file': patch_path.name,
+            'bytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'counts': {'upserts': len(patch['upserts']), 'removed': len(patch['removed'])},
+        })
+    elif base_manifest:
+        logger.warning("Previous manifest out of sync with findsj.dta; no patch published "
+                       "for this version (clients will download the full database)")
+    
+    for old in patches[:-keep]:
+        (patch_dir / old['file']).unlink(missing_ok=True)
+    write_json(index_path, {
+        'format': PATCH_FORMAT,
+        'latest': {'version': version, 'checksum': checksum, 'total_articles': len(hashes)},
+        'patches': patches[-keep:],
+    })
+    return patch_path
+
+def write_version_file(stats, path=VERSION_PATH, updated=None):
+    """
+    写出版本信息文件 findsj_version.dta（findsj 的版本检查读取该文件）
+    
+    Args:
+        stats: DatabaseSummary.stats
+        path: 输出路径
+        updated: 数据更新时间（datetime，默认当前时间）
+    """
+    updated = updated or datetime.now()
+    pd.DataFrame([{
+        'update_date': updated.strftime('%Y-%m-%d'),
+        'update_time': updated.strftime('%H:%M:%S'),
+        'total_articles': stats['total_articles'],
+        'articles_with_doi': stats['articles_with_doi'],
+        'articles_with_citation': stats['articles_with_citation'],
+        'year_min': stats['year_min'],
+        'year_max': stats['year_max'],
+    }]).to_stata(str(path), write_index=False, version=118)
+
+def iter_async_results(articles, to_refresh, bulk_metadata=None):
+    """
+    在后台线程中运行 AsyncFetchEngine，按完成顺序逐条产出记录
+    
+    Yields:
+        dict: 完成的记录
+    """
+    results = queue.Queue()
+    finished = object()
+    failure = []
+    
+    def worker():
+        try:
+            run_async_engine(articles, to_refresh, results.put, bulk_metadata)
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            results.put(finished)
+    
+    thread = threading.Thread(target=worker, name='async-fetch-engine', daemon=True)
+    thread.start()
+    while True:
+        item = results.get()
+        if item is finished:
+            break
+        yield item
+    thread.join()
+    if failure:
+        raise failure[0]
+
+def needs_web_enrichment(record):
+    """记录是否需要网页补充（有 DOI，且 WEB_ENRICH_FIELDS 中有空字段）"""
+    return bool(record.get('doi')) and not all(record.get(field) for field in WEB_ENRICH_FIELDS)
+
+def merge_web_info(record, info):
+    """
+    把 parse_web_info() 的结果并入记录：CrossRef 优先，只填补为空的 WEB_ENRICH_FIELDS
+    
+    Returns:
+        list: 填补的字段
+    """
+    filled = []
+    for field in WEB_ENRICH_FIELDS:
+        if not record.get(field) and info.get(field):
+            record[field] = info[field]
+            filled.append(field)
+    return filled
+
+def sage_page_url(doi):
+    """SAGE 文章页 URL"""
+    return f"{SAGE_URL}/doi/{doi}"
+
+def get_web_page(doi, retry=None):
+    """
+    抓取一篇文章的 SAGE 页面
+    
+    与 CrossRef 查询相同，429、5xx 和连接错误按 REQUEST_RETRIES/RETRY_BACKOFF 重试；
+    其他 4xx 不重试。放弃的抓取记入运行指标的 failures。
+    
+    Args:
+        doi: 文章 DOI
+        retry: 重试次数（默认 REQUEST_RETRIES）
+    
+    Returns:
+        str: 页面 HTML；失败时返回 None
+    """
+    url = sage_page_url(doi)
+    retry = REQUEST_RETRIES if retry is None else retry
+    
+    for attempt in range(retry):
+        if attempt:
+            _metrics.record_retry(url)
+        try:
+            response = http_get(url, 'sage', headers=HEADERS, timeout=REQUEST_TIMEOUTS['sage'])
+            
+            # 429：限速器已按 Retry-After 暂停该主机并降低速率，下一次尝试会自动等待
+            if response.status_code == 429:
+                logger.warning(f"Rate limit hit for SAGE page of DOI {doi} (attempt {attempt + 1}/{retry})")
+                continue
+            
+            if response.status_code >= 500:
+                logger.warning(f"Attempt {attempt + 1}/{retry} failed for SAGE page of DOI {doi}: "
+                               f"HTTP {response.status_code}")
+                if attempt < retry - 1:
+                    time.sleep(RETRY_BACKOFF * 2 ** attempt)  # 指数退避
+                continue
+            
+            response.raise_for_status()
+            return response.text
+            
+        except OfflineCacheMiss:
+            logger.debug(f"SAGE page for DOI {doi} not cached (offline)")
+            return None
+        except requests.HTTPError as e:
+            logger.warning(f"Failed to get web info for DOI {doi}: {e}")
+            _metrics.record_failure(url)
+            return None
+        except requests.RequestException as e:
+            logger.warning(f"Attempt {attempt + 1}/{retry} failed for SAGE page of DOI {doi}: {e}")
+            if attempt < retry - 1:
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)  # 指数退避
+        except Exception as e:
+            logger.warning(f"Failed to get web info for DOI {doi}: {e}")
+            _metrics.record_failure(url)
+            return None
+    
+    logger.warning(f"Failed to get web info for DOI {doi} after {retry} attempts")
+    _metrics.record_failure(url)
+    return None
+
+def iter_web_pages(records, workers=THREAD_WORKERS):
+    """
+    抓取 SAGE 文章页，按完成顺序产出 (record, html)
+    
+    有 httpx 时用 AsyncFetchEngine.web_page()（在后台线程的事件循环中运行），
+    否则用线程池 + get_web_page()；两者按相同规则重试，抓取失败的文章跳过。
+    
+    Args:
+        records: 需要补充的记录
+        workers: 线程池后端的工作线程数
+    """
+    if httpx is None:
+        def fetch(record):
+            return get_web_page(record['doi'])
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch, record): record for record in records}
+            for future in as_completed(futures):
+                if future.result() is not None:
+                    yield futures[future], future.result()
+        return
+    
+    results = queue.Queue()
+    finished = object()
+    failure = []
+    
+    async def run():
+        engine = AsyncFetchEngine()
+        
+        async def fetch(record):
+            html = await engine.web_page(record['doi'])
+            if html is not None:
+                results.put((record, html))
+        
+        try:
+            await asyncio.gather(*(fetch(record) for record in records))
+        finally:
+            await engine.aclose()
+    
+    def worker():
+        try:
+            asyncio.run(run())
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            results.put(finished)
+    
+    thread = threading.Thread(target=worker, name='web-enrichment-fetch', daemon=True)
+    thread.start()
+    while True:
+        item = results.get()
+        if item is finished:
+            break
+        yield item
+    thread.join()
+    if failure:
+        raise failure[0]
+
+def enrich_from_web(records, workers=THREAD_WORKERS, parse_workers=None):
+    """
+    网页补充阶段：抓取 SAGE 文章页，用 parse_web_info() 解析后填补 CrossRef 缺失的摘要和页码
+    
+    抓取保持异步（iter_web_pages()），HTML 解析是 CPU 密集型，交给进程池，
+    页面一到就提交解析，抓取和解析重叠进行。
+    
+    Args:
+        records: 需要补充的记录（见 needs_web_enrichment()），原地更新
+        workers: 线程池抓取后端的工作线程数
+        parse_workers: 解析进程数（默认 CPU 核数）
+    
+    Yields:
+        tuple: (record, filled)，filled 为填补的字段（可能为空列表）
+    """
+    # 抓取线程运行时 fork 子进程可能继承被占用的锁，解析进程统一用 spawn 启动
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=parse_workers or os.cpu_count() or 1, mp_context=context) as pool:
+        futures = {pool.submit(parse_web_info, html, record['doi']): record
+                   for record, html in iter_web_pages(records, workers)}
+        for future in as_completed(futures):
+            record = futures[future]
+            try:
+                info = future.result()
+            except Exception as e:
+                logger.debug(f"Failed to parse web info for DOI {record['doi']}: {e}")
+                continue
+            yield record, merge_web_info(record, info)
+
+def set_output_dir(directory):
+    """
+    把全部输出文件（OUTPUT_PATH_NAMES）改到 directory 下，已有数据库也从该目录读取
+    
+    Args:
+        directory: 输出目录（不存在时创建）
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in OUTPUT_PATH_NAMES:
+        globals()[name] = directory / globals()[name].name
+
+def articles_from_database(existing):
+    """跳过 list 阶段时，用已有数据库中的记录作为文章列表"""
+    return [{
+        'artid': art_id,
+        'title_web': str(record.get('title', '')),
+        'volume': record.get('volume', 0),
+        'number': record.get('number', 0),
+        'year': record.get('year', 0),
+    } for art_id, record in existing.items()]
+
+def select_scope(articles, existing, artids=None, years=None):
+    """
+    限定本次处理的文章（--artids、--years），范围外的已有记录原样保留
+    
+    文章列表中没有年份，年份取自已有数据库；尚未收录的文章不属于任何年份范围。
+    
+    Args:
+        articles: 文章列表
+        existing: load_existing_database() 返回的已有记录
+        artids: 只处理这些 art_id（None 表示不限）
+        years: (起始年, 结束年)（None 表示不限）
+    
+    Returns:
+        tuple: (范围内的文章, 范围外且已有记录的 art_id)
+    """
+    if not artids and not years:
+        return articles, []
+    selected, kept = [], []
+    for art in articles:
+        art_id = art.get('artid', '')
+        year = normalize_record(existing.get(art_id, {}))['year']
+        if (not artids or art_id in artids) and (not years or years[0] <= year <= years[1]):
+            selected.append(art)
+        elif art_id in existing:
+            kept.append(art_id)
+    return selected, kept
+
+def basic_record(art, existing):
+    """
+    跳过 crossref 阶段时的记录：已有记录原样沿用，新文章只有文章列表中的基本信息
+    （DOI 未解析的文章仍抓取文章页，跳过 resolve-doi 阶段时 art['doi'] 已设为空）
+    """
+    record = existing.get(art.get('artid', ''))
+    if record is not None:
+        return dict(record)
+    doi = art['doi'] if 'doi' in art else get_article_doi_from_page(art.get('artid', ''))
+    return build_article_record(art, doi, {})
+
+def iter_basic_records(articles, existing, workers=THREAD_WORKERS):
+    """跳过 crossref 阶段时的抓取阶段：用线程池产出 basic_record()（只有新文章可能抓取文章页）"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(lambda art: basic_record(art, existing), articles)
+
+def plan_requests(articles, to_refresh, existing, stages, web_candidates):
+    """
+    估计一次运行各主机的请求数（--dry-run），不发送请求
+    
+    Args:
+        articles: 需要完整抓取的文章（已用已有数据库解析 DOI）
+        to_refresh: 只刷新易变字段的已有记录
+        existing: 已有记录
+        stages: 运行的阶段
+        web_candidates: 网页补充阶段的候选文章数（上限）
+    
+    Returns:
+        dict: 主机 -> [(请求类型, 数量, 是否为上限), ...]
+    """
+    site, crossref, sage = (urlsplit(url).netloc for url in (BASE_URL, CROSSREF_API, SAGE_URL))
+    plan = {}
+    unresolved = sum(1 for art in articles if not art.get('doi'))
+    if 'list' in stages:
+        plan.setdefault(site, []).append(('search page', 1, False))
+    if 'resolve-doi' in stages:
+        # CrossRef 标题匹配可能解析其中一部分
+        plan.setdefault(site, []).append(('article pages', unresolved, True))
+    if 'crossref' in stages:
+        lookups = len(articles) + len(to_refresh)
+        if lookups >= CROSSREF_BULK_MIN:
+            journal_size = max(len(existing), len(articles))
+            plan.setdefault(crossref, []).append(('ISSN listing pages', -(-journal_size // CROSSREF_ROWS), False))
+            plan[crossref].append(('DOI filter batches', -(-lookups // CROSSREF_DOI_BATCH), True))
+        else:
+            plan.setdefault(crossref, []).append(('single-DOI lookups', lookups, True))
+    if 'web' in stages:
+        plan.setdefault(sage, []).append(('SAGE article pages', web_candidates, True))
+    return plan
+
+def log_request_plan(plan):
+    """输出 plan_requests() 的结果和按限速上限估计的最短耗时"""
+    logger.info("Dry run: planned requests (≤ marks an upper bound)")
+    for host, items in plan.items():
+        total = sum(count for _, count, _ in items)
+        rate, max_rate = HOST_RATE_LIMITS.get(host, DEFAULT_HOST_RATE_LIMIT)
+        concurrency = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+        detail = ', '.join(f"{label} {'≤ ' if bound else ''}{count}" for label, count, bound in items)
+        logger.info(f"  {host}: {detail} (concurrency {concurrency}, {rate:g}-{max_rate:g} req/s, "
+                    f"at least {total / max_rate:.0f}s)")
+
+def shard_of(art_id, count):
+    """
+    art_id 所属的分片（0 起）：SHA-1 的前 8 位十六进制对分片数取模，与运行环境和文章列表顺序无关
+    """
+    return int(hashlib.sha1(art_id.encode('utf-8')).hexdigest()[:8], 16) % count
+
+def shard_name(shard):
+    """(序号, 分片数) -> 显示用的 I/N（序号从 1 起）"""
+    return f"{shard[0]}/{shard[1]}"
+
+def shard_file_path(shard, shard_dir=None):
+    """分片 (序号, 分片数) 的部分结果文件路径"""
+    return Path(shard_dir or SHARD_DIR) / f"findsj-shard-{shard[0]:03d}-of-{shard[1]:03d}.json.gz"
+
+def shard_journal_path(path, shard):
+    """分片运行各自的暂存库（同一目录中的多个分片互不干扰，--resume 只续跑本分片）"""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.shard-{shard[0]:03d}-of-{shard[1]:03d}{path.suffix}")
+
+def listing_checksum(articles):
+    """文章列表（art_id 集合）的校验和：合并时确认各分片划分的是同一份列表"""
+    art_ids = sorted(art.get('artid', '') for art in articles)
+    return hashlib.sha256('\n'.join(art_ids).encode('utf-8')).hexdigest()
+
+def existing_checksum(existing):
+    """已有数据库的 dataset_checksum()：合并时确认各分片与合并时比较的是同一版数据库"""
+    return dataset_checksum({art_id: record_hash(normalize_record(record)) for art_id, record in existing.items()})
+
+def write_shard_file(journal, shard, header, shard_dir=None):
+    """
+    写出分片运行的部分结果（代替 save_database()），由 merge-shards 合并
+    
+    文件为 gzip 压缩的 JSON：
+        {"format", "shard", "shards", "generated", "mode", "citations_refreshed",
+         "listing_checksum", "base_checksum", "metrics", "columns", "records": [[列值...], ...]}
+    
+    Args:
+        journal: 本分片的暂存库
+        shard: (序号, 分片数)
+        header: mode、citations_refreshed、listing_checksum、base_checksum 等字段
+        shard_dir: 输出目录（默认 SHARD_DIR）
+    
+    Returns:
+        Path: 部分结果文件路径
+    """
+    data = {
+        'format': SHARD_FORMAT,
+        'shard': shard[0],
+        'shards': shard[1],
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        **header,
+        'metrics': _metrics.to_dict(),
+        'columns': RECORD_COLUMNS,
+        'records': [[record[name] for name in RECORD_COLUMNS] for record in journal.iter_records()],
+    }
+    path = shard_file_path(shard, shard_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    tmp_path = temporary_path(path)
+    tmp_path.write_bytes(gzip.compress(payload, mtime=0))
+    tmp_path.replace(path)
+    return path
+
+def load_shard_files(shard_dir=None):
+    """
+    读取并核对全部分片的部分结果
+    
+    要求：分片数一致、序号 1..N 各出现一次、文章列表/已有数据库校验和与运行模式一致、
+    每条记录都属于所在分片且 art_id 不重复。
+    
+    Args:
+        shard_dir: 部分结果目录（默认 SHARD_DIR）
+    
+    Returns:
+        list: 按序号排列的部分结果
+    """
+    shard_dir = Path(shard_dir or SHARD_DIR)
+    paths = sorted(shard_dir.glob('findsj-shard-*-of-*.json.gz'))
+    if not paths:
+        raise ValueError(f"No shard files in {shard_dir}")
+    shards = []
+    for path in paths:
+        with gzip.open(path, 'rb') as f:
+            data = json.loads(f.read())
+        if data.get('format') != SHARD_FORMAT:
+            raise ValueError(f"Unsupported shard file format in {path.name}: {data.get('format')}")
+        data['path'] = path
+        shards.append(data)
+    shards.sort(key=lambda data: data['shard'])
+    
+    count = shards[0]['shards']
+    if any(data['shards'] != count for data in shards):
+        raise ValueError(f"Shard files in {shard_dir} come from runs with different shard counts")
+    missing = sorted(set(range(1, count + 1)) - {data['shard'] for data in shards})
+    if missing or len(shards) != count:
+        raise ValueError(f"Incomplete or duplicate shard set in {shard_dir}: expected 1..{count}"
+                         + (f", missing {', '.join(map(str, missing))}" if missing else ''))
+    for key in ('listing_checksum', 'base_checksum', 'mode'):
+        if len({data[key] for data in shards}) > 1:
+            raise ValueError(f"Shard files disagree on {key}; rerun the shards against the same "
+                             f"article list and findsj.dta")
+    
+    seen = set()
+    for data in shards:
+        art_id_column = data['columns'].index('art_id')
+        for row in data['records']:
+            art_id = row[art_id_column]
+            if art_id in seen or shard_of(art_id, count) != data['shard'] - 1:
+                raise ValueError(f"Record {art_id} in {data['path'].name} does not belong to shard "
+                                 f"{data['shard']}/{count} or appears twice")
+            seen.add(art_id)
+    return shards
+
+def save_database(journal, existing, formats=DEFAULT_EXPORT_FORMATS, force_write=False,
+                  publish_volatile=False):
+    """
+    与上一版数据库比较后写出输出文件：导出格式、内容清单、变更说明、版本信息和补丁（PUBLISH_PATCHES 时）
+    
+    只有易变字段（引用次数等）变化时，除非 publish_volatile（距上次写出已满刷新周期）
+    否则不重写输出文件，避免每次运行都提交大量二进制改动（force_write 或输出文件缺失时照常写出）。
+    没有写出的易变字段值由 report_run() 记入 update_log.json。
+    
+    Args:
+        journal: 本次运行的暂存库（全部记录）
+        existing: load_existing_database() 返回的上一版记录
+        formats: 导出格式（EXPORT_FORMATS 的子集）
+        force_write: 即使没有任何变化也重写输出文件
+        publish_volatile: 只有易变字段变化时也写出
+    
+    Returns:
+        tuple: (stats, changes, written) 汇总统计、diff_records() 的变更说明、是否写出了文件
+    """
+    with _metrics.stage('diff'):
+        changes, hashes = diff_records(journal.iter_records(), existing)
+    counts = changes['counts']
+    logger.info(f"Changes vs previous database: {counts['added']} added, {counts['removed']} removed, "
+                f"{counts['modified']} modified ({counts['volatile_only']} only in {', '.join(VOLATILE_FIELDS)})")
+    exporters = [EXPORTERS[name]() for name in formats]
+    outputs = [path for exporter in exporters for path in exporter.outputs()] + [MANIFEST_PATH]
+    written = (changes['meaningful'] or force_write or (publish_volatile and counts['volatile_only'] > 0)
+               or not all(path.exists() for path in outputs))
+    
+    # 从暂存库按输出顺序只读一遍记录，同时写出所有导出格式并汇总统计
+    summary = DatabaseSummary()
+    with _metrics.stage('write'):
+        export_records(journal.iter_records(), (exporters if written else []) + [summary])
+    stats = summary.stats
+    if written:
+        # 内容有变化时版本号加 1；PUBLISH_PATCHES 时发布从上一版到本版的补丁
+        base_manifest = load_manifest(MANIFEST_PATH)
+        version = base_manifest.get('version', 0)
+        if not version or any(counts.values()):
+            version += 1
+            if PUBLISH_PATCHES:
+                base_hashes = {art_id: record_hash(normalize_record(record)) for art_id, record in existing.items()}
+                patch_path = publish_patch(journal.iter_records(), changes, hashes, version,
+                                           base_manifest, base_hashes, PATCH_DIR)
+                if patch_path:
+                    logger.info(f"✅ Patch saved: {patch_path} ({patch_path.stat().st_size} bytes)")
+        write_change_files(changes, hashes, version, MANIFEST_PATH, CHANGES_PATH)
+        for exporter in exporters:
+            logger.info(f"✅ {exporter.describe()}")
+        logger.info(f"✅ Manifest and change list saved: {MANIFEST_PATH.name}, {CHANGES_PATH.name} (version {version})")
+    else:
+        logger.info("ℹ️ No meaningful changes; existing output files left untouched")
+    
+    # 保存版本信息文件（随 findsj.dta 一起发布）
+    if written and 'dta' in formats:
+        write_version_file(stats, VERSION_PATH)
+        logger.info(f"✅ Version info saved: {VERSION_PATH}")
+    
+    return stats, changes, written
+
+def report_run(stats, changes, written, mode, citations_refreshed, metrics_textfile=None, shards=None,
+               previous_log=None):
+    """
+    输出汇总统计，保存 update_log.json，记录阶段耗时和 HTTP 指标
+    
+    日志中 citations_refreshed 为易变字段最近一次从 CrossRef 刷新的日期，citations_published
+    为最近一次写出输出文件的日期；没有写出时本次的易变字段变化记入 pending_volatile。
     
-    # 按年份、卷号、期号排序（如果有的话，否则按art_id排序）
-    df = df.sort_values(['year', 'volume', 'number'], ascending=[True, True, True])
-    df = df.reset_index(drop=True)
-    
-    # 调整列顺序，将art_id放在前面
-    cols = ['art_id'] + [col for col in df.columns if col != 'art_id']
-    df = df[cols]
-    
-    # 保存主数据库文件
-    output_path = Path(__file__).parent / "findsj.dta"
-    df.to_stata(str(output_path), write_index=False, version=118)
-    logger.info(f"✅ Main database saved: {output_path}")
-    
-    # 保存版本信息文件
-    version_df = pd.DataFrame([{
-        'update_date': datetime.now().strftime('%Y-%m-%d'),
-        'update_time': datetime.now().strftime('%H:%M:%S'),
-        'total_articles': len(df),
-        'articles_with_doi': (df['doi'] != '').sum(),
-        'articles_with_citation': (df['citation_apa'] != '').sum(),
-        'year_min': int(df['year'].min()),
-        'year_max': int(df['year'].max()),
-    }])
-    version_path = Path(__file__).parent / "findsj_version.dta"
-    version_df.to_stata(str(version_path), write_index=False, version=118)
-    logger.info(f"✅ Version info saved: {version_path}")
+    Args:
+        stats, changes, written: save_database() 的返回值
+        mode: 运行模式（full、incremental、refresh-citations）
+        citations_refreshed: 易变字段最近一次刷新的日期（YYYY-MM-DD）
+        metrics_textfile: Prometheus textfile 输出路径（None 时不输出）
+        shards: 由几个分片合并而来（merge-shards；None 表示单次运行）
+        previous_log: 上一次运行的 update_log.json（没有写出时沿用其中的 citations_published）
+    """
+    counts = changes['counts']
     
     # 统计信息
     logger.info("\n" + "=" * 60)
     logger.info("Database Update Summary")
     logger.info("=" * 60)
-    logger.info(f"Total articles: {len(df)}")
-    logger.info(f"Year range: {int(df['year'].min())} - {int(df['year'].max())}")
-    logger.info(f"Articles with DOI: {(df['doi'] != '').sum()}")
-    logger.info(f"Articles with authors: {(df['authors'] != '').sum()}")
-    logger.info(f"Articles with abstract: {(df['abstract'] != '').sum()}")
-    logger.info(f"Average citations: {df['cited_by_count'].mean():.1f}")
-    logger.info(f"Total citations: {df['cited_by_count'].sum()}")
+    logger.info(f"Total articles: {stats['total_articles']}")
+    logger.info(f"Year range: {stats['year_min']} - {stats['year_max']}")
+    logger.info(f"Articles with DOI: {stats['articles_with_doi']}")
+    logger.info(f"Articles with authors: {stats['articles_with_authors']}")
+    logger.info(f"Articles with abstract: {stats['articles_with_abstract']}")
+    logger.info(f"Average citations: {stats['average_citations']:.1f}")
+    logger.info(f"Total citations: {stats['total_citations']}")
     logger.info("=" * 60)
     
     # 保存详细日志
-    log_path = Path(__file__).parent / "update_log.json"
+    log_path = LOG_PATH
     log_data = {
         'update_datetime': datetime.now().isoformat(),
-        'total_articles': len(df),
-        'articles_with_doi': int((df['doi'] != '').sum()),
-        'articles_with_citation': int((df['citation_apa'] != '').sum()),
-        'year_range': [int(df['year'].min()), int(df['year'].max())],
-        'top_cited': df.nlargest(10, 'cited_by_count')[['title', 'cited_by_count', 'year']].to_dict('records')
+        'mode': mode,
+        **({'shards': shards} if shards else {}),
+        'citations_refreshed': citations_refreshed,
+        'citations_published': (datetime.now().strftime('%Y-%m-%d') if written
+                                else (previous_log or {}).get('citations_published', '')),
+        'total_articles': stats['total_articles'],
+        'articles_with_doi': stats['articles_with_doi'],
+        'articles_with_citation': stats['articles_with_citation'],
+        'year_range': [stats['year_min'], stats['year_max']],
+        'top_cited': stats['top_cited'],
+        'changes': {'written': written, 'meaningful': changes['meaningful'], **counts},
+        'metrics': _metrics.to_dict(),
+        'pending_volatile': {} if written else pending_volatile_changes(changes),
     }
     with open(log_path, 'w', encoding='utf-8') as f:
         json.dump(log_data, f, indent=2, ensure_ascii=False)
     logger.info(f"📋 Update log saved: {log_path}")
     
+    http_metrics = log_data['metrics']['http']
+    logger.info("Stage timings: " + ', '.join(
+        f"{name} {seconds:.1f}s" for name, seconds in log_data['metrics']['stages_seconds'].items()))
+    logger.info(f"HTTP: {http_metrics['requests']} requests, {http_metrics['retries']} retries, "
+                f"{http_metrics['rate_limited']} rate limited, {http_metrics['errors']} errors, "
+                f"{http_metrics['failures']} failed fetches, "
+                f"cache hit ratio {http_metrics['cache_hit_ratio']:.1%}, "
+                f"{http_metrics['bytes_downloaded'] / 1024 / 1024:.1f} MB downloaded")
+    
+    if metrics_textfile:
+        _metrics.write_prometheus(metrics_textfile, extra={
+            'articles': stats['total_articles'],
+            'articles_with_doi': stats['articles_with_doi'],
+            'last_success_timestamp_seconds': int(time.time()),
+        })
+        logger.info(f"📈 Prometheus metrics saved: {metrics_textfile}")
+
+def update_database(incremental=False, refresh_days=CITATION_REFRESH_DAYS, resume=False,
+                    journal_path=JOURNAL_PATH, engine='threads', workers=THREAD_WORKERS,
+                    metrics_textfile=None, formats=DEFAULT_EXPORT_FORMATS, force_write=False,
+                    stages=DEFAULT_STAGES, parse_workers=None, artids=None, years=None, dry_run=False,
+                    shard=None):
+    """
+    更新数据库主函数
+    
+    Args:
+        incremental: 增量模式，只抓取新增或不完整的文章，其余沿用已有 findsj.dta
+        refresh_days: 增量模式下易变字段（引用次数等）的刷新周期（天）
+        resume: 续跑上一次中断的运行，跳过检查点日志中已完成的 art_id
+        journal_path: 暂存库（检查点日志）路径
+        engine: 抓取后端，'threads'（线程池）或 'async'（asyncio + httpx）
+        workers: 线程池后端的工作线程数
+        metrics_textfile: Prometheus textfile 输出路径（None 时不输出）
+        formats: 导出格式（EXPORT_FORMATS 的子集）：dta（findsj.dta 及拆分文件）、
+            authors（作者表）、cite（引文包）、related（相关文章表）、parquet、sqlite（FTS5 全文检索）、
+            jsonl（gzip 压缩的 JSON Lines）
+        force_write: 即使与上一版相比没有任何变化也重写输出文件
+        stages: 运行的流水线阶段（PIPELINE_STAGES 的子集）；跳过 list 时文章列表取自已有数据库，
+            跳过 resolve-doi 时不抓取文章页，跳过 crossref 时沿用已有记录，web 为网页补充阶段
+            （从 SAGE 文章页补充 CrossRef 缺失的摘要和页码），跳过 export 时记录留在暂存库中
+        parse_workers: 网页补充阶段的解析进程数（默认 CPU 核数）
+        artids: 只处理这些 art_id，其余已有记录原样保留（None 表示全部）
+        years: 只处理已有数据库中年份在 (起始年, 结束年) 之间的文章（None 表示全部）
+        dry_run: 只估计各主机的请求数（仍抓取文章列表），不抓取文章、不写文件
+        shard: (序号, 分片数)，只处理 shard_of() 落在该分片的文章，export 阶段写出部分结果文件
+            （SHARD_DIR 下，之后用 merge-shards 合并），暂存库改用 shard_journal_path()
+    """
+    stages = set(stages)
+    logger.info("=" * 60)
+    logger.info("Starting Stata Journal Database Update")
+    logger.info("=" * 60)
+    logger.info(f"Stages: {', '.join(stage for stage in PIPELINE_STAGES if stage in stages)}")
+    _metrics.reset()
+    
+    # 已有数据库：增量模式沿用其中的记录，两种模式都复用其中的 DOI
+    with _metrics.stage('load_existing'):
+        existing = load_existing_database(DATABASE_PATH)
+    
+    # 第一步：获取所有文章列表
+    if 'list' in stages:
+        logger.info("\nStep 1: Fetching article list from Stata Journal website...")
+        with _metrics.stage('listing'):
+            articles = get_all_stata_journal_articles()
+    else:
+        if not existing:
+            logger.error("No existing database to take the article list from; include the 'list' stage")
+            return
+        articles = articles_from_database(existing)
+        logger.info(f"\nStep 1: Article list taken from {DATABASE_PATH.name} ({len(articles)} articles)")
+    
+    if not articles:
+        logger.error("No articles found! Exiting.")
+        return
+    
+    listed = listing_checksum(articles)
+    articles, out_of_scope = select_scope(articles, existing, artids, years)
+    if artids or years:
+        logger.info(f"Scope: {len(articles)} articles selected, {len(out_of_scope)} existing records kept as they are")
+    
+    previous_log = load_update_log(LOG_PATH)
+    citations_refreshed = datetime.now().strftime('%Y-%m-%d')
+    to_refresh = []
+    reused = []
+    
+    if incremental:
+        if existing:
+            refresh_due = citation_refresh_due(previous_log.get('citations_refreshed'), refresh_days)
+            if not refresh_due:
+                citations_refreshed = previous_log.get('citations_refreshed', '')
+            articles, to_refresh, reused = plan_incremental_update(articles, existing, refresh_due)
+        else:
+            logger.warning("No usable existing database, falling back to a full update")
+            incremental = False
+    if 'crossref' not in stages:
+        # 不查询 CrossRef：易变字段不刷新
+        reused += to_refresh
+        to_refresh = []
+        citations_refreshed = previous_log.get('citations_refreshed', '')
+    reused += [dict(existing[art_id]) for art_id in out_of_scope]
+    # 沿用上次刷新但尚未写出的易变字段值；距上次写出满刷新周期时写出只有易变字段的变化
+    apply_pending_volatile(to_refresh + reused, previous_log.get('pending_volatile', {}))
+    publish_volatile = citation_refresh_due(previous_log.get('citations_published'), refresh_days)
+    
+    # 批量查询和 DOI 标题匹配按完整列表决定，分片运行的结果与单次运行一致
+    resolve_scope = None
+    use_bulk = 'crossref' in stages and len(articles) + len(to_refresh) >= CROSSREF_BULK_MIN
+    if shard:
+        # 按 art_id 哈希分片：各分片互不重叠，合起来正好是单次运行处理的全部记录
+        def in_shard(art_id):
+            return shard_of(art_id, shard[1]) == shard[0] - 1
+        
+        resolve_scope = articles
+        articles = [art for art in articles if in_shard(art.get('artid', ''))]
+        to_refresh = [r for r in to_refresh if in_shard(r.get('art_id', ''))]
+        reused = [r for r in reused if in_shard(r.get('art_id', ''))]
+        out_of_scope = [art_id for art_id in out_of_scope if in_shard(art_id)]
+        journal_path = shard_journal_path(journal_path, shard)
+        logger.info(f"Shard {shard_name(shard)}: {len(articles)} to fetch, {len(to_refresh)} to refresh, "
+                    f"{len(reused)} reused")
+    
+    if dry_run:
+        resolve_dois(articles if resolve_scope is None else resolve_scope, existing, {})
+        scope = {art.get('artid', '') for art in articles} | {r.get('art_id', '') for r in to_refresh}
+        web_candidates = sum(1 for art_id in scope
+                             if art_id not in existing or needs_web_enrichment(normalize_record(existing[art_id])))
+        log_request_plan(plan_requests(articles, to_refresh, existing, stages, web_candidates))
+        return
+    
+    # 暂存库/检查点日志：续跑时跳过已完成的文章
+    journal, completed = open_journal(journal_path, resume)
+    pending = {art.get('artid', '') for art in articles} | {r.get('art_id', '') for r in to_refresh}
+    if completed:
+        articles = [art for art in articles if art.get('artid', '') not in completed]
+        to_refresh = [r for r in to_refresh if r.get('art_id', '') not in completed]
+    journal.retain(pending | {r.get('art_id', '') for r in reused})
+    journal.record_many(reused)
+    
+    # 第二步：获取引文信息
+    if 'crossref' in stages:
+        logger.info("\nStep 2: Fetching citation information from CrossRef API...")
+    else:
+        logger.info("\nStep 2: Skipping CrossRef, keeping existing records...")
+    logger.info(f"Total articles to process: {len(articles)}")
+    if to_refresh:
+        logger.info(f"Existing records to refresh ({', '.join(VOLATILE_FIELDS)}): {len(to_refresh)}")
+    
+    # 批量获取 CrossRef 元数据（按 ISSN 分页），逐篇请求只作为后备
+    bulk_metadata = {}
+    if use_bulk:
+        logger.info("Fetching bulk CrossRef metadata for the Stata Journal...")
+        with _metrics.stage('crossref_bulk'):
+            bulk_metadata = fetch_crossref_journal_metadata()
+    
+    # DOI 解析：已有数据库 -> CrossRef 标题匹配，剩余文章才抓取页面（跳过 resolve-doi 时不抓取）
+    with _metrics.stage('doi_resolution'):
+        resolve_dois(articles if resolve_scope is None else resolve_scope, existing, bulk_metadata)
+    if 'resolve-doi' not in stages:
+        for art in articles:
+            art.setdefault('doi', '')
+    if use_bulk:
+        with _metrics.stage('crossref_bulk'):
+            fill_crossref_metadata(bulk_metadata, [art['doi'] for art in articles if art.get('doi')] +
+                                   [r.get('doi', '') for r in to_refresh])
+    
+    # 抓取 -> 规范化 -> 写入暂存库，逐条流式处理
+    if 'crossref' in stages:
+        results = iter_fetch_results(articles, to_refresh, bulk_metadata, engine, workers)
+    else:
+        results = iter_basic_records(articles, existing, workers)
+    total = len(articles) + len(to_refresh)
+    done = 0
+    with _metrics.stage('fetch'):
+        for result in results:
+            journal.record(result)
+            done += 1
+            if done % 50 == 0:
+                logger.info(f"Progress: {done}/{total} articles processed")
+    
+    if journal.count() == 0 and not shard:
+        logger.error("No article records collected! Exiting.")
+        return
+    
+    # 可选的网页补充阶段：CrossRef 没有摘要或页码的文章，从 SAGE 文章页补充（范围外的记录不补充）
+    if 'web' in stages:
+        kept = set(out_of_scope)
+        candidates = [record for record in journal.iter_records()
+                      if record.get('art_id', '') not in kept and needs_web_enrichment(record)]
+        logger.info(f"\nWeb enrichment: {len(candidates)} articles missing {' or '.join(WEB_ENRICH_FIELDS)}")
+        filled_counts = dict.fromkeys(WEB_ENRICH_FIELDS, 0)
+        parsed = 0
+        with _metrics.stage('web_enrichment'):
+            for record, filled in enrich_from_web(candidates, workers, parse_workers):
+                parsed += 1
+                for field in filled:
+                    filled_counts[field] += 1
+                if filled:
+                    journal.record(record)
+        logger.info(f"Web enrichment: {parsed} pages parsed, filled " +
+                    ', '.join(f"{field} {count}" for field, count in filled_counts.items()))
+    
+    if 'export' not in stages:
+        # 记录保留在暂存库中，之后用 --resume 运行（含 export 阶段）写出
+        journal.close()
+        logger.info(f"\n✅ Export stage skipped; {done} records kept in {journal_path} (run with --resume to export)")
+        return
+    
+    if shard:
+        # 分片运行只写出部分结果，合并后才与上一版比较并写出数据库
+        count = journal.count()
+        path = write_shard_file(journal, shard, {
+            'mode': 'incremental' if incremental else 'full',
+            'citations_refreshed': citations_refreshed,
+            'listing_checksum': listed,
+            'base_checksum': existing_checksum(existing),
+        })
+        journal.close(remove=True)
+        logger.info(f"\n✅ Shard {shard_name(shard)} saved: {path} ({count} records); "
+                    f"run merge-shards once every shard is done")
+        return
+    
+    # 第三步：保存数据库
+    logger.info("\nStep 3: Saving to database files...")
+    
+    stats, changes, written = save_database(journal, existing, formats, force_write, publish_volatile)
+    report_run(stats, changes, written, 'incremental' if incremental else 'full', citations_refreshed,
+               metrics_textfile, previous_log=previous_log)
+    
+    # 运行成功，删除暂存库
+    journal.close(remove=True)
+    
     logger.info("\n✅ Database update completed successfully!")
 
-def main():
+def fetch_citation_counts(dois, workers=THREAD_WORKERS):
+    """
+    只获取引用次数（select=CITATION_SELECT）：先按 ISSN 分页拉取整本期刊，
+    剩余 DOI 再用 filter=doi:... 分批并行查询
+    
+    Args:
+        dois: 需要的 DOI（小写）
+        workers: 并行查询的批次数
+    
+    Returns:
+        dict: 小写 DOI -> is-referenced-by-count
+    """
+    counts = {}
+    
+    def add(items):
+        for item in items:
+            doi = item.get('DOI', '').lower()
+            count = item.get('is-referenced-by-count')
+            if doi and isinstance(count, int):
+                counts[doi] = count
+    
+    if len(dois) >= CROSSREF_BULK_MIN:
+        add(iter_crossref_works(','.join(f"issn:{issn}" for issn in STATA_JOURNAL_ISSNS), select=CITATION_SELECT))
+        logger.info(f"CrossRef ISSN listing returned counts for {len(counts)} works")
+    
+    missing = sorted(set(dois) - set(counts))
+    batches = [missing[start:start + CROSSREF_DOI_BATCH] for start in range(0, len(missing), CROSSREF_DOI_BATCH)]
+    
+    def fetch_batch(batch):
+        return list(iter_crossref_works(','.join(f"doi:{doi}" for doi in batch), rows=len(batch),
+                                        select=CITATION_SELECT))
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for items in executor.map(fetch_batch, batches):
+            add(items)
+    if missing:
+        found = sum(1 for doi in missing if doi in counts)
+        logger.info(f"CrossRef DOI filter batches returned counts for {found}/{len(missing)} remaining DOIs")
+    return counts
+
+def refresh_citations(workers=THREAD_WORKERS, metrics_textfile=None, formats=DEFAULT_EXPORT_FORMATS):
+    """
+    只刷新引用次数：从已有 findsj.dta 读取 DOI，批量获取 cited_by_count 后写回
+    
+    不抓取文章列表和网页，其余字段保持不变；写出流程与 update_database() 相同
+    （易变字段有变化即写出；此前未写出的 pending_volatile 一并写出）。
+    
+    Args:
+        workers: 并行查询的批次数
+        metrics_textfile: Prometheus textfile 输出路径（None 时不输出）
+        formats: 导出格式（EXPORT_FORMATS 的子集）
+    """
+    logger.info("=" * 60)
+    logger.info("Refreshing Stata Journal citation counts")
+    logger.info("=" * 60)
+    _metrics.reset()
+    
+    with _metrics.stage('load_existing'):
+        existing = load_existing_database(DATABASE_PATH)
+    if not existing:
+        logger.error("No existing database to refresh! Run a full update first.")
+        return
+    
+    previous_log = load_update_log(LOG_PATH)
+    records = apply_pending_volatile([normalize_record(record) for record in existing.values()],
+                                     previous_log.get('pending_volatile', {}))
+    dois = {record['doi'].strip().lower() for record in records if record['doi'].strip()}
+    logger.info(f"Fetching citation counts for {len(dois)} DOIs...")
+    with _metrics.stage('crossref_counts'):
+        counts = fetch_citation_counts(dois, workers)
+    
+    updated = 0
+    for record in records:
+        count = counts.get(record['doi'].strip().lower())
+        if count is not None and count != record['cited_by_count']:
+            record['cited_by_count'] = count
+            updated += 1
+    logger.info(f"Citation counts: {len(counts)}/{len(dois)} DOIs found, {updated} changed")
+    
+    # 借用临时暂存库按输出顺序写出，与完整更新共用写出流程
+    with tempfile.TemporaryDirectory(prefix='findsj-refresh-') as tmpdir:
+        journal = UpdateJournal(Path(tmpdir) / "refresh_journal.sqlite")
+        try:
+            journal.record_many(records)
+            stats, changes, written = save_database(journal, existing, formats, publish_volatile=True)
+        finally:
+            journal.close()
+    report_run(stats, changes, written, 'refresh-citations', datetime.now().strftime('%Y-%m-%d'),
+               metrics_textfile, previous_log=previous_log)
+    
+    logger.info("\n✅ Citation refresh completed successfully!")
+
+def merge_shards(shard_dir=None, metrics_textfile=None, formats=DEFAULT_EXPORT_FORMATS, force_write=False,
+                 refresh_days=CITATION_REFRESH_DAYS):
+    """
+    合并分片运行（--shard I/N）的部分结果，写出与单次运行相同的数据库、版本信息和 update_log.json
+    
+    核对全部分片（load_shard_files()）且已有 findsj.dta 与分片运行时相同后，把记录写入临时暂存库，
+    按输出顺序与上一版比较并写出（save_database()），统计信息因此与单次运行一致；
+    HTTP 指标和阶段耗时为各分片之和。部分结果文件保留，可重复合并。
+    
+    Args:
+        shard_dir: 部分结果目录（默认 SHARD_DIR）
+        metrics_textfile: Prometheus textfile 输出路径（None 时不输出）
+        formats: 导出格式（EXPORT_FORMATS 的子集）
+        force_write: 即使没有任何变化也重写输出文件
+        refresh_days: 易变字段的刷新周期（天），距上次写出满一个周期时写出只有易变字段的变化
+    """
+    logger.info("=" * 60)
+    logger.info("Merging sharded Stata Journal database update")
+    logger.info("=" * 60)
+    _metrics.reset()
+    
+    with _metrics.stage('load_existing'):
+        existing = load_existing_database(DATABASE_PATH)
+    with _metrics.stage('load_shards'):
+        shards = load_shard_files(shard_dir)
+    if shards[0]['base_checksum'] != existing_checksum(existing):
+        raise ValueError(f"Shards were crawled against a different {DATABASE_PATH.name}; "
+                         f"merge them next to the database they started from")
+    total = sum(len(data['records']) for data in shards)
+    if total == 0:
+        logger.error("No article records in the shard files! Exiting.")
+        return
+    logger.info(f"Merging {len(shards)} shards: {total} records")
+    for data in shards:
+        _metrics.add_snapshot(data['metrics'])
+    
+    # 各分片的刷新日期一般相同；不同时取最早的一个，下次运行照常刷新
+    citations_refreshed = min(data['citations_refreshed'] for data in shards)
+    previous_log = load_update_log(LOG_PATH)
+    with tempfile.TemporaryDirectory(prefix='findsj-merge-') as tmpdir:
+        journal = UpdateJournal(Path(tmpdir) / "merge_journal.sqlite")
+        try:
+            for data in shards:
+                journal.record_many(dict(zip(data['columns'], row)) for row in data['records'])
+            publish_volatile = citation_refresh_due(previous_log.get('citations_published'), refresh_days)
+            stats, changes, written = save_database(journal, existing, formats, force_write, publish_volatile)
+        finally:
+            journal.close()
+    report_run(stats, changes, written, shards[0]['mode'], citations_refreshed, metrics_textfile,
+               shards=len(shards), previous_log=previous_log)
+    
+    logger.info("\n✅ Shard merge completed successfully!")
+
+def split_setting(text, choices=None):
+    """
+    拆分 KEY=VALUE 形式的命令行参数（--host-concurrency、--host-rate、--timeout）
+    
+    Returns:
+        tuple: (KEY, VALUE)
+    """
+    key, sep, value = text.partition('=')
+    key, value = key.strip(), value.strip()
+    if not sep or not key or not value:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got '{text}'")
+    if choices is not None and key not in choices:
+        raise argparse.ArgumentTypeError(f"unknown key '{key}' (choose from {', '.join(choices)})")
+    return key, value
+
+def positive_number(value, convert=float):
+    """把命令行取值转换为正数"""
+    try:
+        number = convert(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive number, got '{value}'")
+    return number
+
+def host_concurrency_arg(text):
+    """--host-concurrency HOST=N"""
+    host, value = split_setting(text)
+    return host, positive_number(value, int)
+
+def host_rate_arg(text):
+    """--host-rate HOST=RATE[:MAX]，省略 MAX 时速率固定为 RATE"""
+    host, value = split_setting(text)
+    rate, _, max_rate = value.partition(':')
+    rate = positive_number(rate)
+    max_rate = positive_number(max_rate) if max_rate else rate
+    if max_rate < rate:
+        raise argparse.ArgumentTypeError(f"MAX must not be below RATE in '{text}'")
+    return host, (rate, max_rate)
+
+def timeout_arg(text):
+    """--timeout SOURCE=SECONDS"""
+    source, value = split_setting(text, REQUEST_TIMEOUTS)
+    return source, positive_number(value)
+
+def years_arg(text):
+    """--years FROM-TO 或单个年份"""
+    start, _, end = text.partition('-')
+    try:
+        years = (int(start), int(end or start))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YEAR or FROM-TO, got '{text}'")
+    if years[0] > years[1]:
+        raise argparse.ArgumentTypeError(f"empty year range '{text}'")
+    return years
+
+def shard_arg(text):
+    """--shard I/N（1 <= I <= N）"""
+    index, sep, count = text.partition('/')
+    try:
+        shard = (int(index), int(count))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/N, got '{text}'")
+    if not sep or not 1 <= shard[0] <= shard[1]:
+        raise argparse.ArgumentTypeError(f"expected I/N with 1 <= I <= N, got '{text}'")
+    return shard
+
+def apply_run_settings(args):
+    """把命令行中的并发、限速、超时、重试和输出目录设置写入模块配置"""
+    global REQUEST_RETRIES, RETRY_BACKOFF, SHARD_DIR, PUBLISH_PATCHES
+    HOST_CONCURRENCY.update(args.host_concurrency)
+    HOST_RATE_LIMITS.update(args.host_rate)
+    REQUEST_TIMEOUTS.update(args.timeout)
+    if args.retries is not None:
+        REQUEST_RETRIES = args.retries
+    if args.retry_backoff is not None:
+        RETRY_BACKOFF = args.retry_backoff
+    if args.output_dir is not None:
+        set_output_dir(args.output_dir)
+    if args.shard_dir is not None:
+        SHARD_DIR = args.shard_dir
+    if args.publish_patches:
+        PUBLISH_PATCHES = True
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="Update the Stata Journal database (findsj.dta) with citation information."
+    )
+    parser.add_argument(
+        'command', nargs='?', choices=('update', 'refresh-citations', 'merge-shards'), default='update',
+        help="update: crawl and rebuild the database (default); refresh-citations: only refresh "
+             "cited_by_count for the DOIs in the existing findsj.dta; merge-shards: combine the "
+             "partial results of 'update --shard I/N' runs into the database"
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help="only fetch articles that are new or incomplete in the existing findsj.dta"
+    )
+    parser.add_argument(
+        '--refresh-days', type=int, default=CITATION_REFRESH_DAYS, metavar='DAYS',
+        help=f"in incremental mode, refresh {', '.join(VOLATILE_FIELDS)} when the last refresh "
+             f"is at least DAYS old, and rewrite the outputs for changes only in those fields when the "
+             f"last write is at least DAYS old (0 = every run, -1 = never; default: {CITATION_REFRESH_DAYS})"
+    )
+    parser.add_argument(
+        '--offline', action='store_true',
+        help="serve every request from the HTTP cache only; uncached URLs count as failures"
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help="disable the on-disk HTTP response cache"
+    )
+    parser.add_argument(
+        '--cache-path', type=Path, default=CACHE_PATH, metavar='PATH',
+        help=f"HTTP cache database (default: {CACHE_PATH.name} under {CACHE_PATH.parent.name}/)"
+    )
+    parser.add_argument(
+        '--cache-max-mb', type=int, default=CACHE_MAX_BYTES // (1024 * 1024), metavar='MB',
+        help="evict least recently used cache entries above this size"
+    )
+    parser.add_argument(
+        '--resume', action='store_true',
+        help="resume an interrupted run, skipping art_ids already recorded in the journal"
+    )
+    parser.add_argument(
+        '--journal-path', type=Path, default=JOURNAL_PATH, metavar='PATH',
+        help=f"checkpoint journal written as articles complete (default: {JOURNAL_PATH.name})"
+    )
+    parser.add_argument(
+        '--engine', choices=('threads', 'async'), default='threads',
+        help="fetch backend: thread pool over pooled requests sessions, or asyncio + httpx "
+             "with one keep-alive client per host (default: threads)"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=THREAD_WORKERS, metavar='N',
+        help=f"worker threads for the thread-pool backend (default: {THREAD_WORKERS})"
+    )
+    parser.add_argument(
+        '--metrics-textfile', type=Path, metavar='PATH',
+        help="also write run metrics in Prometheus textfile format (e.g. findsj_update.prom)"
+    )
+    parser.add_argument(
+        '--formats', default=','.join(DEFAULT_EXPORT_FORMATS), metavar='LIST',
+        help=f"comma-separated export formats, written in one pass over the records: "
+             f"{', '.join(EXPORT_FORMATS)} (default: {','.join(DEFAULT_EXPORT_FORMATS)})"
+    )
+    parser.add_argument(
+        '--force-write', action='store_true',
+        help="rewrite the output files even when nothing changed"
+    )
+    parser.add_argument(
+        '--publish-patches', action='store_true',
+        help=f"also publish a patch per data version under {PATCH_DIR.name}/ for mirrors synced "
+             f"with findsj_sync.py"
+    )
+    parser.add_argument(
+        '--stages', default=','.join(DEFAULT_STAGES), metavar='LIST',
+        help=f"comma-separated pipeline stages to run: {', '.join(PIPELINE_STAGES)}; skipped stages reuse "
+             f"the existing findsj.dta (default: {','.join(DEFAULT_STAGES)})"
+    )
+    parser.add_argument(
+        '--web-enrich', action='store_true',
+        help=f"add the web stage: fill {' and '.join(WEB_ENRICH_FIELDS)} missing from CrossRef by parsing "
+             f"SAGE article pages in a process pool"
+    )
+    parser.add_argument(
+        '--parse-workers', type=int, metavar='N',
+        help="parser processes for the web stage (default: number of CPUs)"
+    )
+    parser.add_argument(
+        '--host-concurrency', type=host_concurrency_arg, action='append', default=[], metavar='HOST=N',
+        help="concurrent connections to HOST (repeatable; e.g. api.crossref.org=8)"
+    )
+    parser.add_argument(
+        '--host-rate', type=host_rate_arg, action='append', default=[], metavar='HOST=RATE[:MAX]',
+        help="initial and maximum request rate for HOST in requests/second (repeatable)"
+    )
+    parser.add_argument(
+        '--timeout', type=timeout_arg, action='append', default=[], metavar='SOURCE=SECONDS',
+        help=f"request timeout per source: {', '.join(REQUEST_TIMEOUTS)} (repeatable)"
+    )
+    parser.add_argument(
+        '--retries', type=lambda value: positive_number(value, int), metavar='N',
+        help=f"attempts per CrossRef request, including the first (default: {REQUEST_RETRIES})"
+    )
+    parser.add_argument(
+        '--retry-backoff', type=positive_number, metavar='SECONDS',
+        help=f"base of the exponential backoff between attempts (default: {RETRY_BACKOFF:g})"
+    )
+    parser.add_argument(
+        '--output-dir', type=Path, metavar='DIR',
+        help="read the existing database from and write every output file to DIR "
+             "(default: the directory of this script)"
+    )
+    parser.add_argument(
+        '--artids', metavar='LIST',
+        help="comma-separated art_ids to process; other existing records are kept as they are"
+    )
+    parser.add_argument(
+        '--years', type=years_arg, metavar='FROM-TO',
+        help="only process articles whose year in the existing findsj.dta is in this range "
+             "(articles not yet in the database have no year and are skipped)"
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help="only fetch the article list, then report the planned requests per host without "
+             "fetching articles or writing files"
+    )
+    parser.add_argument(
+        '--shard', type=shard_arg, metavar='I/N',
+        help="only process the I-th of N hash partitions of the art_ids and write a partial result "
+             "to the shard directory instead of the database"
+    )
+    parser.add_argument(
+        '--shard-dir', type=Path, metavar='DIR',
+        help=f"where --shard writes and merge-shards reads the partial results "
+             f"(default: {SHARD_DIR.name}/ under the output directory)"
+    )
+    args = parser.parse_args(argv)
+    args.stages = tuple(dict.fromkeys(name.strip() for name in args.stages.split(',') if name.strip()))
+    unknown = [name for name in args.stages if name not in PIPELINE_STAGES]
+    if unknown or not args.stages:
+        parser.error(f"--stages: unknown or empty stage list (choose from {', '.join(PIPELINE_STAGES)})")
+    if args.web_enrich and 'web' not in args.stages:
+        args.stages += ('web',)
+    if args.artids is not None:
+        args.artids = {art_id.strip() for art_id in args.artids.split(',') if art_id.strip()}
+        if not args.artids:
+            parser.error("--artids: empty list")
+    args.formats = tuple(dict.fromkeys(name.strip() for name in args.formats.split(',') if name.strip()))
+    unknown = [name for name in args.formats if name not in EXPORT_FORMATS]
+    if unknown or not args.formats:
+        parser.error(f"--formats: unknown or empty format list (choose from {', '.join(EXPORT_FORMATS)})")
+    update_only = {
+        '--incremental': args.incremental, '--resume': args.resume, '--web-enrich': args.web_enrich,
+        '--stages': args.stages != DEFAULT_STAGES, '--artids': args.artids, '--years': args.years,
+        '--dry-run': args.dry_run, '--shard': args.shard,
+    }
+    if args.command != 'update' and any(update_only.values()):
+        parser.error(f"{args.command} does not take {', '.join(name for name, v in update_only.items() if v)}")
+    if 'parquet' in args.formats and pa is None:
+        parser.error("--formats parquet requires pyarrow (pip install pyarrow)")
+    if 'related' in args.formats and sparse is None:
+        parser.error("--formats related requires scipy (pip install scipy)")
+    if args.engine == 'async' and httpx is None:
+        parser.error("--engine async requires httpx (pip install httpx)")
+    if args.offline and args.no_cache:
+        parser.error("--offline requires the HTTP cache; drop --no-cache")
+    return args
+
+def main(argv=None):
     """主入口函数"""
+    args = parse_args(argv)
+    apply_run_settings(args)
+    configure_http_cache(args.cache_path, enabled=not args.no_cache, offline=args.offline,
+                         max_bytes=args.cache_max_mb * 1024 * 1024)
     try:
-        update_database()
+        if args.command == 'refresh-citations':
+            refresh_citations(workers=args.workers, metrics_textfile=args.metrics_textfile, formats=args.formats)
+            return
+        if args.command == 'merge-shards':
+            merge_shards(metrics_textfile=args.metrics_textfile, formats=args.formats,
+                         force_write=args.force_write, refresh_days=args.refresh_days)
+            return
+        update_database(incremental=args.incremental, refresh_days=args.refresh_days,
+                        resume=args.resume, journal_path=args.journal_path,
+                        engine=args.engine, workers=args.workers,
+                        metrics_textfile=args.metrics_textfile, formats=args.formats,
+                        force_write=args.force_write, stages=args.stages,
+                        parse_workers=args.parse_workers, artids=args.artids, years=args.years,
+                        dry_run=args.dry_run, shard=args.shard)
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
         raise
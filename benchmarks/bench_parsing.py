@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML 解析微基准
+Micro-benchmark for the HTML parsing layer in auto_update.py
+
+对 fixtures/ 中保存的页面分别运行：
+- baseline: 原实现（html.parser 构建完整解析树）
+- optimized: 当前实现（lxml + SoupStrainer 限定解析范围 + 预编译正则）
+并检查两者的提取结果一致，报告每页节省的 CPU 时间。
+
+fixtures/ 中的页面按 stata-journal.com 搜索页、文章页和 SAGE 文章页的结构生成，
+只保留了结构和体量，文字内容为随机填充。
+
+用法：
+    python benchmarks/bench_parsing.py
+    python benchmarks/bench_parsing.py --repeat 20 --json parsing.json
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import auto_update  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# (名称, fixture 文件, 解析函数)
+CASES = [
+    ('search page', 'sjsearch.html.gz', lambda html: auto_update.parse_article_list(html)),
+    ('article page', 'sj_article.html', lambda html: auto_update.parse_article_doi(html)),
+    ('sage page', 'sage_article.html.gz',
+     lambda html: auto_update.parse_web_info(html, '10.1177/1536867X1501500103')),
+]
+
+def load_fixture(name):
+    """读取 fixture（支持 .gz）"""
+    path = FIXTURES / name
+    if path.suffix == '.gz':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return f.read()
+    return path.read_text(encoding='utf-8')
+
+def baseline_soup(html, parse_only=None):
+    """原实现：html.parser 构建完整解析树，忽略 parse_only"""
+    return BeautifulSoup(html, 'html.parser')
+
+def time_per_call(func, html, repeat):
+    """
+    Returns:
+        tuple: (每次调用的最短 CPU 时间（毫秒）, 最后一次的返回值)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.process_time()
+        result = func(html)
+        best = min(best, time.process_time() - start)
+    return best * 1000, result
+
+def run(repeat):
+    results = []
+    for label, fixture, func in CASES:
+        html = load_fixture(fixture)
+
+        with mock.patch.object(auto_update, 'make_soup', baseline_soup):
+            baseline_ms, expected = time_per_call(func, html, repeat)
+        optimized_ms, actual = time_per_call(func, html, repeat)
+
+        results.append({
+            'case': label,
+            'fixture': fixture,
+            'bytes': len(html.encode('utf-8')),
+            'baseline_ms': round(baseline_ms, 2),
+            'optimized_ms': round(optimized_ms, 2),
+            'saved_ms': round(baseline_ms - optimized_ms, 2),
+            'speedup': round(baseline_ms / optimized_ms, 2) if optimized_ms else None,
+            'same_output': expected == actual,
+        })
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HTML parsing in auto_update.py")
+    parser.add_argument('--repeat', type=int, default=10, help="runs per case; the fastest is reported")
+    parser.add_argument('--json', type=Path, metavar='PATH', help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+
+    print(f"HTML parser: {auto_update.HTML_PARSER}")
+    print(f"{'case':<14}{'KB':>8}{'baseline ms':>14}{'optimized ms':>14}{'saved ms':>11}{'speedup':>9}  same")
+    for r in results:
+        print(f"{r['case']:<14}{r['bytes'] / 1024:>8.0f}{r['baseline_ms']:>14.2f}{r['optimized_ms']:>14.2f}"
+              f"{r['saved_ms']:>11.2f}{r['speedup']:>8.1f}x  {r['same_output']}")
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            'parser': auto_update.HTML_PARSER,
+            'repeat': args.repeat,
+            'results': results,
+        }, indent=2), encoding='utf-8')
+
+    return 0 if all(r['same_output'] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线检索延迟基准
+Latency benchmark: findsj_server.py versus the full-scan search in findsj.ado
+
+对一组检索（关键词、标题、作者）分别测量：
+- full scan: 按 findsj.ado 离线检索的做法，每次读入 findsj.dta、生成小写列（已有 *_norm 列时直接使用）、
+  逐词 strpos 过滤，再按 -year -volume -number 排序
+- scan only: 同上，但数据已在内存中（只计过滤和排序）
+- index: findsj_server.SearchIndex.search()（进程内）
+- http: 经本机 HTTP 接口取 CSV 结果（Stata copy 的方式），含连接和序列化开销
+报告各方式每次检索的 p50/p99/平均延迟（毫秒），以及服务启动时读入和建索引的耗时。
+
+用法：
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --database findsj.dta --repeat 50 --json search.json
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import unicodedata
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlencode
+
+import pandas as pd
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+import auto_update  # noqa: E402
+import findsj_server  # noqa: E402
+
+# (检索范围, 检索词)
+QUERIES = [
+    ('keyword', 'propensity score'),
+    ('keyword', 'panel data'),
+    ('keyword', 'regression discontinuity'),
+    ('keyword', 'bootstrap'),
+    ('keyword', 'psm'),
+    ('title', 'graph'),
+    ('title', 'survival analysis'),
+    ('author', 'cox'),
+    ('author', 'baum'),
+    ('author', 'jenkins'),
+]
+
+def fold(text):
+    """与 findsj_search_fields 中 ustrregexra(ustrnormalize(ustrlower(s), "nfkd"), "\\p{M}", "") 相同"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in text if not unicodedata.category(ch).startswith('M'))
+
+def load_for_scan(path):
+    """相当于 use findsj.dta + findsj_search_fields：读入数据并生成 title/author/abstract 的小写列"""
+    df = pd.read_stata(str(path)).rename(columns={'artid': 'art_id', 'DOI': 'doi', 'authors': 'author'})
+    for field in ('title', 'author', 'abstract'):
+        if f'{field}_norm' in df.columns:
+            df[f'{field}_lower'] = df[f'{field}_norm']
+        else:
+            df[f'{field}_lower'] = df[field].fillna('').map(fold)
+    return df
+
+def scan(df, scope, query, n=10):
+    """相当于 findsj.ado 离线检索的逐词 strpos 过滤和排序"""
+    words = fold(query).split()
+    matched = pd.Series(True, index=df.index)
+    for word in words:
+        if scope == 'title':
+            matched &= df['title_lower'].str.contains(word, regex=False)
+        elif scope == 'author':
+            matched &= df['author_lower'].str.contains(word, regex=False)
+        else:
+            matched &= (df['title_lower'].str.contains(word, regex=False)
+                        | df['author_lower'].str.contains(word, regex=False)
+                        | df['abstract_lower'].str.contains(word, regex=False))
+    hits = df[matched].sort_values(['year', 'volume', 'number'], ascending=False)
+    return len(hits), hits['art_id'].head(n).tolist()
+
+def timed(func, repeat):
+    """
+    Returns:
+        tuple: (每次调用的耗时列表（毫秒）, 最后一次的返回值)
+    """
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, result
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p99_ms': round(samples[min(len(samples) - 1, round(0.99 * (len(samples) - 1)))], 3),
+        'mean_ms': round(sum(samples) / len(samples), 3),
+    }
+
+def run(database, repeat, full_scan_repeat):
+    auto_update.logger.setLevel('WARNING')
+    findsj_server.logger.setLevel('WARNING')
+    start = time.perf_counter()
+    service = findsj_server.SearchService(database)
+    startup_ms = (time.perf_counter() - start) * 1000
+    index = service.index
+
+    server = findsj_server.make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{server.server_address[0]}:{server.server_address[1]}/search?"
+
+    df = load_for_scan(database)
+    samples = {'full scan': [], 'scan only': [], 'index': [], 'http': []}
+    queries = []
+    try:
+        for scope, query in QUERIES:
+            full, _ = timed(lambda: scan(load_for_scan(database), scope, query), full_scan_repeat)
+            scan_only, (scan_hits, _) = timed(lambda: scan(df, scope, query), repeat)
+            indexed, (index_hits, _) = timed(lambda: index.search(query, scope), repeat)
+            url = base_url + urlencode({'q': query, 'scope': scope, 'format': 'csv'})
+            http, _ = timed(lambda: urllib.request.urlopen(url).read(), repeat)
+            for name, values in zip(samples, (full, scan_only, indexed, http)):
+                samples[name].extend(values)
+            queries.append({
+                'scope': scope,
+                'query': query,
+                'scan_hits': scan_hits,
+                'index_hits': index_hits,
+                'full_scan': summarize(full),
+                'index': summarize(indexed),
+                'http': summarize(http),
+            })
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'database': str(database),
+        'articles': len(index),
+        'startup_ms': round(startup_ms, 1),
+        'repeat': repeat,
+        'full_scan_repeat': full_scan_repeat,
+        'overall': {name: summarize(values) for name, values in samples.items()},
+        'queries': queries,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark findsj_server.py against the full-scan search")
+    parser.add_argument('--database', type=Path, default=REPO_DIR / "findsj.dta", metavar='PATH',
+                        help="findsj.dta to search (default: the repository copy)")
+    parser.add_argument('--repeat', type=int, default=20, help="runs per query for the in-memory approaches")
+    parser.add_argument('--full-scan-repeat', type=int, default=3,
+                        help="runs per query for the full scan, which reloads the file each time")
+    parser.add_argument('--json', type=Path, metavar='PATH', help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.database, args.repeat, args.full_scan_repeat)
+
+    print(f"{report['articles']} articles; service startup (load + index) {report['startup_ms']:.0f} ms")
+    print(f"{'scope':<9}{'query':<26}{'scan hits':>10}{'index hits':>11}"
+          f"{'full scan ms':>14}{'index ms':>10}{'http ms':>9}")
+    for q in report['queries']:
+        print(f"{q['scope']:<9}{q['query']:<26}{q['scan_hits']:>10}{q['index_hits']:>11}"
+              f"{q['full_scan']['p50_ms']:>14.1f}{q['index']['p50_ms']:>10.2f}{q['http']['p50_ms']:>9.2f}")
+    print(f"\n{'approach':<12}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, stats in report['overall'].items():
+        print(f"{name:<12}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['mean_ms']:>10.2f}")
+    full, http = report['overall']['full scan']['p50_ms'], report['overall']['http']['p50_ms']
+    print(f"\nhttp vs full scan (p50): {full / http:.0f}x faster")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
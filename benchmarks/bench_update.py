@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+update_database() 端到端基准
+End-to-end benchmark for update_database() against the local stub server
+
+对每个目录规模（默认 1k，可选 10k/100k）：
+1. 在本进程中启动 stub_server.StubServer（合成目录，可注入延迟、429 和 500）
+2. 在子进程中运行 update_database()：网址指向桩服务器，输出写入临时目录，不使用 HTTP 缓存
+3. 报告吞吐量（篇/秒）、HTTP 请求延迟 p50/p99、子进程峰值 RSS、各阶段耗时和请求统计
+
+结果写入 JSON（默认 benchmarks/results/update-<时间>.json），可用 --compare 与之前的结果对比。
+
+用法：
+    python benchmarks/bench_update.py
+    python benchmarks/bench_update.py --sizes 1000 10000 100000 --latency-ms 50 --jitter-ms 20
+    python benchmarks/bench_update.py --rate-429 0.01 --error-rate 0.01 --engine async
+    python benchmarks/bench_update.py --crossref-completeness 0.5 --web-enrich --parse-workers 4
+    python benchmarks/bench_update.py --compare benchmarks/results/update-20260101-120000.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+sys.path.insert(0, str(BENCH_DIR))
+from stub_server import StubServer, make_catalogue  # noqa: E402
+
+def percentile(values, q):
+    """最近秩法分位数（values 已排序）"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(q * (len(values) - 1))))]
+
+def run_child(config):
+    """
+    子进程：对桩服务器运行一次 update_database()，把结果 JSON 打印到 stdout 最后一行
+
+    Args:
+        config: 父进程传入的参数（base_url, workdir, engine, workers, rate, concurrency）
+    """
+    sys.path.insert(0, str(REPO_DIR))
+    import resource
+    import auto_update
+
+    auto_update.logger.setLevel('WARNING')
+    workdir = Path(config['workdir'])
+    base_url = config['base_url']
+    host = urlsplit(base_url).netloc
+
+    auto_update.BASE_URL = base_url
+    auto_update.CROSSREF_API = f"{base_url}/works"
+    auto_update.SAGE_URL = base_url
+    auto_update.set_output_dir(workdir)
+    auto_update.HOST_RATE_LIMITS[host] = (config['rate'], config['rate'])
+    auto_update.HOST_CONCURRENCY[host] = config['concurrency']
+    auto_update.configure_http_cache(enabled=False)
+    stages = auto_update.DEFAULT_STAGES + (('web',) if config['web_enrich'] else ())
+
+    # 记录每个请求的延迟，分位数按原始样本计算
+    latencies = []
+    record_request = auto_update._metrics.record_request
+
+    def record_with_sample(url, status_code, elapsed, nbytes):
+        latencies.append(elapsed)
+        record_request(url, status_code, elapsed, nbytes)
+
+    auto_update._metrics.record_request = record_with_sample
+
+    start = time.perf_counter()
+    auto_update.update_database(journal_path=workdir / "journal.sqlite", engine=config['engine'],
+                                workers=config['workers'], stages=stages,
+                                parse_workers=config['parse_workers'])
+    elapsed = time.perf_counter() - start
+
+    log = json.loads(auto_update.LOG_PATH.read_text(encoding='utf-8'))
+    # ru_maxrss: Linux 为 KB，macOS 为字节
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    latencies.sort()
+    print(json.dumps({
+        'articles': log['total_articles'],
+        'articles_with_doi': log['articles_with_doi'],
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(log['total_articles'] / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+            'max': round(latencies[-1] * 1000, 2) if latencies else None,
+        },
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'stages_seconds': log['metrics']['stages_seconds'],
+        'http': log['metrics']['http'],
+    }))
+
+def run_size(size, args):
+    """启动桩服务器，在子进程中跑一次更新并返回结果"""
+    catalogue = make_catalogue(size, args.seed, args.bulk_coverage, args.crossref_completeness)
+    server = StubServer(catalogue, args.latency_ms, args.jitter_ms, args.rate_429, args.error_rate,
+                        args.retry_after, args.seed).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix='findsj-bench-') as workdir:
+            config = {
+                'base_url': server.url,
+                'workdir': workdir,
+                'engine': args.engine,
+                'workers': args.workers,
+                'rate': args.rate,
+                'concurrency': args.concurrency,
+                'web_enrich': args.web_enrich,
+                'parse_workers': args.parse_workers,
+            }
+            proc = subprocess.run([sys.executable, __file__, '--child', json.dumps(config)],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr)
+                raise RuntimeError(f"benchmark run for {size} articles failed (exit {proc.returncode})")
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        server.stop()
+
+    result['size'] = size
+    result['server_requests'] = server.stats()
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def print_results(results, previous=None):
+    """打印结果表；previous 为之前的结果文件内容时附加与之对比的倍数"""
+    baseline = {r['size']: r for r in (previous or {}).get('results', [])}
+    print(f"{'size':>8}{'seconds':>10}{'art/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'RSS MB':>9}"
+          f"{'requests':>10}{'429':>6}{'errors':>8}")
+    for r in results:
+        http = r['http']
+        print(f"{r['size']:>8}{r['elapsed_seconds']:>10.1f}{r['throughput_per_second']:>10.1f}"
+              f"{r['latency_ms']['p50'] or 0:>10.1f}{r['latency_ms']['p99'] or 0:>10.1f}{r['peak_rss_mb']:>9.0f}"
+              f"{http['requests']:>10}{http['rate_limited']:>6}{http['errors'] + r['server_requests'].get('injected_500', 0):>8}")
+        old = baseline.get(r['size'])
+        if old:
+            print(f"{'':>8}vs {previous.get('git_commit') or 'previous'}: "
+                  f"throughput x{r['throughput_per_second'] / old['throughput_per_second']:.2f}, "
+                  f"p99 x{(r['latency_ms']['p99'] or 0) / (old['latency_ms']['p99'] or 1):.2f}, "
+                  f"RSS x{r['peak_rss_mb'] / old['peak_rss_mb']:.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark update_database() against a local stub server")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000], metavar='N',
+                        help="catalogue sizes to run (e.g. 1000 10000 100000)")
+    parser.add_argument('--engine', choices=('threads', 'async'), default='threads')
+    parser.add_argument('--workers', type=int, default=3, help="worker threads for the thread engine")
+    parser.add_argument('--rate', type=float, default=200.0, help="token-bucket rate for the stub host (req/s)")
+    parser.add_argument('--concurrency', type=int, default=8, help="async engine connections to the stub host")
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--bulk-coverage', type=float, default=0.9,
+                        help="share of articles returned by the CrossRef ISSN listing")
+    parser.add_argument('--crossref-completeness', type=float, default=1.0,
+                        help="share of CrossRef records carrying abstract and page range")
+    parser.add_argument('--web-enrich', action='store_true',
+                        help="run the SAGE page enrichment stage (pair with --crossref-completeness < 1)")
+    parser.add_argument('--parse-workers', type=int, help="parser processes for --web-enrich")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=Path, metavar='PATH',
+                        help="results file (default: benchmarks/results/update-<timestamp>.json)")
+    parser.add_argument('--compare', type=Path, metavar='PATH', help="earlier results file to compare with")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return 0
+
+    results = []
+    for size in args.sizes:
+        print(f"Running {size} articles...", flush=True)
+        results.append(run_size(size, args))
+
+    parameters = {k: v for k, v in vars(args).items() if k not in ('json', 'compare', 'child', 'sizes')}
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': parameters,
+        'results': results,
+    }
+
+    previous = json.loads(args.compare.read_text(encoding='utf-8')) if args.compare else None
+    print_results(results, previous)
+
+    output = args.json or RESULTS_DIR / f"update-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"Results saved: {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
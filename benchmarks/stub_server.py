@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 HTTP 桩服务器
+Local HTTP stub replaying stata-journal.com, CrossRef and SAGE responses
+
+按合成文章目录（make_catalogue()）生成响应，页面结构取自 fixtures/ 中保存的页面：
+- /sjsearch.html              搜索页（文章列表）
+- /article.html?article=ID    stata-journal.com 文章页（DOI 链接）
+- /works/{doi}                CrossRef 单篇查询
+- /works?filter=...&cursor=   CrossRef 列表查询（issn: 或 doi: 过滤，游标分页，支持 select）
+- /doi/{doi}                  SAGE 文章页
+- /__stats                    按接口统计的请求数和注入的故障数（JSON）
+
+可配置固定延迟 + 随机抖动、429 注入比例（带 Retry-After）和 500 错误比例。
+搜索页不注入故障：auto_update.py 对列表请求不重试，注入后整次运行会直接退出。
+
+用法：
+    python benchmarks/stub_server.py --articles 10000 --latency-ms 50 --rate-429 0.01 --error-rate 0.01
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# fixtures/ 页面中的 DOI，回放时替换为目录中文章的 DOI
+FIXTURE_DOI = '10.1177/1536867X1501500103'
+STATA_JOURNAL_ISSN = '1536-867X'
+ARTICLES_PER_ISSUE = 14
+
+WORDS = ("regression panel data estimation treatment effects instrumental variables bootstrap survival "
+         "analysis graphics simulation Bayesian quantile heterogeneity spatial models inference robust "
+         "standard errors difference discontinuity matching propensity score multiple imputation mixed "
+         "multilevel count outcomes censored selection nonparametric kernel density meta power").split()
+FIRST_NAMES = "John Maria Christopher David Yujun Nicholas Ben Stephen Jeff Isabel Kit Austin Mark Patrick".split()
+FAMILY_NAMES = "Baum Cox Jann Lian Wooldridge Royston Nichols Jenkins Schaffer Canette Gould Pitblado Drukker".split()
+ARTICLE_TYPES = ['st'] * 8 + ['gr', 'dm', 'pr', 'gn']
+
+def make_catalogue(n, seed=0, bulk_coverage=0.9, crossref_completeness=1.0):
+    """
+    生成 n 篇文章的合成目录（相同参数结果相同）
+
+    Args:
+        n: 文章数
+        seed: 随机种子
+        bulk_coverage: 出现在 CrossRef ISSN 列表中的文章比例，其余文章需要抓取文章页解析 DOI
+        crossref_completeness: CrossRef 记录带摘要和页码的文章比例，其余文章留给网页补充阶段
+
+    Returns:
+        list: 文章字典（artid, title, volume, number, year, doi, authors, abstract, page, ...）
+    """
+    rng = random.Random(seed)
+    catalogue = []
+    for i in range(n):
+        volume = i // (4 * ARTICLES_PER_ISSUE) + 1
+        number = i // ARTICLES_PER_ISSUE % 4 + 1
+        first_page = i % ARTICLES_PER_ISSUE * 20 + 1
+        catalogue.append({
+            'artid': f"{rng.choice(ARTICLE_TYPES)}{i:06d}",
+            'title': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 10))).capitalize(),
+            'volume': volume,
+            'number': number,
+            'year': 2000 + volume,
+            'doi': f"10.1177/1536867X{i:08d}",
+            'authors': [(rng.choice(FAMILY_NAMES), rng.choice(FIRST_NAMES)) for _ in range(rng.randint(1, 4))],
+            'abstract': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 160))).capitalize() + '.',
+            'page': f"{first_page}-{first_page + 19}",
+            'reference_count': rng.randint(0, 80),
+            'cited_by_count': int(rng.paretovariate(1.2)) - 1,
+            'in_listing': rng.random() < bulk_coverage,
+            # 默认不额外抽随机数，保持与之前相同的目录
+            'crossref_complete': crossref_completeness >= 1 or rng.random() < crossref_completeness,
+        })
+    return catalogue
+
+def crossref_message(art):
+    """按 CrossRef /works 的结构生成单篇文章的 message（crossref_complete 为假时不含摘要和页码）"""
+    message = {
+        'DOI': art['doi'],
+        'type': 'journal-article',
+        'title': [art['title']],
+        'container-title': ['The Stata Journal: Promoting communications on statistics and Stata'],
+        'publisher': 'SAGE Publications',
+        'volume': str(art['volume']),
+        'issue': str(art['number']),
+        'page': art['page'],
+        'ISSN': [STATA_JOURNAL_ISSN, '1536-8734'],
+        'URL': f"https://doi.org/{art['doi']}",
+        'published-print': {'date-parts': [[art['year'], art['number'] * 3]]},
+        'author': [{'given': given, 'family': family, 'sequence': 'first' if k == 0 else 'additional'}
+                   for k, (family, given) in enumerate(art['authors'])],
+        'abstract': f"<jats:p>{art['abstract']}</jats:p>",
+        'reference-count': art['reference_count'],
+        'is-referenced-by-count': art['cited_by_count'],
+        'link': [{'URL': f"https://journals.sagepub.com/doi/pdf/{art['doi']}",
+                  'content-type': 'application/pdf'}],
+    }
+    if not art['crossref_complete']:
+        del message['abstract'], message['page']
+    return message
+
+def _load_fixture(name):
+    path = FIXTURES / name
+    if path.suffix == '.gz':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return f.read()
+    return path.read_text(encoding='utf-8')
+
+def render_search_page(catalogue):
+    """按 fixtures/sjsearch.html.gz 的结构生成包含整个目录的搜索页"""
+    template = _load_fixture('sjsearch.html.gz')
+    head, rest = template.split('<table class="results">', 1)
+    tail = rest.split('</table>', 1)[1]
+
+    rows = []
+    issue = None
+    for art in catalogue:
+        if (art['volume'], art['number']) != issue:
+            issue = (art['volume'], art['number'])
+            rows.append(f'<tr class="issue"><td colspan="3"><h3>Volume {issue[0]}, Number {issue[1]}</h3></td></tr>')
+        authors = ', '.join(f"{given} {family}" for family, given in art['authors'])
+        rows.append(f'<tr><td class="artid">{art["artid"]}</td>'
+                    f'<td><a href="article.html?article={art["artid"]}">{art["title"]}</a>'
+                    f'<br><span class="authors">{authors}</span></td>'
+                    f'<td><a href="sjpdf.html?articlenum={art["artid"]}">PDF</a></td></tr>')
+    return f'{head}<table class="results">{"".join(rows)}</table>{tail}'
+
+class StubServer:
+    """
+    在后台线程中运行的桩服务器
+
+    Args:
+        catalogue: make_catalogue() 生成的目录
+        latency_ms: 每个响应的固定延迟（毫秒）
+        jitter_ms: 在固定延迟上叠加的均匀随机延迟上限（毫秒）
+        rate_429: 返回 429 的请求比例
+        error_rate: 返回 500 的请求比例
+        retry_after: 429 响应的 Retry-After（秒）
+        seed: 故障注入和抖动的随机种子
+    """
+
+    def __init__(self, catalogue, latency_ms=0.0, jitter_ms=0.0, rate_429=0.0, error_rate=0.0,
+                 retry_after=1, seed=0, host='127.0.0.1', port=0):
+        self.catalogue = catalogue
+        self.by_artid = {art['artid']: art for art in catalogue}
+        self.by_doi = {art['doi'].lower(): art for art in catalogue}
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_429 = rate_429
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {}
+
+        self.search_page = render_search_page(catalogue).encode('utf-8')
+        self.article_template = _load_fixture('sj_article.html').split(FIXTURE_DOI)
+        self.sage_template = _load_fixture('sage_article.html.gz').split(FIXTURE_DOI)
+
+        handler = type('Handler', (_StubHandler,), {'stub': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def draw(self):
+        """
+        Returns:
+            tuple: (本次响应的延迟秒数, 注入的故障：429、500 或 None)
+        """
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            roll = self._rng.random()
+        if roll < self.rate_429:
+            return delay, 429
+        if roll < self.rate_429 + self.error_rate:
+            return delay, 500
+        return delay, None
+
+    def stats(self):
+        with self._lock:
+            return dict(sorted(self.counts.items()))
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和正文一次写出，避免 Nagle + 延迟 ACK 给每个响应多加约 40ms
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    stub = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data):
+        self._send(200, json.dumps(data), 'application/json')
+
+    def do_GET(self):
+        stub = self.stub
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        query = parse_qs(parts.query)
+
+        if path == '/__stats':
+            return self._send_json(stub.stats())
+
+        if path == '/sjsearch.html':
+            stub.count('search')
+            return self._send(200, stub.search_page)
+
+        if path == '/article.html':
+            kind = 'article'
+        elif path.startswith('/works'):
+            kind = 'crossref_list' if path == '/works' else 'crossref_work'
+        elif path.startswith('/doi/'):
+            kind = 'sage'
+        else:
+            return self._send(404, 'Not found')
+
+        stub.count(kind)
+        delay, fault = stub.draw()
+        if delay:
+            time.sleep(delay)
+        if fault == 429:
+            stub.count('injected_429')
+            return self._send(429, 'Too Many Requests', headers={'Retry-After': str(stub.retry_after)})
+        if fault == 500:
+            stub.count('injected_500')
+            return self._send(500, 'Internal Server Error')
+
+        if kind == 'article':
+            art = stub.by_artid.get(query.get('article', [''])[0])
+            if art is None:
+                return self._send(404, 'Not found')
+            return self._send(200, art['doi'].join(stub.article_template))
+
+        if kind == 'sage':
+            doi = path[len('/doi/'):]
+            doi = doi[len('pdf/'):] if doi.startswith('pdf/') else doi
+            art = stub.by_doi.get(doi.lower())
+            if art is None:
+                return self._send(404, 'Not found')
+            return self._send(200, art['doi'].join(stub.sage_template))
+
+        if kind == 'crossref_work':
+            art = stub.by_doi.get(path[len('/works/'):].lower())
+            if art is None:
+                return self._send(404, 'Resource not found.', 'text/plain')
+            return self._send_json({'status': 'ok', 'message-type': 'work', 'message': crossref_message(art)})
+
+        return self._send_json(self._works_list(query))
+
+    def _works_list(self, query):
+        """CrossRef /works 列表查询：issn:/doi: 过滤、游标分页（游标为偏移量）、select 字段"""
+        stub = self.stub
+        filters = [f.split(':', 1) for f in query.get('filter', [''])[0].split(',') if ':' in f]
+        dois = [value.lower() for name, value in filters if name == 'doi']
+        if dois:
+            matches = [stub.by_doi[d] for d in dois if d in stub.by_doi]
+        elif any(name == 'issn' for name, _ in filters):
+            matches = [art for art in stub.catalogue if art['in_listing']]
+        else:
+            matches = []
+
+        rows = int(query.get('rows', ['20'])[0])
+        cursor = query.get('cursor', ['*'])[0]
+        start = 0 if cursor == '*' else int(cursor)
+        select = [f for f in query.get('select', [''])[0].split(',') if f]
+
+        items = []
+        for art in matches[start:start + rows]:
+            message = crossref_message(art)
+            items.append({k: v for k, v in message.items() if k in select} if select else message)
+        return {
+            'status': 'ok',
+            'message-type': 'work-list',
+            'message': {
+                'total-results': len(matches),
+                'items-per-page': rows,
+                'next-cursor': str(start + rows),
+                'items': items,
+            },
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a synthetic Stata Journal catalogue for benchmarks")
+    parser.add_argument('--articles', type=int, default=1000, help="catalogue size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bulk-coverage', type=float, default=0.9,
+                        help="share of articles returned by the CrossRef ISSN listing")
+    parser.add_argument('--crossref-completeness', type=float, default=1.0,
+                        help="share of CrossRef records carrying abstract and page range")
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds on injected 429s")
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    catalogue = make_catalogue(args.articles, args.seed, args.bulk_coverage, args.crossref_completeness)
+    server = StubServer(catalogue, args.latency_ms, args.jitter_ms, args.rate_429, args.error_rate,
+                        args.retry_after, args.seed, port=args.port).start()
+    print(f"Serving {len(catalogue)} articles at {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+findsj 本地检索服务
+Local query service over findsj.dta
+
+findsj 每次检索都要重新 use findsj.dta、生成小写列再逐行 strpos 扫描。本脚本只读入一次数据库，
+在内存中建立倒排索引，通过本机 HTTP/JSON 接口回答检索：
+1. 关键词（标题、作者、摘要）或标题检索按 BM25F 排序（各字段词频按 FIELD_WEIGHTS 加权），
+   词项由 auto_update.index_terms() 生成（去重音、小写、去停用词、词干提取），缩写按 SEARCH_SYNONYMS 扩展
+2. 作者检索和作者过滤为作者名整词匹配（与 findsj_author_match 相同），可再按年份过滤
+3. findsj.dta 被 auto_update.py、findsj_sync.py 或 findsj, update 替换后自动重建索引（热重载）
+
+接口（GET，只监听本机）：
+    /search?q=panel+data&scope=keyword&author=cox&year=2010-2020&n=10&match=all&format=json
+        scope: keyword（默认）、title、author；match: all（全部词都出现，默认）或 any；
+        format: json（默认）或 csv（Stata 可直接 copy 后 import delimited）
+    /status    已加载的数据库、文章数、词项数和加载时间
+
+用法：
+    python findsj_server.py --dir "C:/ado/plus/f"           # findsj.dta 所在目录（Stata: findfile findsj.dta）
+    python findsj_server.py --dir . --port 9000 --reload-interval 10
+    python findsj_server.py --dir . --query "propensity score" --years 2010-2020   # 只检索一次并打印结果
+
+在 Stata 中：
+    . copy "http://127.0.0.1:8765/search?q=panel%20data&format=csv" hits.csv, replace
+    . import delimited using hits.csv, clear encoding(utf-8) bindquote(strict) stringcols(1)
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import math
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from auto_update import (
+    RECORD_ORDER, SEARCH_SYNONYMS,
+    author_tokens, fold_name, index_terms, load_existing_database, normalize_record, years_arg,
+)
+
+logger = logging.getLogger('findsj_server')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# 检查 findsj.dta 是否变化的间隔（秒）
+RELOAD_INTERVAL = 2.0
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 各字段词频的权重（BM25F：加权词频、加权文档长度）
+FIELD_WEIGHTS = {'title': 3.0, 'authors': 1.0, 'abstract': 1.0}
+# 检索范围 -> 参与检索的字段
+SCOPE_FIELDS = {
+    'keyword': ('title', 'authors', 'abstract'),
+    'title': ('title',),
+    'author': ('authors',),
+}
+MATCH_MODES = ('all', 'any')
+
+DEFAULT_RESULTS = 10
+MAX_RESULTS = 1000
+RESULT_COLUMNS = ('art_id', 'year', 'volume', 'number', 'score', 'doi', 'title', 'authors')
+
+def field_terms(scope, field, text):
+    """
+    字段文本 -> 词项：作者检索用作者名整词（不做词干提取），其余用 index_terms()
+
+    Returns:
+        list: 词项（可重复）
+    """
+    if scope == 'author':
+        return author_tokens(text).split()
+    return index_terms(text)
+
+def bm25_postings(records, scope):
+    """
+    构建一个检索范围的 BM25F 倒排表
+
+    Args:
+        records: 按输出顺序排列的规范化记录
+        scope: SCOPE_FIELDS 中的检索范围
+
+    Returns:
+        dict: 词项 -> (文章序号数组, 该词项对各文章的得分数组)，得分已含 idf
+    """
+    frequencies = {}
+    lengths = np.zeros(len(records))
+    for doc, record in enumerate(records):
+        counts = {}
+        for field in SCOPE_FIELDS[scope]:
+            weight = FIELD_WEIGHTS[field]
+            terms = field_terms(scope, field, record[field])
+            lengths[doc] += weight * len(terms)
+            for term in terms:
+                counts[term] = counts.get(term, 0.0) + weight
+        for term, count in counts.items():
+            docs, freqs = frequencies.setdefault(term, ([], []))
+            docs.append(doc)
+            freqs.append(count)
+
+    average = lengths.mean() if len(records) and lengths.mean() > 0 else 1.0
+    total = len(records)
+    postings = {}
+    for term, (docs, freqs) in frequencies.items():
+        docs = np.array(docs, dtype=np.int32)
+        freqs = np.array(freqs)
+        idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / average)
+        postings[term] = (docs, idf * freqs * (BM25_K1 + 1) / (freqs + norm))
+    return postings
+
+class SearchIndex:
+    """
+    findsj.dta 的内存检索索引
+
+    - 每个检索范围一个 BM25F 倒排表（bm25_postings()），文章序号按输出顺序（RECORD_ORDER）排列，
+      同分时序号大的（较新的）文章在前，与 findsj 的 -year -volume -number 排序一致
+    - 作者名词项的倒排表同时用于作者过滤
+    - 年份数组用于年份过滤
+    建好后只读，可在多个线程中同时查询。
+    """
+
+    def __init__(self, records):
+        self.records = sorted((normalize_record(record) for record in records),
+                              key=lambda record: tuple(record[name] for name in RECORD_ORDER))
+        self.years = np.array([record['year'] for record in self.records], dtype=np.int32)
+        self.postings = {scope: bm25_postings(self.records, scope) for scope in SCOPE_FIELDS}
+        self.synonyms = {key: index_terms(expansion) for key, expansion in SEARCH_SYNONYMS.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def term_count(self):
+        return sum(len(postings) for postings in self.postings.values())
+
+    def query_groups(self, query, scope):
+        """
+        检索词 -> 词组：每个检索词一组，组内为可互相替代的词项组合（满足其一即算匹配）
+
+        关键词检索中的缩写（如 psm）可由扩展词（propensity score）全部出现代替。
+
+        Returns:
+            list: [[(词项, ...), ...], ...]
+        """
+        if scope == 'author':
+            return [[(token,)] for token in dict.fromkeys(fold_name(query).split())]
+        groups = []
+        for term in dict.fromkeys(index_terms(query)):
+            alternatives = [(term,)]
+            expansion = self.synonyms.get(term)
+            if scope == 'keyword' and expansion:
+                alternatives.append(tuple(expansion))
+            groups.append(alternatives)
+        return groups
+
+    def _docs_mask(self, postings, terms):
+        """同时含有 terms 中全部词项的文章"""
+        mask = np.ones(len(self.records), dtype=bool)
+        for term in terms:
+            hit = np.zeros(len(self.records), dtype=bool)
+            if term in postings:
+                hit[postings[term][0]] = True
+            mask &= hit
+        return mask
+
+    def search(self, query='', scope='keyword', author=None, years=None, n=DEFAULT_RESULTS, match='all'):
+        """
+        检索
+
+        Args:
+            query: 检索词；为空时只按作者和年份过滤，按新到旧排列。不为空但没有可检索的词项
+                （如全是停用词的 the）时没有匹配，不当作空检索
+            scope: 检索范围（SCOPE_FIELDS 的键）
+            author: 作者过滤（作者名整词，全部出现）
+            years: (起始年, 结束年) 年份过滤
+            n: 最多返回的条数
+            match: all（每个检索词都要匹配）或 any（匹配任一检索词）
+
+        Returns:
+            tuple: (匹配总数, 结果列表)；结果为 RESULT_COLUMNS 字段的字典，按得分从高到低排列
+        """
+        postings = self.postings[scope]
+        query = (query or '').strip()
+        groups = self.query_groups(query, scope)
+        scores = np.zeros(len(self.records))
+        if groups:
+            masks = []
+            for alternatives in groups:
+                mask = np.zeros(len(self.records), dtype=bool)
+                for terms in alternatives:
+                    mask |= self._docs_mask(postings, terms)
+                masks.append(mask)
+                for term in {term for terms in alternatives for term in terms}:
+                    if term in postings:
+                        docs, weights = postings[term]
+                        scores[docs] += weights
+            selected = np.logical_and.reduce(masks) if match == 'all' else np.logical_or.reduce(masks)
+        else:
+            selected = np.full(len(self.records), not query)
+        if author:
+            # 作者过滤同理：没有作者名词项时不匹配任何文章
+            tokens = fold_name(author).split()
+            selected &= self._docs_mask(self.postings['author'], tokens) if tokens else False
+        if years:
+            selected &= (self.years >= years[0]) & (self.years <= years[1])
+
+        docs = np.flatnonzero(selected)
+        # 得分从高到低，同分时新文章在前
+        order = docs[np.lexsort((-docs, -scores[docs]))][:n]
+        results = []
+        for doc in order:
+            record = self.records[doc]
+            results.append({name: round(float(scores[doc]), 4) if name == 'score' else record[name]
+                            for name in RESULT_COLUMNS})
+        return len(docs), results
+
+class SearchService:
+    """
+    持有当前索引，findsj.dta 变化时重建（热重载）
+
+    数据库文件由各更新脚本先写临时文件再改名替换，修改时间或大小变化即重新读入。
+    新索引建好后一次替换引用，重建期间的查询继续使用旧索引；读取失败时保留旧索引。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index = None
+        self.signature = None
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        if not self.reload():
+            raise ValueError(f"No usable database at {self.path}")
+
+    def _signature(self):
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self, force=False):
+        """
+        数据库文件有变化（或 force）时重建索引
+
+        Returns:
+            bool: 是否加载了新索引
+        """
+        with self._lock:
+            try:
+                signature = self._signature()
+            except OSError:
+                return False
+            if signature == self.signature and not force:
+                return False
+            start = time.perf_counter()
+            records = load_existing_database(self.path)
+            if not records:
+                # 记下签名：同一个坏文件不反复读取，文件再次变化时才重试
+                if self.index is not None:
+                    self.signature = signature
+                logger.warning(f"Could not load {self.path}; keeping the current index")
+                return False
+            index = SearchIndex(records.values())
+            self.index, self.signature, self.loaded_at = index, signature, datetime.now()
+            logger.info(f"Indexed {len(index)} articles from {self.path} in {time.perf_counter() - start:.2f}s")
+            return True
+
+    def watch(self, interval, stop):
+        """每隔 interval 秒检查一次数据库文件，直到 stop（threading.Event）被设置"""
+        while not stop.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.warning(f"Reload of {self.path} failed: {e}")
+
+    def status(self):
+        index = self.index
+        return {
+            'database': str(self.path),
+            'articles': len(index),
+            'terms': index.term_count(),
+            'loaded_at': self.loaded_at.isoformat(timespec='seconds'),
+        }
+
+def parse_search_params(params):
+    """
+    /search 的查询参数 -> SearchIndex.search() 的参数
+
+    Args:
+        params: parse_qs() 的结果
+
+    Returns:
+        tuple: (search 参数字典, 输出格式)
+    """
+    def value(name, default=None):
+        return params.get(name, [default])[-1]
+
+    scope = value('scope', 'keyword')
+    if scope not in SCOPE_FIELDS:
+        raise ValueError(f"scope must be one of {', '.join(SCOPE_FIELDS)}")
+    match = value('match', 'all')
+    if match not in MATCH_MODES:
+        raise ValueError(f"match must be one of {', '.join(MATCH_MODES)}")
+    output = value('format', 'json')
+    if output not in ('json', 'csv'):
+        raise ValueError("format must be json or csv")
+    try:
+        n = int(value('n', DEFAULT_RESULTS))
+    except ValueError:
+        raise ValueError("n must be an integer")
+    years = value('year')
+    if years:
+        try:
+            years = years_arg(years)
+        except argparse.ArgumentTypeError as e:
+            raise ValueError(f"year: {e}")
+    return {
+        'query': value('q', ''),
+        'scope': scope,
+        'author': value('author'),
+        'years': years or None,
+        'n': min(max(n, 1), MAX_RESULTS),
+        'match': match,
+    }, output
+
+def results_csv(results):
+    """检索结果 -> CSV 文本（首行为列名）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(RESULT_COLUMNS)
+    for result in results:
+        writer.writerow([result[name] for name in RESULT_COLUMNS])
+    return buffer.getvalue()
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """HTTP 接口：/search、/status（service 由 make_server() 挂在 server 上）"""
+
+    server_version = 'findsj-server'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        service = self.server.service
+        if url.path == '/status':
+            self.send_body(200, json.dumps(service.status()), 'application/json')
+            return
+        if url.path != '/search':
+            self.send_body(404, json.dumps({'error': f"unknown path {url.path}"}), 'application/json')
+            return
+        try:
+            params, output = parse_search_params(parse_qs(url.query))
+        except ValueError as e:
+            self.send_body(400, json.dumps({'error': str(e)}), 'application/json')
+            return
+
+        start = time.perf_counter()
+        total, results = service.index.search(**params)
+        if output == 'csv':
+            self.send_body(200, results_csv(results), 'text/csv')
+            return
+        self.send_body(200, json.dumps({
+            'query': params['query'],
+            'scope': params['scope'],
+            'total': total,
+            'returned': len(results),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+            'results': results,
+        }, ensure_ascii=False), 'application/json')
+
+    def send_body(self, status, text, content_type):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    创建 HTTP 服务（每个请求一个线程）；port=0 时由系统分配端口
+
+    Returns:
+        ThreadingHTTPServer: 尚未开始 serve_forever() 的服务
+    """
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def print_results(total, results):
+    """--query：打印检索结果"""
+    print(f"{total} articles matched")
+    for result in results:
+        print(f"{result['score']:8.3f}  {result['art_id']:<10} {result['year']}  {result['title']}")
+        if result['authors']:
+            print(f"{'':20}{result['authors']}")
+
+def main(argv=None):
+    """主入口函数"""
+    parser = argparse.ArgumentParser(description="Serve ranked searches over findsj.dta on a local HTTP port.")
+    parser.add_argument(
+        '--dir', type=Path, default=Path('.'), metavar='DIR',
+        help="directory holding findsj.dta (in Stata: findfile findsj.dta)"
+    )
+    parser.add_argument(
+        '--host', default=DEFAULT_HOST,
+        help=f"address to listen on (default: {DEFAULT_HOST}; the service has no authentication)"
+    )
+    parser.add_argument(
+        '--port', type=int, default=DEFAULT_PORT,
+        help=f"port to listen on (default: {DEFAULT_PORT})"
+    )
+    parser.add_argument(
+        '--reload-interval', type=float, default=RELOAD_INTERVAL, metavar='SECONDS',
+        help=f"check findsj.dta for changes this often; 0 disables hot reload (default: {RELOAD_INTERVAL:g})"
+    )
+    parser.add_argument(
+        '--query', metavar='TEXT',
+        help="run one search, print the results and exit instead of serving"
+    )
+    parser.add_argument('--scope', choices=tuple(SCOPE_FIELDS), default='keyword', help="with --query")
+    parser.add_argument('--author', help="with --query: only articles by this author")
+    parser.add_argument('--years', type=years_arg, metavar='FROM-TO', help="with --query: year filter")
+    parser.add_argument('-n', type=int, default=DEFAULT_RESULTS, help="with --query: results to print")
+    args = parser.parse_args(argv)
+
+    try:
+        service = SearchService(args.dir / "findsj.dta")
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+
+    if args.query is not None:
+        print_results(*service.index.search(args.query, args.scope, args.author, args.years, args.n))
+        return 0
+
+    server = make_server(service, args.host, args.port)
+    stop = threading.Event()
+    if args.reload_interval > 0:
+        threading.Thread(target=service.watch, args=(args.reload_interval, stop), daemon=True).start()
+    host, port = server.server_address[:2]
+    logger.info(f"Serving {len(service.index)} articles on http://{host}:{port}/search (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+findsj 数据库增量同步
+Apply published patches to a local copy of findsj.dta
+
+auto_update.py --publish-patches 在每次数据内容变化时于 patches/ 下发布一个补丁（只含新增/修改的行和
+删除的 art_id），patches/index.json 记录每个补丁的上一版/本版校验和。仓库的每月更新不发布补丁
+（findsj, update 下载完整文件，仓库检出用 git pull），补丁供自建镜像使用。本脚本：
+1. 计算本地 findsj.dta 的数据集校验和（与行顺序无关）
+2. 读取 index.json，沿 base_checksum 串起从本地版本到最新版本的补丁链
+3. 逐个下载补丁、核对文件 SHA-256，应用后核对数据集校验和
+4. 全部通过后写出 findsj.dta、findsj_core.dta、findsj_text.dta、findsj_version.dta
+   （本地已有 findsj_authors.dta、findsj_cite.dta、findsj_related.dta 时一并重建）
+
+本地版本太旧（补丁已被清理）或被修改过时找不到补丁链，请下载完整数据库。
+
+本脚本不随 findsj.pkg 安装：规范化、校验和和各导出器都来自 auto_update.py，
+只能在仓库检出目录（git clone）中与 auto_update.py 一起运行，需要 auto_update.py 的依赖
+（pandas、requests、beautifulsoup4）。
+
+用法：
+    python findsj_sync.py --dir mirror --source https://example.org/findsj/patches/   # 补丁目录的 URL
+    python findsj_sync.py --dir mirror --source ./patches                             # 本地补丁目录
+    python findsj_sync.py --dir mirror --source ./patches --dry-run                   # 只显示需要应用的补丁
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import sys
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import auto_update
+except ModuleNotFoundError as e:
+    if e.name != 'auto_update':
+        raise
+    sys.exit("findsj_sync.py must be run from a findsj repository checkout, next to auto_update.py")
+from auto_update import (
+    RECORD_ORDER, AuthorTableExporter, CitationExporter, DatabaseSummary, RelatedArticlesExporter,
+    StataExporter,
+    dataset_checksum, export_records, load_existing_database, normalize_record,
+    record_hash, write_version_file,
+)
+
+logger = logging.getLogger('findsj_sync')
+
+FETCH_TIMEOUT = 30
+
+def fetch(source, name):
+    """
+    读取补丁目录中的文件
+
+    Args:
+        source: 补丁目录的 URL（http/https）或本地路径
+        name: 文件名
+
+    Returns:
+        bytes: 文件内容
+    """
+    if source.startswith(('http://', 'https://')):
+        request = urllib.request.Request(source.rstrip('/') + '/' + name,
+                                         headers={'User-Agent': auto_update.HEADERS['User-Agent']})
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            return response.read()
+    return (Path(source) / name).read_bytes()
+
+def load_local_records(path):
+    """
+    读取本地数据库
+
+    Returns:
+        dict: art_id -> normalize_record() 规范化后的记录
+    """
+    return {art_id: normalize_record(record) for art_id, record in load_existing_database(path).items()}
+
+def records_checksum(records):
+    """记录集合的 dataset_checksum()"""
+    return dataset_checksum({art_id: record_hash(record) for art_id, record in records.items()})
+
+def plan_patch_chain(index, checksum):
+    """
+    从本地校验和出发，沿 base_checksum 串起到最新版本的补丁链
+
+    Args:
+        index: patches/index.json 的内容
+        checksum: 本地数据的 dataset_checksum()
+
+    Returns:
+        list: 按应用顺序排列的补丁条目；已是最新时为空列表；找不到补丁链时返回 None
+    """
+    latest = index['latest']['checksum']
+    by_base = {patch['base_checksum']: patch for patch in index.get('patches', [])}
+    chain = []
+    seen = {checksum}
+    while checksum != latest:
+        patch = by_base.get(checksum)
+        if patch is None or patch['checksum'] in seen:
+            return None
+        chain.append(patch)
+        checksum = patch['checksum']
+        seen.add(checksum)
+    return chain
+
+def apply_patch(records, patch):
+    """
+    应用一个补丁（原地更新 records）
+
+    Args:
+        records: art_id -> 记录
+        patch: 解压后的补丁内容
+    """
+    columns = patch['columns']
+    for row in patch['upserts']:
+        record = normalize_record(dict(zip(columns, row)))
+        records[record['art_id']] = record
+    for art_id in patch['removed']:
+        records.pop(art_id, None)
+
+def sync(directory, source, dry_run=False):
+    """
+    同步本地数据库到最新版本
+
+    Args:
+        directory: findsj.dta 所在目录
+        source: 补丁目录的 URL 或本地路径
+        dry_run: 只显示补丁链，不下载补丁、不写文件
+
+    Returns:
+        int: 退出码（0 成功或已是最新，2 找不到补丁链）
+    """
+    directory = Path(directory)
+    database_path = directory / "findsj.dta"
+    records = load_local_records(database_path)
+    if not records:
+        logger.error(f"No local database at {database_path}; run 'findsj, update' in Stata first")
+        return 2
+    checksum = records_checksum(records)
+
+    index = json.loads(fetch(source, auto_update.PATCH_INDEX_NAME))
+    if index.get('format') != auto_update.PATCH_FORMAT:
+        raise ValueError(f"Unsupported patch index format: {index.get('format')}")
+    chain = plan_patch_chain(index, checksum)
+    latest = index['latest']
+    if chain is None:
+        logger.error("No patch chain from the local database to the latest version "
+                     f"({latest['version']}); run 'findsj, update' in Stata to download the full database")
+        return 2
+    if not chain:
+        logger.info(f"Local database is up to date (version {latest['version']}, {len(records)} articles)")
+        return 0
+
+    total_bytes = sum(patch['bytes'] for patch in chain)
+    logger.info(f"Patches to apply: {', '.join(str(patch['version']) for patch in chain)} "
+                f"({total_bytes / 1024:.1f} KB)")
+    if dry_run:
+        return 0
+
+    # 逐个应用并核对；全部通过后才写文件
+    for entry in chain:
+        data = fetch(source, entry['file'])
+        if len(data) != entry['bytes'] or hashlib.sha256(data).hexdigest() != entry['sha256']:
+            raise ValueError(f"Patch {entry['file']} does not match its SHA-256 in {auto_update.PATCH_INDEX_NAME}")
+        patch = json.loads(gzip.decompress(data))
+        if patch['base_checksum'] != checksum:
+            raise ValueError(f"Patch {entry['file']} does not apply to the current data")
+        apply_patch(records, patch)
+        checksum = records_checksum(records)
+        if checksum != patch['checksum']:
+            raise ValueError(f"Checksum mismatch after applying {entry['file']}")
+        logger.info(f"Applied patch {patch['version']}: {len(patch['upserts'])} added or changed, "
+                    f"{len(patch['removed'])} removed")
+
+    ordered = sorted(records.values(), key=lambda record: tuple(record[name] for name in RECORD_ORDER))
+    exporters = [StataExporter(database_path, directory / "findsj_core.dta", directory / "findsj_text.dta")]
+    if (directory / "findsj_authors.dta").exists():
+        exporters.append(AuthorTableExporter(directory / "findsj_authors.dta",
+                                             directory / "findsj_author_index.dta"))
+    if (directory / "findsj_cite.dta").exists():
+        exporters.append(CitationExporter(directory / "findsj_cite.dta"))
+    if (directory / "findsj_related.dta").exists():
+        if auto_update.sparse is None:
+            logger.warning("findsj_related.dta not rebuilt: scipy is not installed")
+        else:
+            exporters.append(RelatedArticlesExporter(directory / "findsj_related.dta"))
+    summary = DatabaseSummary()
+    export_records(ordered, exporters + [summary])
+    write_version_file(summary.stats, directory / "findsj_version.dta",
+                       updated=datetime.fromisoformat(chain[-1]['generated']))
+    for exporter in exporters:
+        logger.info(f"✅ {exporter.describe()}")
+    logger.info(f"✅ Database synced to version {latest['version']} ({len(records)} articles)")
+    return 0
+
+def main(argv=None):
+    """主入口函数"""
+    parser = argparse.ArgumentParser(description="Update a local findsj.dta by applying published patches.")
+    parser.add_argument(
+        '--dir', type=Path, default=Path('.'), metavar='DIR',
+        help="directory holding findsj.dta (in Stata: findfile findsj.dta)"
+    )
+    parser.add_argument(
+        '--source', required=True, metavar='SOURCE',
+        help="patch directory written by auto_update.py --publish-patches: a URL or a local directory"
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help="only list the patches that would be applied"
+    )
+    args = parser.parse_args(argv)
+    try:
+        return sync(args.dir, args.source, dry_run=args.dry_run)
+    except Exception as e:
+        logger.error(f"Sync failed: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""测试共用设置：从仓库根目录导入 auto_update.py"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
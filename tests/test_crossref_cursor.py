@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+CrossRef 游标分页（iter_crossref_works）测试：启用 HTTP 缓存时重新运行不会重放失效的游标，
+取得的条数少于 total-results 时记录警告
+
+桩服务器的 /works 与 CrossRef 一样每次返回新的 next-cursor，游标只能使用一次，
+清空 cursors 模拟游标过期（之后返回 400）；total-results 比实际条数多 extra 条时模拟被截断的列表。
+"""
+
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import auto_update
+
+ITEMS = [{'DOI': f"10.1/{i}"} for i in range(7)]
+ROWS = 3
+
+class CursorHandler(BaseHTTPRequestHandler):
+    cursors = {}
+    tokens = itertools.count(1)
+    extra = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        cursor, rows = query['cursor'][0], int(query['rows'][0])
+        with self.lock:
+            start = 0 if cursor == '*' else self.cursors.pop(cursor, None)
+            if start is not None and start + rows < len(ITEMS):
+                next_cursor = f"c{next(self.tokens)}"
+                self.cursors[next_cursor] = start + rows
+            else:
+                next_cursor = cursor
+        if start is None:
+            status, body = 400, b'{"status": "failed", "message": "expired cursor"}'
+        else:
+            status, body = 200, json.dumps({'message': {
+                'items': ITEMS[start:start + rows],
+                'total-results': len(ITEMS) + self.extra,
+                'next-cursor': next_cursor,
+            }}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def crossref_stub(tmp_path, monkeypatch):
+    """启动桩服务器并将 CROSSREF_API 指向它；启用临时目录中的 HTTP 缓存，关闭重试"""
+    CursorHandler.cursors = {}
+    CursorHandler.extra = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CursorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(auto_update, 'CROSSREF_API', f"http://127.0.0.1:{server.server_address[1]}/works")
+    monkeypatch.setattr(auto_update, '_rate_limiters', {})
+    monkeypatch.setattr(auto_update, 'DEFAULT_HOST_RATE_LIMIT', (100.0, 100.0))
+    monkeypatch.setattr(auto_update, 'REQUEST_RETRIES', 1)
+    auto_update.configure_http_cache(tmp_path / "responses.sqlite")
+    try:
+        yield CursorHandler
+    finally:
+        auto_update.configure_http_cache(enabled=False)
+        server.shutdown()
+        server.server_close()
+
+def listed():
+    return [item['DOI'] for item in auto_update.iter_crossref_works('issn:1536-867X', rows=ROWS)]
+
+def test_rerun_does_not_replay_expired_cursor(crossref_stub):
+    # 第一次运行只读完第一页就中断，之后游标过期
+    first = auto_update.iter_crossref_works('issn:1536-867X', rows=ROWS)
+    assert len(list(itertools.islice(first, ROWS))) == ROWS
+    first.close()
+    crossref_stub.cursors.clear()
+    # 重新运行：若第一页来自缓存，其中失效的 next-cursor 会使第二页请求失败
+    assert listed() == [item['DOI'] for item in ITEMS]
+
+def test_offline_replays_the_cached_listing(crossref_stub, tmp_path):
+    expected = [item['DOI'] for item in ITEMS]
+    assert listed() == expected
+    auto_update.configure_http_cache(tmp_path / "responses.sqlite", offline=True)
+    assert listed() == expected
+
+def test_incomplete_listing_is_logged(crossref_stub, caplog):
+    crossref_stub.extra = 5
+    with caplog.at_level('WARNING', logger=auto_update.logger.name):
+        assert len(listed()) == len(ITEMS)
+    assert any(f"{len(ITEMS)} of {len(ITEMS) + 5} results" in r.getMessage() for r in caplog.records)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+增量更新测试：对 benchmarks/stub_server.py 的合成目录连续运行 update_database()，
+检查易变字段（引用次数）的刷新、暂存（pending_volatile）和按周期写出
+"""
+
+import json
+import sys
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pandas as pd
+import pytest
+
+import auto_update
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+from stub_server import StubServer, make_catalogue  # noqa: E402
+
+ARTICLES = 30
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    """启动桩服务器，输出写入临时目录（各模块变量由 monkeypatch 恢复）"""
+    server = StubServer(make_catalogue(ARTICLES, bulk_coverage=1.0)).start()
+    for name in auto_update.OUTPUT_PATH_NAMES:
+        monkeypatch.setattr(auto_update, name, getattr(auto_update, name))
+    auto_update.set_output_dir(tmp_path)
+    monkeypatch.setattr(auto_update, 'BASE_URL', server.url)
+    monkeypatch.setattr(auto_update, 'CROSSREF_API', f"{server.url}/works")
+    monkeypatch.setattr(auto_update, 'SAGE_URL', server.url)
+    monkeypatch.setattr(auto_update, '_rate_limiters', {})
+    monkeypatch.setitem(auto_update.HOST_RATE_LIMITS, urlsplit(server.url).netloc, (1000.0, 1000.0))
+    auto_update.configure_http_cache(enabled=False)
+    try:
+        yield server
+    finally:
+        server.stop()
+
+def run(tmp_path, **kwargs):
+    auto_update.update_database(journal_path=tmp_path / "journal.sqlite", **kwargs)
+    return json.loads(auto_update.LOG_PATH.read_text(encoding='utf-8'))
+
+def edit_log(**fields):
+    log = json.loads(auto_update.LOG_PATH.read_text(encoding='utf-8'))
+    log.update(fields)
+    auto_update.LOG_PATH.write_text(json.dumps(log), encoding='utf-8')
+
+def crossref_requests(server):
+    stats = server.stats()
+    return stats.get('crossref_work', 0) + stats.get('crossref_list', 0)
+
+def cited_by(path):
+    return pd.read_stata(str(path)).set_index('art_id')['cited_by_count'].to_dict()
+
+def test_refreshed_counts_are_kept_and_published_on_schedule(stub, tmp_path):
+    log = run(tmp_path)
+    assert log['changes']['written']
+    before = cited_by(auto_update.DATABASE_PATH)
+
+    # 引用次数变化；上次刷新已过期，但刚刚写出过
+    for art in stub.catalogue[:5]:
+        art['cited_by_count'] += 10
+    edit_log(citations_refreshed='2000-01-01')
+
+    # 第一次增量运行：刷新引用次数，只有易变字段变化，不重写数据库，刷新结果记入日志
+    log = run(tmp_path, incremental=True)
+    assert crossref_requests(stub) > 0
+    assert not log['changes']['written']
+    assert log['changes']['volatile_only'] == 5
+    assert log['citations_refreshed'] != '2000-01-01'
+    assert sorted(log['pending_volatile']) == sorted(art['artid'] for art in stub.catalogue[:5])
+    assert cited_by(auto_update.DATABASE_PATH) == before
+
+    # 第二次增量运行：刷新未到期，不再查询 CrossRef，暂存的值继续保留
+    stub.counts.clear()
+    log = run(tmp_path, incremental=True)
+    assert crossref_requests(stub) == 0
+    assert not log['changes']['written']
+    assert len(log['pending_volatile']) == 5
+
+    # 距上次写出已满刷新周期：写出暂存的引用次数，仍不查询 CrossRef
+    edit_log(citations_published='2000-01-01')
+    stub.counts.clear()
+    log = run(tmp_path, incremental=True)
+    assert crossref_requests(stub) == 0
+    assert log['changes']['written']
+    assert log['pending_volatile'] == {}
+    after = cited_by(auto_update.DATABASE_PATH)
+    for art in stub.catalogue:
+        assert after[art['artid']] == art['cited_by_count']
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+限速器（TokenBucket）测试：对本地桩服务器发出真实请求，检查响应头的解析和 AIMD 调整
+
+桩服务器：
+- /limited    200，带 X-Rate-Limit-Limit: 50 和 X-Rate-Limit-Interval: 1s（CrossRef 的格式）
+- /throttled  429，带 Retry-After: 2
+"""
+
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import auto_update
+from auto_update import TokenBucket, parse_rate_limit_headers, parse_retry_after
+
+RETRY_AFTER = 2
+
+class LimitHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/throttled':
+            self.send_response(429)
+            self.send_header('Retry-After', str(RETRY_AFTER))
+        else:
+            self.send_response(200)
+            self.send_header('X-Rate-Limit-Limit', '50')
+            self.send_header('X-Rate-Limit-Interval', '1s')
+        body = b'{}'
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stub_url(monkeypatch):
+    """启动桩服务器；关闭 HTTP 缓存，每个测试使用新的限速器"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LimitHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(auto_update, '_rate_limiters', {})
+    auto_update.configure_http_cache(enabled=False)
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after('5') == 5.0
+    assert parse_retry_after(' 0 ') == 0.0
+    assert parse_retry_after(str(auto_update.MAX_RETRY_AFTER * 10)) == auto_update.MAX_RETRY_AFTER
+    assert parse_retry_after('') is None
+    assert parse_retry_after('soon') is None
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    # 已经过去的日期不等待
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+def test_parse_rate_limit_headers():
+    assert parse_rate_limit_headers({'X-Rate-Limit-Limit': '50', 'X-Rate-Limit-Interval': '1s'}) == 50.0
+    assert parse_rate_limit_headers({'X-Rate-Limit-Limit': '120', 'X-Rate-Limit-Interval': '1m'}) == 2.0
+    assert parse_rate_limit_headers({'X-Rate-Limit-Limit': '50'}) is None
+    assert parse_rate_limit_headers({'X-Rate-Limit-Limit': 'x', 'X-Rate-Limit-Interval': '1s'}) is None
+
+def test_ceiling_from_response_headers(stub_url):
+    url = f"{stub_url}/limited"
+    response = auto_update.http_get(url, 'crossref')
+    assert response.status_code == 200
+    limiter = auto_update.get_rate_limiter(url)
+    assert limiter.max_rate == 50.0
+    assert limiter.capacity == 50.0
+
+def test_pause_length_from_retry_after(stub_url):
+    url = f"{stub_url}/throttled"
+    limiter = auto_update.get_rate_limiter(url)
+    rate = limiter.rate
+    response = auto_update.http_get(url, 'crossref')
+    assert response.status_code == 429
+    assert limiter.rate == rate / 2
+    # 暂停期间预订的令牌要等到 Retry-After 结束
+    assert limiter.reserve() == pytest.approx(RETRY_AFTER, abs=0.3)
+
+def test_missing_retry_after_uses_default():
+    limiter = TokenBucket(4.0, 8.0)
+    assert limiter.on_response(429, {}) == auto_update.DEFAULT_RETRY_AFTER
+    assert limiter.rate == 2.0
+
+def test_concurrent_429s_halve_once():
+    limiter = TokenBucket(8.0, 8.0)
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.on_response(429, {'Retry-After': '0'}, started)
+    assert limiter.rate == 4.0
+    # 减速之后才发出的请求再遇到 429 才继续减半
+    limiter.on_response(429, {'Retry-After': '0'}, time.monotonic())
+    assert limiter.rate == 2.0
+
+def test_rate_never_below_minimum():
+    limiter = TokenBucket(1.0, 1.0)
+    for _ in range(10):
+        limiter.on_response(429, {'Retry-After': '0'}, time.monotonic())
+    assert limiter.rate == auto_update.MIN_HOST_RATE
+
+def test_aimd_recovery_scales_with_rate():
+    limiter = TokenBucket(40.0, 50.0)
+    limiter.on_response(200, {})
+    assert limiter.rate == pytest.approx(40.0 * (1 + auto_update.RATE_INCREASE_FRACTION))
+
+    slow = TokenBucket(0.2, 50.0)
+    slow.on_response(200, {})
+    assert slow.rate == pytest.approx(0.2 + auto_update.RATE_INCREASE_STEP)
+
+    for _ in range(200):
+        limiter.on_response(200, {})
+    assert limiter.rate == 50.0
+
+def test_recovery_after_backoff_reaches_ceiling(stub_url):
+    url = f"{stub_url}/limited"
+    limiter = auto_update.get_rate_limiter(url)
+    auto_update.http_get(url, 'crossref')
+    limiter.pause(0, time.monotonic())
+    halved = limiter.rate
+    successes = 0
+    while limiter.rate < limiter.max_rate and successes < 200:
+        limiter.on_response(200, {'X-Rate-Limit-Limit': '50', 'X-Rate-Limit-Interval': '1s'})
+        successes += 1
+    assert limiter.rate == 50.0
+    assert halved < limiter.rate
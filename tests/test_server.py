@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""findsj_server.SearchIndex 测试：空检索与没有可检索词项的检索"""
+
+import pytest
+
+findsj_server = pytest.importorskip('findsj_server')
+
+RECORDS = [
+    {'art_id': 'st0001', 'title': 'Panel data regression', 'authors': 'Nicholas J. Cox',
+     'abstract': 'Estimating the panel models', 'year': 2010, 'volume': 10, 'number': 1},
+    {'art_id': 'st0002', 'title': 'Survival analysis of the data', 'authors': 'Stephen P. Jenkins',
+     'abstract': 'Hazard models', 'year': 2015, 'volume': 15, 'number': 2},
+]
+
+@pytest.fixture(scope='module')
+def index():
+    return findsj_server.SearchIndex(RECORDS)
+
+def test_empty_query_filters_only(index):
+    assert index.search('')[0] == 2
+    assert index.search('   ', years=(2014, 2016))[0] == 1
+    assert index.search('', author='cox')[0] == 1
+
+def test_stopword_query_matches_nothing(index):
+    assert index.search('the') == (0, [])
+    assert index.search('the of', scope='title') == (0, [])
+    assert index.search('the', match='any') == (0, [])
+
+def test_author_filter_without_tokens_matches_nothing(index):
+    assert index.search('', author='.') == (0, [])
+
+def test_query_terms_still_match(index):
+    assert index.search('the data')[0] == 2
+    assert index.search('panel')[1][0]['art_id'] == 'st0001'
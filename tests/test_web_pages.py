@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+SAGE 文章页抓取（iter_web_pages）测试：线程池和 async 两种后端的重试、放弃和指标
+
+桩服务器（路径为 /doi/<DOI>）：
+- 10.1/ok       200
+- 10.1/flaky    前两次 503，之后 200
+- 10.1/missing  404（不重试）
+- 10.1/down     始终 500
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import auto_update
+
+PAGE = b'<html><body>article</body></html>'
+
+class PageHandler(BaseHTTPRequestHandler):
+    hits = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        doi = self.path.split('/doi/', 1)[-1]
+        with self.lock:
+            self.hits[doi] = self.hits.get(doi, 0) + 1
+            count = self.hits[doi]
+        if doi == '10.1/ok' or (doi == '10.1/flaky' and count > 2):
+            status, body = 200, PAGE
+        elif doi == '10.1/flaky':
+            status, body = 503, b''
+        elif doi == '10.1/missing':
+            status, body = 404, b''
+        else:
+            status, body = 500, b''
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def sage_stub(monkeypatch):
+    """启动桩服务器并将 SAGE_URL 指向它；放宽限速，关闭 HTTP 缓存和退避等待，清空指标"""
+    PageHandler.hits = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(auto_update, 'SAGE_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(auto_update, '_rate_limiters', {})
+    monkeypatch.setattr(auto_update, 'DEFAULT_HOST_RATE_LIMIT', (100.0, 100.0))
+    monkeypatch.setattr(auto_update, 'RETRY_BACKOFF', 0.0)
+    monkeypatch.setattr(auto_update, 'REQUEST_RETRIES', 3)
+    auto_update.configure_http_cache(enabled=False)
+    auto_update._metrics.reset()
+    try:
+        yield PageHandler.hits
+    finally:
+        server.shutdown()
+        server.server_close()
+
+@pytest.mark.parametrize('backend', ['thread', 'async'])
+def test_iter_web_pages_retries_and_counts_failures(sage_stub, monkeypatch, caplog, backend):
+    if backend == 'thread':
+        monkeypatch.setattr(auto_update, 'httpx', None)
+    elif auto_update.httpx is None:
+        pytest.skip("httpx is not installed")
+    records = [{'doi': doi} for doi in ('10.1/ok', '10.1/flaky', '10.1/missing', '10.1/down')]
+
+    with caplog.at_level('WARNING', logger=auto_update.logger.name):
+        pages = {record['doi']: html for record, html in auto_update.iter_web_pages(records, workers=4)}
+
+    assert pages == {'10.1/ok': PAGE.decode(), '10.1/flaky': PAGE.decode()}
+    assert sage_stub == {'10.1/ok': 1, '10.1/flaky': 3, '10.1/missing': 1, '10.1/down': 3}
+    http = auto_update._metrics.to_dict()['http']
+    assert http['retries'] == 4
+    assert http['failures'] == 2
+    failed = [r.getMessage() for r in caplog.records if 'Failed to get web info' in r.getMessage()]
+    assert len(failed) == 2